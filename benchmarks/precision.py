@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""
+Reduced-precision benchmark
+==============
+    Scores the newstest2020 ru-en OnlineA outputs with COMET and BERTScore in every
+    supported precision and reports run time and drift against fp32.
+
+    python benchmarks/precision.py [--metric COMET] [--lines 500]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ["TELESCOPE_DISABLE_CACHE"] = "1"
+
+from telescope.metrics import BERTScore, COMET
+from telescope.metrics.registry import MODEL_REGISTRY
+from telescope.metrics.utils import PRECISIONS
+from telescope.utils import MappedLines
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data", "newstest2020-ruen.{}.txt")
+METRICS = {"COMET": COMET, "BERTScore": BERTScore}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--metric", choices=list(METRICS), action="append")
+    parser.add_argument("--lines", type=int, default=None)
+    args = parser.parse_args()
+
+    src, mt, ref = [], [], []
+    for lines, name in zip((src, mt, ref), ("src.ru", "OnlineA", "ref.en")):
+        with MappedLines(DATA.format(name)) as corpus:
+            lines.extend(corpus[: args.lines])
+    for name in args.metric or list(METRICS):
+        baseline = None
+        for precision in PRECISIONS:
+            metric = METRICS[name](language="en", precision=precision)
+            start = time.perf_counter()
+            result = metric.score(src, mt, ref)
+            elapsed = time.perf_counter() - start
+            scores = np.array(result.seg_scores)
+            if baseline is None:
+                baseline = scores
+            drift = np.abs(scores - baseline).max()
+            pearson = np.corrcoef(scores, baseline)[0, 1]
+            print(
+                f"{name:<10} {precision:<5} time={elapsed:8.2f}s "
+                f"score={result.sys_score:.4f} max_drift={drift:.4f} "
+                f"pearson={pearson:.4f}"
+            )
+            MODEL_REGISTRY.clear()
+
+
+if __name__ == "__main__":
+    main()
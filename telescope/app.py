@@ -12,6 +12,7 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import pandas as pd
 import streamlit as st
 import requests
 
@@ -20,13 +21,16 @@ from PIL import Image
 from telescope.filters import AVAILABLE_FILTERS
 from telescope.metrics import AVAILABLE_METRICS
 from telescope.metrics.result import PairwiseResult
+from telescope.metrics.utils import PRECISIONS
 from telescope.plotting import (
     plot_bootstraping_result,
     plot_bucket_comparison,
     plot_pairwise_distributions,
+    plot_randomization_results,
     plot_segment_comparison,
 )
-from telescope.testset import PairwiseTestset
+from telescope.metrics.metric import bootstrap_systems
+from telescope.testset import MultipleTestset, PairwiseTestset
 
 available_metrics = {m.name: m for m in AVAILABLE_METRICS}
 available_filters = {f.name: f for f in AVAILABLE_FILTERS}
@@ -41,6 +45,16 @@ logo = load_image("https://github.com/Unbabel/MT-Telescope/blob/master/data/mt-t
 st.sidebar.image(logo)
 
 # --------------------  APP Settings --------------------
+comparison = st.sidebar.radio(
+    "Systems to compare:",
+    ["Two systems", "Multiple systems"],
+    index=0,
+    help=(
+        "With multiple systems, Bootstrap resampling draws the partitions once for "
+        "all systems and metrics and reports the win rate of each pair of systems."
+    ),
+)
+
 metrics = st.sidebar.multiselect(
     "Select the system-level metric you wish to run:",
     list(available_metrics.keys()),
@@ -53,8 +67,22 @@ metric = st.sidebar.selectbox(
     index=0,
 )
 
+precision = st.sidebar.selectbox(
+    "Inference precision of neural metrics:",
+    PRECISIONS,
+    index=0,
+    help=(
+        "'bf16' runs COMET and BERTScore under bfloat16 autocast and 'int8' "
+        "quantizes their linear layers (CPU only). Both are faster on CPU at the "
+        "cost of small score differences."
+    ),
+)
+
 filters = st.sidebar.multiselect(
-    "Select testset filters:", list(available_filters.keys()), default=["duplicates"]
+    "Select testset filters:",
+    # The terminology filter needs a glossary file (see `telescope compare --glossary`)
+    [f for f in available_filters if f != "terminology"],
+    default=["duplicates"],
 )
 st.sidebar.subheader("Segment length constraints:")
 length_interval = st.sidebar.slider(
@@ -92,6 +120,40 @@ num_samples = st.sidebar.number_input(
 sample_ratio = st.sidebar.slider(
     "Proportion (P) of the initial sample:", 0.0, 1.0, value=0.5, step=0.1
 )
+bootstrap_method = st.sidebar.selectbox(
+    "Partition sampling:",
+    ["index", "poisson"],
+    index=0,
+    help=(
+        "'index' draws segment ids with replacement. 'poisson' gives each segment a "
+        "random Poisson weight and uses constant memory for very large testsets."
+    ),
+)
+early_stopping = st.sidebar.checkbox(
+    "Stop once the comparison converges",
+    value=False,
+    help=(
+        "Partitions are drawn in chunks and resampling stops as soon as the confidence "
+        "intervals of the win rates are narrower than the tolerance or one of the "
+        "systems wins more than 95% of the partitions."
+    ),
+)
+tolerance = (
+    st.sidebar.number_input(
+        "Tolerance:", min_value=0.001, max_value=0.5, value=0.02, step=0.005
+    )
+    if early_stopping
+    else None
+)
+
+st.sidebar.subheader("Approximate randomization settings:")
+num_trials = st.sidebar.number_input(
+    "Number of random shuffles:",
+    min_value=1,
+    max_value=100000,
+    value=1000,
+    step=500,
+)
 
 # --------------------- Streamlit APP Caching functions! --------------------------
 
@@ -104,7 +166,10 @@ def hash_metrics(metrics):
 
 
 @st.cache(
-    hash_funcs={PairwiseTestset: PairwiseTestset.hash_func},
+    hash_funcs={
+        PairwiseTestset: PairwiseTestset.hash_func,
+        MultipleTestset: MultipleTestset.hash_func,
+    },
     suppress_st_warning=True,
     show_spinner=False,
     allow_output_mutation=True,
@@ -112,52 +177,95 @@ def hash_metrics(metrics):
     max_entries=cache_max_entries,
 )
 def apply_filters(testset, filters):
-    filters = [available_filters[f](testset, *length_interval) for f in filters]
-    for filter in filters:
-        with st.spinner(f"Applying {filter.name} filter..."):
-            testset.apply_filter(filter)
-
-    # HACK
-    # I'll add a new prefix to all testset filenames to "fool" streamlit cache
-    filter_prefix = " ".join([f.name for f in filters]) + str(length_interval)
-    testset.filenames = [filter_prefix + f for f in testset.filenames]
+    # Each filter is built on the view left by the previous ones
+    for name in filters:
+        with st.spinner(f"Applying {name} filter..."):
+            testset = testset.apply_filter(
+                available_filters[name](testset, *length_interval)
+            )
     return testset
 
 
 @st.cache(
-    hash_funcs={PairwiseTestset: PairwiseTestset.hash_func},
+    hash_funcs={
+        PairwiseTestset: PairwiseTestset.hash_func,
+        MultipleTestset: MultipleTestset.hash_func,
+    },
     show_spinner=False,
     allow_output_mutation=True,
     ttl=cache_time,
     max_entries=cache_max_entries,
 )
-def run_metric(testset, metric):
+def run_metric(testset, metric, precision="fp32"):
     with st.spinner(f"Running {metric}..."):
-        metric = available_metrics[metric](language=testset.target_language)
+        if available_metrics[metric].reduced_precision:
+            metric = available_metrics[metric](
+                language=testset.target_language, precision=precision
+            )
+        else:
+            metric = available_metrics[metric](language=testset.target_language)
+        if isinstance(testset, MultipleTestset):
+            return metric.multiple_comparison(testset)
         return metric.pairwise_comparison(testset)
 
 
-def run_all_metrics(testset, metrics, filters):
+def run_all_metrics(testset, metrics, filters, precision="fp32"):
+    """Returns the filtered testset and the results of each metric on it."""
     if filters:
         corpus_size = len(testset)
         testset = apply_filters(testset, filters)
         st.success(
             "Corpus reduced in {:.2f}%".format((1 - (len(testset) / corpus_size)) * 100)
         )
-    return {metric: run_metric(testset, metric) for metric in metrics}
+    return testset, {
+        metric: run_metric(testset, metric, precision) for metric in metrics
+    }
 
 
 # --------------------  APP  --------------------
 
 st.title("Welcome to MT-Telescope!")
-testset = PairwiseTestset.read_data()
+if comparison == "Multiple systems":
+    testset = MultipleTestset.read_data()
+else:
+    testset = PairwiseTestset.read_data()
+
+if isinstance(testset, MultipleTestset):
+    testset, results = run_all_metrics(testset, metrics, filters, precision)
+    systems = testset.system_names
+    st.dataframe(
+        pd.DataFrame(
+            {m: [results[m][name].sys_score for name in systems] for m in results},
+            index=systems,
+        )
+    )
+
+    if st.button("Perform Bootstrap Resampling:"):
+        st.warning(
+            "Running metrics for {} partitions of size {}".format(
+                num_samples, sample_ratio * len(testset)
+            )
+        )
+        st.header("Bootstrap resampling results:")
+        with st.spinner("Running bootstrap resampling..."):
+            bootstrap_results = bootstrap_systems(
+                [available_metrics[m] for m in metrics],
+                testset,
+                int(num_samples),
+                sample_ratio,
+                results,
+            )
+        for m in metrics:
+            st.subheader(f"{m}: % of partitions where the row system wins")
+            st.dataframe(bootstrap_results[m].win_rates_to_dataframe())
 
-if testset:
+elif testset:
     if metric not in metrics:
         metrics = [
             metric,
         ] + metrics
-    results = run_all_metrics(testset, metrics, filters)
+    # Significance tests run on the same filtered segments as the metrics
+    testset, results = run_all_metrics(testset, metrics, filters, precision)
     if len(results) > 0:
         st.dataframe(PairwiseResult.results_to_dataframe(list(results.values())))
 
@@ -173,8 +281,8 @@ if testset:
         plot_pairwise_distributions(results[metric])
 
         # Bootstrap Resampling
-        _, middle, _ = st.beta_columns(3)
-        if middle.button("Perform Bootstrap Resampling:"):
+        _, left, right, _ = st.beta_columns(4)
+        if left.button("Perform Bootstrap Resampling:"):
             st.warning(
                 "Running metrics for {} partitions of size {}".format(
                     num_samples, sample_ratio * len(testset)
@@ -184,7 +292,25 @@ if testset:
             with st.spinner("Running bootstrap resampling..."):
                 for metric in metrics:
                     bootstrap_result = available_metrics[metric].bootstrap_resampling(
-                        testset, int(num_samples), sample_ratio, results[metric]
+                        testset,
+                        int(num_samples),
+                        sample_ratio,
+                        results[metric],
+                        tolerance=tolerance,
+                        method=bootstrap_method,
                     )
 
                     plot_bootstraping_result(bootstrap_result)
+
+        # Approximate Randomization
+        if right.button("Perform Approximate Randomization:"):
+            st.header("Approximate randomization results:")
+            with st.spinner("Running approximate randomization..."):
+                plot_randomization_results(
+                    [
+                        available_metrics[metric].approximate_randomization(
+                            testset, int(num_trials), results[metric]
+                        )
+                        for metric in metrics
+                    ]
+                )
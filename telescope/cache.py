@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""
+Segment-score cache
+==============
+    Persistent key/value store for segment scores backed by SQLite. Keys are
+    content hashes of the scored (src, mt, ref) triple and of the metric/model
+    identity, so unchanged segments are never scored twice.
+
+    Set the `TELESCOPE_DISABLE_CACHE` environment variable to disable it.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from telescope.utils import telescope_cache_folder
+
+DEFAULT_MAX_ENTRIES = 5_000_000
+# SQLite limits the number of variables in a single statement
+QUERY_SIZE = 500
+
+
+def segment_key(namespace: str, src: str, mt: str, ref: str) -> str:
+    """Content hash that identifies the score of a segment for a given metric."""
+    content = "\x1f".join([namespace, src or "", mt, ref])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class SegmentCache:
+    """
+    SQLite key/value store in WAL mode so that several processes and threads can
+    read and write it at the same time (each thread opens its own connection). Each
+    value is a float64 vector and entries are evicted in least-recently-used order
+    once the cache holds more than `max_entries`, down to 99% of it so that the
+    cache is not counted again on every write.
+
+    :param path: Database file (defaults to `segment-scores.sqlite` inside the
+        telescope cache folder).
+    :param max_entries: Maximum number of cached segments.
+    :param timeout: Seconds to wait for a lock held by another process.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        timeout: float = 60.0,
+    ):
+        self.path = path or telescope_cache_folder() + "segment-scores.sqlite"
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._local = threading.local()
+        # Upper bound of the number of entries (replaced keys are counted twice)
+        self._size = None
+        self._size_lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Connections cannot be shared between threads or with forked processes
+        local = self._local
+        if getattr(local, "connection", None) is None or local.pid != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=self.timeout)
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            local.connection.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, last_access REAL NOT NULL)"
+            )
+            local.connection.execute(
+                "CREATE INDEX IF NOT EXISTS scores_last_access ON scores (last_access)"
+            )
+            local.connection.commit()
+            local.pid = os.getpid()
+        return local.connection
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Returns the cached values of the given keys (missing keys are skipped)."""
+        keys = list(dict.fromkeys(keys))
+        values = {}
+        with self.connection as connection:
+            for i in range(0, len(keys), QUERY_SIZE):
+                batch = keys[i : i + QUERY_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = connection.execute(
+                    f"SELECT key, value FROM scores WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, value in rows:
+                    values[key] = np.frombuffer(value, dtype=np.float64)
+                if rows:
+                    connection.execute(
+                        "UPDATE scores SET last_access = ? WHERE key IN ({})".format(
+                            ",".join("?" * len(rows))
+                        ),
+                        [time.time()] + [key for key, _ in rows],
+                    )
+        return values
+
+    def set_many(self, values: Dict[str, np.ndarray]) -> None:
+        """Stores the given values and evicts the least recently used entries."""
+        now = time.time()
+        with self.connection as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO scores (key, value, last_access) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(value, dtype=np.float64).tobytes(), now)
+                    for key, value in values.items()
+                ],
+            )
+        with self._size_lock:
+            if self._size is None:
+                self._size = len(self)
+            else:
+                self._size += len(values)
+            if self._size > self.max_entries:
+                self.evict()
+
+    def evict(self) -> None:
+        """Evicts the least recently used entries down to 99% of `max_entries`."""
+        size = len(self)
+        if size > self.max_entries:
+            excess = size - (self.max_entries - self.max_entries // 100)
+            with self.connection as connection:
+                connection.execute(
+                    "DELETE FROM scores WHERE key IN "
+                    "(SELECT key FROM scores ORDER BY last_access LIMIT ?)",
+                    (excess,),
+                )
+            size -= excess
+        self._size = size
+
+    def clear(self) -> None:
+        with self.connection as connection:
+            connection.execute("DELETE FROM scores")
+        self._size = 0
+
+
+_segment_cache = None
+
+
+def get_segment_cache() -> Optional[SegmentCache]:
+    """Shared segment cache or None if `TELESCOPE_DISABLE_CACHE` is set."""
+    global _segment_cache
+    if os.environ.get("TELESCOPE_DISABLE_CACHE"):
+        return None
+    if _segment_cache is None:
+        _segment_cache = SegmentCache()
+    return _segment_cache
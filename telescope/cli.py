@@ -17,15 +17,21 @@ MT-Telescope command line interface (CLI)
 ==============
 Main commands:
     - score     Used to download Machine Translation metrics.
+    - rank      Compares any number of systems with a shared Bootstrap resampling.
 """
 from typing import List, Union, Tuple
 import os
 import click
 import json
+import numpy as np
+import pandas as pd
 
 from telescope.metrics import AVAILABLE_METRICS, PairwiseResult
-from telescope.testset import PairwiseTestset
+from telescope.metrics.metric import Metric, bootstrap_systems
+from telescope.metrics.utils import PRECISIONS
+from telescope.testset import MultipleTestset, PairwiseTestset
 from telescope.filters import AVAILABLE_FILTERS
+from telescope.utils import MappedLines
 from telescope.plotting import (
     plot_segment_comparison,
     plot_pairwise_distributions,
@@ -36,8 +42,17 @@ available_metrics = {m.name: m for m in AVAILABLE_METRICS}
 available_filters = {f.name: f for f in AVAILABLE_FILTERS}
 
 
-def readlines(ctx, param, file: click.File) -> List[str]:
-    return [l.strip() for l in file.readlines()]
+def build_metric(
+    name: str, language: str, precision: str = "fp32", n_procs: int = 1
+) -> Metric:
+    """Instantiates a metric passing precision and processes only to the metrics
+    that support them."""
+    options = {}
+    if available_metrics[name].reduced_precision:
+        options["precision"] = precision
+    if available_metrics[name].sharded_inference:
+        options["n_procs"] = n_procs
+    return available_metrics[name](language=language, **options)
 
 
 def output_folder_exists(ctx, param, output_folder):
@@ -57,28 +72,28 @@ def telescope():
     "-s",
     required=True,
     help="Source segments.",
-    type=click.File(),
+    type=click.Path(exists=True, dir_okay=False),
 )
 @click.option(
     "--system_x",
     "-x",
     required=True,
     help="System X MT outputs.",
-    type=click.File(),
+    type=click.Path(exists=True, dir_okay=False),
 )
 @click.option(
     "--system_y",
     "-y",
     required=True,
     help="System Y MT outputs.",
-    type=click.File(),
+    type=click.Path(exists=True, dir_okay=False),
 )
 @click.option(
     "--reference",
     "-r",
     required=True,
     help="Reference segments.",
-    type=click.File(),
+    type=click.Path(exists=True, dir_okay=False),
 )
 @click.option(
     "--language",
@@ -117,6 +132,16 @@ def telescope():
     default=0.0,
     help="Max interval value for length filtering.",
 )
+@click.option(
+    "--glossary",
+    required=False,
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help=(
+        "Tab-separated glossary (source term and its translations) used by the "
+        "terminology filter."
+    ),
+)
 @click.option(
     "--seg_metric",
     type=click.Choice([m.name for m in available_metrics.values() if m.segment_level]),
@@ -133,7 +158,14 @@ def telescope():
     type=str,
     help="Folder you wish to use to save plots.",
 )
-@click.option("--bootstrap", is_flag=True)
+@click.option("--bootstrap", is_flag=True, help="Same as '--significance bootstrap'.")
+@click.option(
+    "--significance",
+    type=click.Choice(["bootstrap", "ar"]),
+    required=False,
+    default=None,
+    help="Statistical significance test: Bootstrap resampling or paired approximate randomization.",
+)
 @click.option(
     "--num_splits",
     required=False,
@@ -148,38 +180,129 @@ def telescope():
     type=float,
     help="Folder you wish to use to save plots.",
 )
+@click.option(
+    "--bootstrap_method",
+    type=click.Choice(["index", "poisson"]),
+    required=False,
+    default="index",
+    help=(
+        "How Bootstrap partitions are drawn: segment ids with replacement or "
+        "Poisson weights (constant memory, for very large testsets)."
+    ),
+)
+@click.option(
+    "--tolerance",
+    required=False,
+    default=None,
+    type=float,
+    help=(
+        "Stop Bootstrap resampling once the confidence intervals of the win rates "
+        "and of the mean difference are narrower than this value."
+    ),
+)
+@click.option(
+    "--decision_threshold",
+    required=False,
+    default=0.95,
+    type=float,
+    help="Stop Bootstrap resampling once the win rate of a system crosses this value.",
+)
+@click.option(
+    "--trials",
+    required=False,
+    default=1000,
+    type=int,
+    help="Number of random shuffles used in approximate randomization.",
+)
+@click.option(
+    "--seed",
+    required=False,
+    default=None,
+    type=int,
+    help="Seed used in the statistical significance tests.",
+)
+@click.option(
+    "--n_jobs",
+    required=False,
+    default=1,
+    type=int,
+    help="Number of processes used in Bootstrap resampling.",
+)
+@click.option(
+    "--precision",
+    type=click.Choice(PRECISIONS),
+    required=False,
+    default="fp32",
+    help=(
+        "Inference precision of neural metrics (COMET, BERTScore): fp32, bf16 "
+        "autocast or int8 dynamic quantization (CPU only)."
+    ),
+)
+@click.option(
+    "--n_procs",
+    required=False,
+    default=1,
+    type=int,
+    help=(
+        "Number of CPU processes used by neural metrics (COMET, BERTScore) to score "
+        "length-balanced shards of the segments."
+    ),
+)
 def compare(
-    source: click.File,
-    system_x: click.File,
-    system_y: click.File,
-    reference: click.File,
+    source: str,
+    system_x: str,
+    system_y: str,
+    reference: str,
     language: str,
     metric: Union[Tuple[str], str],
     filter: Union[Tuple[str], str],
     length_min_val: float,
     length_max_val: float,
+    glossary: str,
     seg_metric: str,
     output_folder: str,
     bootstrap: bool,
+    significance: str,
     num_splits: int,
     sample_ratio: float,
+    bootstrap_method: str,
+    tolerance: float,
+    decision_threshold: float,
+    trials: int,
+    seed: int,
+    n_jobs: int,
+    precision: str,
+    n_procs: int,
 ):
-    testset = PairwiseTestset(
-        src=[l.strip() for l in source.readlines()],
-        system_x=[l.strip() for l in system_x.readlines()],
-        system_y=[l.strip() for l in system_y.readlines()],
-        ref=[l.strip() for l in reference.readlines()],
-        language_pair="X-" + language,
-        filenames=[source.name, system_x.name, system_y.name, reference.name],
+    testset = PairwiseTestset.from_files(
+        source, system_x, system_y, reference, language_pair="X-" + language
     )
     corpus_size = len(testset)
     if filter:
-        filters = [available_filters[f](testset) for f in filter if f != "length"]
+        if "terminology" in filter and glossary is None:
+            raise click.ClickException("The terminology filter requires a --glossary.")
+        # Each filter is built on the view left by the previous ones, so the
+        # indexes it keeps are relative to that view
+        names = [f for f in filter if f != "length"]
         if "length" in filter:
-            filters.append(available_filters["length"](testset, int(length_min_val*100), int(length_max_val*100)))
-        
-        for filter in filters:
-            testset.apply_filter(filter)
+            names.append("length")
+        for name in names:
+            if name == "terminology":
+                segment_filter = available_filters[name](testset, glossary)
+                accuracy = segment_filter.term_accuracy()
+                click.secho(
+                    "Term accuracy: x = {:.4f}, y = {:.4f}.".format(
+                        accuracy["x"], accuracy["y"]
+                    ),
+                    fg="yellow",
+                )
+            elif name == "length":
+                segment_filter = available_filters[name](
+                    testset, int(length_min_val * 100), int(length_max_val * 100)
+                )
+            else:
+                segment_filter = available_filters[name](testset)
+            testset = testset.apply_filter(segment_filter)
 
         if (1 - (len(testset) / corpus_size)) * 100 == 100:
             click.secho("The current filters reduce the Corpus on 100%!", fg="ref")
@@ -211,31 +334,50 @@ def compare(
         )
 
     results = {
-        m: available_metrics[m](language=testset.target_language).pairwise_comparison(
-            testset
-        )
+        m: build_metric(
+            m, testset.target_language, precision, n_procs
+        ).pairwise_comparison(testset)
         for m in metric
     }
 
     # results_dict = PairwiseResult.results_to_dict(list(results.values()))
     results_df = PairwiseResult.results_to_dataframe(list(results.values()))
-    if bootstrap:
-        bootstrap_results = []
-        for m in metric:
-            bootstrap_result = available_metrics[m].bootstrap_resampling(
-                testset, num_splits, sample_ratio, results[m]
-            )
-            bootstrap_results.append(
-                available_metrics[m]
-                .bootstrap_resampling(testset, num_splits, sample_ratio, results[m])
-                .stats
+    if bootstrap or significance == "bootstrap":
+        # All metrics share the same partitions
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        bootstrap_results = [
+            available_metrics[m]
+            .bootstrap_resampling(
+                testset,
+                num_splits,
+                sample_ratio,
+                results[m],
+                n_jobs,
+                seed,
+                tolerance,
+                decision_threshold,
+                method=bootstrap_method,
             )
+            .stats
+            for m in metric
+        ]
         bootstrap_results = {
             k: [dic[k] for dic in bootstrap_results] for k in bootstrap_results[0]
         }
         for k, v in bootstrap_results.items():
             results_df[k] = v
 
+    if significance == "ar":
+        ar_results = [
+            available_metrics[m]
+            .approximate_randomization(testset, trials, results[m], seed=seed)
+            .stats
+            for m in metric
+        ]
+        for k in ar_results[0]:
+            results_df[k] = [dic[k] for dic in ar_results]
+
     click.secho(str(results_df), fg="yellow")
     if output_folder != "":
         if not output_folder.endswith("/"):
@@ -252,24 +394,21 @@ def compare(
     "-s",
     required=True,
     help="Source segments.",
-    type=click.File(),
-    callback=readlines,
+    type=click.Path(exists=True, dir_okay=False),
 )
 @click.option(
     "--translation",
     "-t",
     required=True,
     help="MT outputs.",
-    type=click.File(),
-    callback=readlines,
+    type=click.Path(exists=True, dir_okay=False),
 )
 @click.option(
     "--reference",
     "-r",
     required=True,
     help="Reference segments.",
-    type=click.File(),
-    callback=readlines,
+    type=click.Path(exists=True, dir_okay=False),
 )
 @click.option(
     "--language",
@@ -285,26 +424,221 @@ def compare(
     multiple=True,
     help="MT metric to run.",
 )
+@click.option(
+    "--precision",
+    type=click.Choice(PRECISIONS),
+    required=False,
+    default="fp32",
+    help=(
+        "Inference precision of neural metrics (COMET, BERTScore): fp32, bf16 "
+        "autocast or int8 dynamic quantization (CPU only)."
+    ),
+)
+@click.option(
+    "--n_procs",
+    required=False,
+    default=1,
+    type=int,
+    help=(
+        "Number of CPU processes used by neural metrics (COMET, BERTScore) to score "
+        "length-balanced shards of the segments."
+    ),
+)
 def score(
-    source: List[str],
-    translation: List[str],
-    reference: List[str],
+    source: str,
+    translation: str,
+    reference: str,
     language: str,
     metric: Union[Tuple[str], str],
+    precision: str,
+    n_procs: int,
 ):
+    files = [MappedLines(path) for path in (source, translation, reference)]
+    if not len(files[0]) == len(files[1]) == len(files[2]):
+        raise click.ClickException(
+            "mismatch between sources, translations and references ({}, {}, {})".format(
+                *[len(file) for file in files]
+            )
+        )
+
     metrics = metric
     for metric in metrics:
         if not available_metrics[metric].language_support(language):
             raise click.ClickException(f"{metric} does not support '{language}'")
-    results = []
-    for metric in metrics:
-        metric = available_metrics[metric](language)
-        results.append(metric.score(source, translation, reference))
+    results, segments = [], None
+    try:
+        for metric in metrics:
+            metric = build_metric(metric, language, precision, n_procs)
+            if metric.sufficient_stats:
+                # Sums the statistics of each chunk without decoding whole files
+                chunks = zip(*(file.iter_chunks() for file in files))
+                results.append(metric.score_stream(chunks, keep_seg_scores=False))
+            else:
+                if segments is None:
+                    segments = [file.tolist() for file in files]
+                results.append(metric.score(*segments))
+    finally:
+        for file in files:
+            file.close()
 
     for result in results:
         click.secho(str(result), fg="yellow")
 
 
+@telescope.command()
+@click.option(
+    "--source",
+    "-s",
+    required=True,
+    help="Source segments.",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--translation",
+    "-t",
+    required=True,
+    multiple=True,
+    help="MT outputs of a system (systems are named after their files).",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--reference",
+    "-r",
+    required=True,
+    help="Reference segments.",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--language",
+    "-l",
+    required=True,
+    help="Language of the evaluated text.",
+)
+@click.option(
+    "--metric",
+    "-m",
+    type=click.Choice(list(available_metrics.keys())),
+    required=True,
+    multiple=True,
+    help="MT metric to run.",
+)
+@click.option(
+    "--num_splits",
+    required=False,
+    default=300,
+    type=int,
+    help="Number of random partitions used in Bootstrap resampling.",
+)
+@click.option(
+    "--sample_ratio",
+    required=False,
+    default=0.5,
+    type=float,
+    help="Proportion of the testset used in each partition.",
+)
+@click.option(
+    "--seed",
+    required=False,
+    default=None,
+    type=int,
+    help="Seed used to draw the Bootstrap partitions.",
+)
+@click.option(
+    "--output_folder",
+    "-o",
+    required=False,
+    default="",
+    callback=output_folder_exists,
+    type=str,
+    help="Folder where the scores and win rates are saved.",
+)
+@click.option(
+    "--precision",
+    type=click.Choice(PRECISIONS),
+    required=False,
+    default="fp32",
+    help=(
+        "Inference precision of neural metrics (COMET, BERTScore): fp32, bf16 "
+        "autocast or int8 dynamic quantization (CPU only)."
+    ),
+)
+@click.option(
+    "--n_procs",
+    required=False,
+    default=1,
+    type=int,
+    help=(
+        "Number of CPU processes used by neural metrics (COMET, BERTScore) to score "
+        "length-balanced shards of the segments."
+    ),
+)
+def rank(
+    source: str,
+    translation: Tuple[str],
+    reference: str,
+    language: str,
+    metric: Tuple[str],
+    num_splits: int,
+    sample_ratio: float,
+    seed: int,
+    output_folder: str,
+    precision: str,
+    n_procs: int,
+):
+    """Scores several systems and reports, for each metric, the % of Bootstrap
+    partitions where each system beats each other system. The partitions are drawn
+    once and shared by all systems and metrics."""
+    if len(translation) < 2:
+        raise click.ClickException("rank needs at least two systems.")
+    try:
+        testset = MultipleTestset.from_files(
+            source, list(translation), reference, language_pair="X-" + language
+        )
+    except Exception as e:
+        raise click.ClickException(str(e))
+
+    results = {
+        m: build_metric(
+            m, testset.target_language, precision, n_procs
+        ).multiple_comparison(testset)
+        for m in metric
+    }
+    scores_df = pd.DataFrame(
+        {
+            m: [results[m][name].sys_score for name in testset.system_names]
+            for m in metric
+        },
+        index=testset.system_names,
+    )
+    click.secho(str(scores_df), fg="yellow")
+
+    bootstrap_results = bootstrap_systems(
+        [available_metrics[m] for m in metric],
+        testset,
+        num_splits,
+        sample_ratio,
+        results,
+        seed,
+    )
+    for m in metric:
+        click.secho(f"\n{m} win rates (row system beats column system):", fg="green")
+        click.secho(str(bootstrap_results[m].win_rates_to_dataframe()), fg="yellow")
+
+    if output_folder != "":
+        if not output_folder.endswith("/"):
+            output_folder += "/"
+        scores_df.to_json(output_folder + "results.json", orient="index", indent=4)
+        with open(output_folder + "win-rates.json", "w") as fp:
+            json.dump(
+                {
+                    m: bootstrap_results[m].win_rates_to_dataframe().to_dict("index")
+                    for m in metric
+                },
+                fp,
+                indent=4,
+            )
+
+
 @telescope.command()
 @click.pass_context
 def streamlit(ctx):
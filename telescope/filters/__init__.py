@@ -1,5 +1,6 @@
 from .ner import NERFilter
 from .length import LengthFilter
 from .duplicates import DuplicatesFilter
+from .terminology import TerminologyFilter
 
-AVAILABLE_FILTERS = [NERFilter, LengthFilter, DuplicatesFilter]
+AVAILABLE_FILTERS = [NERFilter, LengthFilter, DuplicatesFilter, TerminologyFilter]
@@ -12,23 +12,59 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from typing import List
+import os
+from typing import Dict, List
 
+import numpy as np
 import stanza
+from telescope.cache import get_segment_cache, segment_key
 from telescope.filters.filter import Filter
+from telescope.metrics.registry import default_device, load_model
 from telescope.testset import Testset
+from telescope.utils import directory_size
 
 STANZA_NER_LANGS = ["ar", "zh", "nl", "en", "fr", "de", "ru", "uk"]
 
 
+def load_pipeline(language: str) -> stanza.Pipeline:
+    """
+    Tokenize and NER pipeline of the language, loaded once per process. Models are
+    only downloaded if they are not in the stanza resources folder yet.
+    """
+
+    def loader():
+        return stanza.Pipeline(
+            lang=language,
+            processors="tokenize,ner",
+            download_method=stanza.DownloadMethod.REUSE_RESOURCES,
+            use_gpu=default_device() == "cuda",
+        )
+
+    folder = os.path.join(stanza.resources.common.DEFAULT_MODEL_DIR, language)
+    return load_model(
+        ("stanza", language, default_device()), loader, size=directory_size(folder)
+    )
+
+
 class NERFilter(Filter):
     name = "named-entities"
 
-    def __init__(self, testset: Testset, *args):
+    def __init__(self, testset: Testset, *args, batch_size: int = 256):
+        """
+        :param batch_size: Number of segments given to stanza at once. Segments are
+            sorted by length so that each batch holds segments of similar length.
+        """
         super().__init__(testset)
         self.set_language()
-        stanza.download(self.language)
-        self.engine = stanza.Pipeline(lang=self.language, processors="tokenize,ner")
+        self.batch_size = batch_size
+
+    @property
+    def engine(self) -> stanza.Pipeline:
+        return load_pipeline(self.language)
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"NER/{self.language}/stanza-{stanza.__version__}"
 
     def set_language(self) -> None:
         if self.testset.source_language in STANZA_NER_LANGS:
@@ -43,10 +79,28 @@ class NERFilter(Filter):
             )
 
     def apply_filter(self) -> List[int]:
-        segments_with_ne = []
-        for i, segment in enumerate(self.segments):
-            doc = self.engine(segment)
-            if doc.ents:
-                segments_with_ne.append(i)
+        has_entities = self.has_entities(self.segments)
+        return [i for i, segment in enumerate(self.segments) if has_entities[segment]]
+
+    def has_entities(self, segments: List[str]) -> Dict[str, bool]:
+        """
+        Whether each distinct segment contains named entities. Flags are kept in the
+        persistent segment cache (see `telescope.cache`), so only segments that were
+        never tagged go through stanza.
+        """
+        segments = list(dict.fromkeys(segments))
+        keys = {s: segment_key(self.cache_namespace, s, "", "") for s in segments}
+        cache = get_segment_cache()
+        cached = cache.get_many(keys.values()) if cache is not None else {}
+        flags = {s: bool(cached[keys[s]][0]) for s in segments if keys[s] in cached}
 
-        return segments_with_ne
+        missing = sorted((s for s in segments if s not in flags), key=len)
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i : i + self.batch_size]
+            docs = self.engine([stanza.Document([], text=s) for s in batch])
+            flags.update((s, bool(doc.ents)) for s, doc in zip(batch, docs))
+            if cache is not None:
+                cache.set_many(
+                    {keys[s]: np.array([flags[s]], dtype=np.float64) for s in batch}
+                )
+        return flags
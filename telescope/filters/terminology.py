@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""
+Terminology filter
+==============
+    Keeps the segments whose source contains glossary terms and reports how often
+    each system uses the glossary translations of those terms.
+
+    Glossaries are tab-separated files with a source term and its accepted
+    translations on each line. Terms are matched on token boundaries with
+    Aho-Corasick automata over tokens, so all the terms are found in a single pass
+    over the segments. The automata of each glossary are cached in the telescope
+    cache folder.
+"""
+import hashlib
+import os
+import pickle
+import re
+from collections import deque
+from typing import Dict, List, Sequence, Set, Tuple
+
+from telescope.filters.filter import Filter
+from telescope.testset import MultipleTestset, PairwiseTestset, Testset
+from telescope.utils import telescope_cache_folder
+
+# Words, CJK characters (scripts without spaces) and punctuation marks
+TOKEN_PATTERN = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]|\w+|[^\w\s]"
+)
+
+
+def term_tokens(text: str, lowercase: bool = True) -> Tuple[str, ...]:
+    return tuple(TOKEN_PATTERN.findall(text.lower() if lowercase else text))
+
+
+class TermAutomaton:
+    """Aho-Corasick automaton that finds token sequences (terms) in segments."""
+
+    def __init__(self, terms: Sequence[Tuple[str, ...]]) -> None:
+        self.goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for term, tokens in enumerate(terms):
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                if token not in self.goto[state]:
+                    self.goto[state][token] = len(self.goto)
+                    self.goto.append({})
+                    outputs.append([])
+                state = self.goto[state][token]
+            outputs[state].append(term)
+
+        # Failure links in breadth-first order: the longest proper suffix of each
+        # state that is also a state. Outputs include the outputs of that suffix.
+        self.fail = [0] * len(self.goto)
+        self.output: List[Tuple[int, ...]] = [()] * len(self.goto)
+        queue = deque([0])
+        while queue:
+            state = queue.popleft()
+            self.output[state] = tuple(outputs[state]) + self.output[self.fail[state]]
+            for token, child in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and token not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(token, 0)
+                self.fail[child] = fail if fail != child else 0
+                queue.append(child)
+
+    def find(self, tokens: Sequence[str]) -> Set[int]:
+        """Terms that occur in the given tokens."""
+        goto, fail, output = self.goto, self.fail, self.output
+        found, state = set(), 0
+        for token in tokens:
+            child = goto[state].get(token)
+            while child is None and state:
+                state = fail[state]
+                child = goto[state].get(token)
+            state = child or 0
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class Glossary:
+    """
+    Source terms and their accepted translations.
+
+    :param entries: (source term, translations) pairs.
+    :param lowercase: Matches terms regardless of their case.
+    """
+
+    def __init__(
+        self, entries: Sequence[Tuple[str, Sequence[str]]], lowercase: bool = True
+    ) -> None:
+        self.lowercase = lowercase
+        sources: Dict[Tuple[str, ...], int] = {}
+        targets: Dict[Tuple[str, ...], int] = {}
+        translations: Dict[int, Set[int]] = {}
+        for source, target_terms in entries:
+            term = sources.setdefault(term_tokens(source, lowercase), len(sources))
+            translations.setdefault(term, set()).update(
+                targets.setdefault(term_tokens(t, lowercase), len(targets))
+                for t in target_terms
+            )
+        self.source_terms = [" ".join(term) for term in sources]
+        self.translations = [frozenset(translations[t]) for t in range(len(sources))]
+        self.source_automaton = TermAutomaton(list(sources))
+        self.target_automaton = TermAutomaton(list(targets))
+
+    def __len__(self) -> int:
+        return len(self.source_terms)
+
+    @classmethod
+    def from_file(cls, path: str, lowercase: bool = True) -> "Glossary":
+        """Reads a tab-separated glossary (source term, then its translations),
+        reusing the automata cached for the same file contents."""
+        with open(path, "rb") as fp:
+            content = fp.read()
+        digest = hashlib.sha1(content + str(lowercase).encode("utf-8")).hexdigest()
+        cache_path = os.path.join(telescope_cache_folder(), "glossaries", digest + ".pkl")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as fp:
+                return pickle.load(fp)
+
+        entries = []
+        for line in content.decode("utf-8").splitlines():
+            fields = [field.strip() for field in line.split("\t")]
+            if fields[0]:
+                entries.append((fields[0], [f for f in fields[1:] if f]))
+        glossary = cls(entries, lowercase)
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as fp:
+            pickle.dump(glossary, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_path + ".tmp", cache_path)
+        return glossary
+
+    def find_source_terms(self, segments: List[str]) -> List[Set[int]]:
+        """Glossary terms found in each source segment."""
+        return [
+            self.source_automaton.find(term_tokens(s, self.lowercase)) for s in segments
+        ]
+
+    def term_accuracy(
+        self, source_terms: List[Set[int]], translations: List[str]
+    ) -> Tuple[int, int]:
+        """
+        Counts the source terms whose translation uses one of their glossary
+        translations. Terms without translations in the glossary are not counted.
+
+        :param source_terms: Terms of each source segment (`find_source_terms`).
+        :param translations: Translation of each source segment.
+        :return: Number of translated terms and number of terms.
+        """
+        hits, total = 0, 0
+        for terms, translation in zip(source_terms, translations):
+            terms = [t for t in terms if self.translations[t]]
+            if not terms:
+                continue
+            found = self.target_automaton.find(term_tokens(translation, self.lowercase))
+            hits += sum(1 for t in terms if self.translations[t] & found)
+            total += len(terms)
+        return hits, total
+
+
+class TerminologyFilter(Filter):
+    name = "terminology"
+
+    def __init__(self, testset: Testset, glossary: str, *args):
+        """
+        :param glossary: Path to a tab-separated glossary file.
+        """
+        super().__init__(testset)
+        self.glossary = Glossary.from_file(glossary)
+        self.source_terms = self.glossary.find_source_terms(testset.src)
+
+    def apply_filter(self) -> List[int]:
+        return [i for i, terms in enumerate(self.source_terms) if terms]
+
+    def term_accuracy(self) -> Dict[str, float]:
+        """Proportion of source terms translated with their glossary translation
+        by each system of the testset."""
+        if isinstance(self.testset, PairwiseTestset):
+            systems = {"x": self.testset.system_x, "y": self.testset.system_y}
+        elif isinstance(self.testset, MultipleTestset):
+            systems = self.testset.systems
+        else:
+            systems = {"mt": self.testset.mt}
+
+        accuracy = {}
+        for name, translations in systems.items():
+            hits, total = self.glossary.term_accuracy(self.source_terms, translations)
+            accuracy[name] = hits / total if total else 0.0
+        return accuracy
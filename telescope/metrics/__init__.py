@@ -8,7 +8,15 @@ from .comet import COMET
 from .ter import TER
 # from .prism import Prism
 from .gleu import GLEU
-from .result import MetricResult, PairwiseResult, BootstrapResult
+from .meteor import METEOR
+from .result import (
+    MetricResult,
+    PairwiseResult,
+    BootstrapResult,
+    MultipleBootstrapResult,
+    RandomizationResult,
+)
+from .metric import bootstrap_systems
 
 
 AVAILABLE_METRICS = [
@@ -21,4 +29,5 @@ AVAILABLE_METRICS = [
     TER,
     # Prism,
     GLEU,
+    METEOR,
 ]
@@ -12,35 +12,295 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from typing import List
+import hashlib
+import json
+import os
+from collections import defaultdict
+from functools import partial
+from typing import Dict, List, Tuple
 
 import bert_score
+import numpy as np
+import torch
+from torch.nn.utils.rnn import pad_sequence
 from telescope.metrics.bertscore.result import BERTScoreResult
 from telescope.metrics.metric import Metric
+from telescope.metrics.registry import default_device, load_model
+from telescope.metrics.result import PairwiseResult
+from telescope.metrics.utils import (
+    autocast,
+    check_precision,
+    length_sorted_batches,
+    quantize,
+    telescope_cache_folder,
+)
+from telescope.testset import MultipleTestset, PairwiseTestset
+
+# Token embeddings and IDF weights of a sentence
+SentenceStats = Tuple[torch.Tensor, torch.Tensor]
 
 
 class BERTScore(Metric):
 
     name = "BERTScore"
     segment_level = True
+    reduced_precision = True
+    sharded_inference = True
 
-    def score(self, src: List[str], cand: List[str], ref: List[str]) -> BERTScoreResult:
-        precision, recall, f1 = bert_score.score(
-            cands=cand,
-            refs=ref,
-            idf=False,
-            batch_size=3,
+    def __init__(
+        self,
+        language: str,
+        precision: str = "fp32",
+        n_procs: int = 1,
+        max_tokens: int = 4096,
+        idf: bool = False,
+    ):
+        """
+        :param precision: 'fp32', 'bf16' (autocast) or 'int8' (dynamic quantization
+            of the linear layers, CPU only).
+        :param n_procs: Number of CPU processes that score length-balanced shards of
+            the segments (see `Metric.sharded_scores`).
+        :param max_tokens: Maximum number of padded tokens that go through the model
+            in each batch. Sentences are sorted by length and packed up to this budget.
+        :param idf: Weights tokens by their inverse document frequency in the
+            references. IDF weights are computed once per set of references and
+            cached in the telescope cache folder.
+        """
+        super().__init__(language)
+        check_precision(precision, default_device())
+        self.precision = precision
+        self.n_procs = n_procs
+        self.max_tokens = max_tokens
+        self.idf = idf
+        self.idf_dict = None
+        self.idf_hash = None
+
+    @property
+    def scorer(self) -> bert_score.BERTScorer:
+        # Loaded on first use and shared by every BERTScore instance
+        return load_model(
+            (self.name, self.language.lower(), default_device(), self.precision),
+            self._load_scorer,
+        )
+
+    def _load_scorer(self) -> bert_score.BERTScorer:
+        scorer = bert_score.BERTScorer(
             lang=self.language,
+            idf=False,
             rescale_with_baseline=False,
-            verbose=True,
+            device=default_device(),
         )
-        return BERTScoreResult(
-            sum(f1.tolist()) / len(f1.tolist()),
-            f1.tolist(),
-            src,
-            cand,
-            ref,
-            self.name,
-            precision.tolist(),
-            recall.tolist(),
+        scorer._model = quantize(scorer._model, self.precision)
+        return scorer
+
+    @property
+    def cache_namespace(self) -> str:
+        model = bert_score.utils.lang2model[self.language.lower()]
+        if self.idf:
+            return f"{self.name}/{model}/{self.precision}/idf-{self.idf_hash}"
+        return f"{self.name}/{model}/{self.precision}"
+
+    def score(self, src: List[str], cand: List[str], ref: List[str]) -> BERTScoreResult:
+        return self.multiple_score(src, {"cand": cand}, ref)["cand"]
+
+    def pairwise_comparison(self, testset: PairwiseTestset) -> PairwiseResult:
+        results = self.multiple_score(
+            testset.src, {"x": testset.system_x, "y": testset.system_y}, testset.ref
+        )
+        return PairwiseResult(results["x"], results["y"])
+
+    def multiple_comparison(
+        self, testset: MultipleTestset
+    ) -> Dict[str, BERTScoreResult]:
+        return self.multiple_score(testset.src, testset.systems, testset.ref)
+
+    def multiple_score(
+        self,
+        src: List[str],
+        systems: Dict[str, List[str]],
+        ref: List[str],
+        chunk_size: int = 1024,
+    ) -> Dict[str, BERTScoreResult]:
+        """
+        Scores several candidate systems against the same references. References
+        are embedded once per chunk of segments and reused for every system, so only
+        the candidates are embedded per system. With `n_procs > 1` references are
+        embedded in this process and only the candidates are embedded in the forked
+        workers, so the reference embeddings are kept for the next systems.
+
+        :param src: Source segments.
+        :param systems: Dictionary with the MT outputs of each system.
+        :param ref: Reference segments.
+        :param chunk_size: Number of segments whose embeddings are kept in memory.
+        """
+        if self.idf:
+            self.idf_dict, self.idf_hash = self.load_idf(ref)
+
+        scores = {name: [] for name in systems}
+        for start in range(0, len(ref), chunk_size):
+            end = start + chunk_size
+            ref_stats = {}
+            for name, cand in systems.items():
+                scores[name].append(
+                    self.cached_scores(
+                        src[start:end] if src is not None else None,
+                        cand[start:end],
+                        ref[start:end],
+                        partial(self._predict, ref_stats),
+                        sharded=False,
+                    )
+                )
+
+        results = {}
+        for name, cand in systems.items():
+            precision, recall, f1 = np.concatenate(scores[name]).T
+            results[name] = BERTScoreResult(
+                sum(f1.tolist()) / len(f1.tolist()),
+                f1.tolist(),
+                src,
+                cand,
+                ref,
+                self.name,
+                precision.tolist(),
+                recall.tolist(),
+                self.precision,
+            )
+        return results
+
+    def load_idf(self, ref: List[str]) -> Tuple[Dict[int, float], str]:
+        """Returns the IDF weights of the given references and their hash, computing
+        them only if they are not in the cache folder yet."""
+        model = bert_score.utils.lang2model[self.language.lower()]
+        digest = hashlib.sha1(model.encode("utf-8"))
+        for r in ref:
+            digest.update(r.encode("utf-8") + b"\n")
+        idf_hash = digest.hexdigest()
+
+        path = os.path.join(telescope_cache_folder(), "bertscore-idf", idf_hash + ".json")
+        if os.path.exists(path):
+            with open(path) as fp:
+                weights = json.load(fp)
+        else:
+            idf_dict = bert_score.utils.get_idf_dict(ref, self.scorer._tokenizer)
+            weights = {
+                "default": idf_dict.default_factory(),
+                "weights": {str(k): v for k, v in idf_dict.items()},
+            }
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w") as fp:
+                json.dump(weights, fp)
+            os.replace(path + ".tmp", path)
+
+        default = weights["default"]
+        idf_dict = defaultdict(lambda: default)
+        idf_dict.update({int(k): v for k, v in weights["weights"].items()})
+        return idf_dict, idf_hash
+
+    def segment_costs(
+        self, src: List[str], cand: List[str], ref: List[str]
+    ) -> np.ndarray:
+        # Loads the scorer before the workers are forked
+        tokenizer = self.scorer._tokenizer
+        cand_ids, ref_ids = tokenizer(cand)["input_ids"], tokenizer(ref)["input_ids"]
+        return np.array([len(c) + len(r) for c, r in zip(cand_ids, ref_ids)])
+
+    def _predict(
+        self,
+        ref_stats: Dict[str, SentenceStats],
+        src: List[str],
+        cand: List[str],
+        ref: List[str],
+    ) -> np.ndarray:
+        """Scores the candidates reusing (and filling) the given reference stats.
+        Missing reference stats are computed in this process before the candidates
+        are scored (in `n_procs` forked workers that inherit them)."""
+        missing = [r for r in dict.fromkeys(ref) if r not in ref_stats]
+        ref_stats.update(zip(missing, self._embed(missing)))
+        score_fn = partial(self._score_candidates, ref_stats)
+        if self.n_procs > 1:
+            return self.sharded_scores(score_fn, src, cand, ref)
+        return score_fn(src, cand, ref)
+
+    def _score_candidates(
+        self,
+        ref_stats: Dict[str, SentenceStats],
+        src: List[str],
+        cand: List[str],
+        ref: List[str],
+    ) -> np.ndarray:
+        """Embeds the candidates and matches them with the given reference stats."""
+        unique_cand = list(dict.fromkeys(cand))
+        cand_stats = dict(zip(unique_cand, self._embed(unique_cand)))
+        return self._greedy_match(
+            [ref_stats[r] for r in ref], [cand_stats[c] for c in cand]
+        )
+
+    def _idf_weights(self) -> Dict[int, float]:
+        if self.idf:
+            return self.idf_dict
+        # Same weights as `bert_score.BERTScorer` without IDF
+        tokenizer = self.scorer._tokenizer
+        idf_dict = defaultdict(lambda: 1.0)
+        idf_dict[tokenizer.sep_token_id] = 0
+        idf_dict[tokenizer.cls_token_id] = 0
+        return idf_dict
+
+    def _embed(self, sentences: List[str]) -> List[SentenceStats]:
+        """Token embeddings and IDF weights of each sentence, computed in
+        length-sorted batches."""
+        scorer = self.scorer
+        lengths = [
+            len(bert_score.utils.sent_encode(scorer._tokenizer, s)) for s in sentences
+        ]
+        idf_dict = self._idf_weights()
+        stats = [None] * len(sentences)
+        device = default_device()
+        with torch.inference_mode(), autocast(self.precision, device):
+            for batch in length_sorted_batches(lengths, self.max_tokens):
+                embeddings, masks, idf = bert_score.utils.get_bert_embedding(
+                    [sentences[i] for i in batch],
+                    scorer._model,
+                    scorer._tokenizer,
+                    idf_dict,
+                    device=device,
+                )
+                for j, i in enumerate(batch):
+                    length = int(masks[j].sum())
+                    stats[i] = (
+                        embeddings[j, :length].float().cpu(),
+                        idf[j, :length].float().cpu(),
+                    )
+        return stats
+
+    def _greedy_match(
+        self, ref_stats: List[SentenceStats], cand_stats: List[SentenceStats]
+    ) -> np.ndarray:
+        """Greedy cosine matching of `bert_score` in batches of similar length.
+
+        :return: Matrix with the precision, recall and F1 of each segment.
+        """
+        lengths = [
+            max(len(r[0]), len(c[0])) for r, c in zip(ref_stats, cand_stats)
+        ]
+        scores = np.empty((len(lengths), 3))
+        with torch.inference_mode():
+            for batch in length_sorted_batches(lengths, self.max_tokens):
+                precision, recall, f1 = bert_score.utils.greedy_cos_idf(
+                    *self._pad([ref_stats[i] for i in batch]),
+                    *self._pad([cand_stats[i] for i in batch]),
+                )
+                scores[batch] = torch.stack([precision, recall, f1], dim=1).numpy()
+        return scores
+
+    @staticmethod
+    def _pad(
+        stats: List[SentenceStats],
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        embeddings, idf = zip(*stats)
+        lengths = torch.tensor([len(e) for e in embeddings])
+        masks = torch.arange(int(lengths.max()))[None, :] < lengths[:, None]
+        return (
+            pad_sequence(embeddings, batch_first=True, padding_value=2.0),
+            masks,
+            pad_sequence(idf, batch_first=True),
         )
@@ -28,11 +28,13 @@ class BERTScoreResult(MetricResult):
         metric: str,
         precision: List[float],
         recall: List[float],
+        inference_precision: str = "fp32",
     ) -> None:
         super().__init__(sys_score, seg_scores, src, cand, ref, metric)
         self.precision = precision
         self.recall = recall
         self.f1 = seg_scores
+        self.inference_precision = inference_precision
 
     def __str__(self):
         precision_score = sum(self.precision) / len(self.precision)
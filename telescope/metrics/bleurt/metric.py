@@ -14,9 +14,12 @@
 # limitations under the License.
 import os
 
+import numpy as np
+
 from telescope.metrics.bleurt.result import BLEURTResult
 from telescope.metrics.metric import Metric
-from telescope.utils import telescope_cache_folder
+from telescope.metrics.registry import load_model
+from telescope.utils import directory_size, telescope_cache_folder
 from torchnlp.download import download_file_maybe_extract
 
 from bleurt import score
@@ -36,16 +39,18 @@ class BLEURT(Metric):
         import tensorflow.compat.v1 as tf
 
         flags = tf.flags
-        flags.DEFINE_string("source", "", help="Source segments", required=False)
-        flags.DEFINE_string("s", "", help="Source segments", required=False)
-        flags.DEFINE_string("hypothesis", "", help="MT segments", required=False)
-        flags.DEFINE_string("h", "", help="MT segments", required=False)
-        flags.DEFINE_string("reference", "", help="Reference segments", required=False)
-        flags.DEFINE_string("r", "", help="Reference segments", required=False)
-        flags.DEFINE_string("language", "", help="Language", required=False)
-        flags.DEFINE_string("l", "", help="Language", required=False)
-        flags.DEFINE_string("metric", "", help="Metric to run.", required=False)
-        flags.DEFINE_string("m", "", help="Metric to run.", required=False)
+        # Flags can only be defined once per process
+        if "source" not in flags.FLAGS:
+            flags.DEFINE_string("source", "", help="Source segments", required=False)
+            flags.DEFINE_string("s", "", help="Source segments", required=False)
+            flags.DEFINE_string("hypothesis", "", help="MT segments", required=False)
+            flags.DEFINE_string("h", "", help="MT segments", required=False)
+            flags.DEFINE_string("reference", "", help="Reference segments", required=False)
+            flags.DEFINE_string("r", "", help="Reference segments", required=False)
+            flags.DEFINE_string("language", "", help="Language", required=False)
+            flags.DEFINE_string("l", "", help="Language", required=False)
+            flags.DEFINE_string("metric", "", help="Metric to run.", required=False)
+            flags.DEFINE_string("m", "", help="Metric to run.", required=False)
 
         self.model = model
         if not os.path.isdir(telescope_cache_folder() + model):
@@ -53,15 +58,27 @@ class BLEURT(Metric):
                 url=f"https://storage.googleapis.com/bleurt-oss/{model}.zip",
                 directory=telescope_cache_folder(),
             )
-        self.scorer = score.BleurtScorer(telescope_cache_folder() + model)
+        checkpoint = telescope_cache_folder() + model
+        self.scorer = load_model(
+            (self.name, model),
+            lambda: score.BleurtScorer(checkpoint),
+            size=directory_size(checkpoint),
+        )
         self.system_only = False
 
     @classmethod
     def language_support(self, language):
         return language == "en"
 
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}/{self.model}"
+
     def score(self, src, cand, ref):
-        scores = self.scorer.score(references=ref, candidates=cand)
+        scores = self.cached_scores(src, cand, ref, self._predict)[:, 0].tolist()
         return BLEURTResult(
             sum(scores) / len(scores), scores, src, cand, ref, self.name, self.model
         )
+
+    def _predict(self, src, cand, ref):
+        return np.array(self.scorer.score(references=ref, candidates=cand))[:, None]
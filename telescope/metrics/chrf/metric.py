@@ -14,16 +14,51 @@
 # limitations under the License.
 from typing import List
 
+import numpy as np
 import sacrebleu
 from telescope.metrics.chrf.result import chrFResult
+from telescope.metrics.lexical import chrf_stats
 from telescope.metrics.metric import Metric
 
 
 class chrF(Metric):
 
     name = "chrF"
-    segment_level = False
+    segment_level = True
+    sufficient_stats = True
+
+    def __init__(self, language: str):
+        super().__init__(language)
+        self.chrf = sacrebleu.CHRF()
 
     def score(self, src: List[str], cand: List[str], ref: List[str]) -> chrFResult:
-        chrf = sacrebleu.corpus_chrf(cand, [ref])
-        return chrFResult(chrf.score/100, [], src, cand, ref, self.name)
+        stats = self.segment_stats(src, cand, ref)
+        return self.stats_result(
+            stats.sum(axis=0), self.segment_scores(stats).tolist(), src, cand, ref
+        )
+
+    def stats_result(self, stats, seg_scores, src, cand, ref) -> chrFResult:
+        chrf = self.chrf._compute_score_from_stats(stats.astype(int).tolist())
+        return chrFResult(chrf.score/100, seg_scores, src, cand, ref, self.name)
+
+    def segment_stats(self, src: List[str], cand: List[str], ref: List[str]) -> np.ndarray:
+        """ Returns the [hyp, ref, match] n-gram counts of each order for each segment. """
+        return chrf_stats(cand, ref, self.chrf.char_order, self.chrf.whitespace)
+
+    def aggregate_stats(self, stats: np.ndarray) -> np.ndarray:
+        """ Vectorized version of `sacrebleu.CHRF._compute_f_score`. """
+        stats = np.asarray(stats, dtype=np.float64)
+        n_hyp, n_ref, n_match = stats[..., 0::3], stats[..., 1::3], stats[..., 2::3]
+        factor = self.chrf.beta ** 2
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # sacreBLEU <2.0.0 style effective order smoothing
+            effective = (n_hyp > 0) & (n_ref > 0)
+            effective_order = effective.sum(axis=-1)
+            avg_prec = np.where(effective, n_match / n_hyp, 0.0).sum(axis=-1)
+            avg_rec = np.where(effective, n_match / n_ref, 0.0).sum(axis=-1)
+            avg_prec = np.where(effective_order > 0, avg_prec / effective_order, 0.0)
+            avg_rec = np.where(effective_order > 0, avg_rec / effective_order, 0.0)
+            scores = (1 + factor) * avg_prec * avg_rec / (factor * avg_prec + avg_rec)
+
+        return np.where(avg_prec + avg_rec > 0, scores, 0.0)
@@ -13,15 +13,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
-from typing import List
+from contextlib import contextmanager
+from functools import partial
+from typing import Dict, List
 
+import numpy as np
 import torch
 from pytorch_lightning.trainer.trainer import Trainer
+from telescope.metrics.comet.onnx_backend import Estimator, ONNXModel, export_model
 from telescope.metrics.comet.result import COMETResult
 from telescope.metrics.metric import Metric
+from telescope.metrics.registry import default_device, load_model
+from telescope.metrics.result import PairwiseResult
+from telescope.metrics.utils import (
+    autocast,
+    check_precision,
+    length_sorted_batches,
+    quantize,
+)
+from telescope.testset import MultipleTestset, PairwiseTestset
+from telescope.utils import directory_size
 from torch.utils.data import DataLoader
 
 from comet import download_model, load_from_checkpoint
+from comet.models import ReferencelessRegression, RegressionMetric
 
 if "COMET_MODEL" in os.environ:
     MODELNAME = os.environ["COMET_MODEL"]
@@ -32,27 +47,297 @@ else:
 class COMET(Metric):
 
     name = "COMET"
+    reduced_precision = True
+    sharded_inference = True
     system_only = False
 
-    def __init__(self, language=None, modelname: str = MODELNAME, **kwargs):
+    def __init__(
+        self,
+        language=None,
+        modelname: str = MODELNAME,
+        max_tokens: int = 3072,
+        num_threads: int = None,
+        precision: str = "fp32",
+        backend: str = "torch",
+        n_procs: int = 1,
+        **kwargs,
+    ):
+        """
+        :param modelname: COMET model to download and load.
+        :param max_tokens: Maximum number of padded tokens that go through the encoder
+            in each batch. Segments are sorted by length and packed up to this budget.
+        :param num_threads: Number of CPU threads used by torch during inference.
+        :param precision: 'fp32', 'bf16' (autocast) or 'int8' (dynamic quantization
+            of the linear layers, CPU only).
+        :param backend: 'torch' or 'onnx'. The ONNX backend exports the encoder and
+            estimator once (see `telescope.metrics.comet.onnx_backend`) and runs them
+            on CPU with ONNX Runtime.
+        :param n_procs: Number of CPU processes that score length-balanced shards of
+            the segments (see `Metric.sharded_scores`).
+        """
+        check_precision(precision, default_device())
+        if backend not in ("torch", "onnx"):
+            raise Exception(f"Unknown backend '{backend}'. Choose 'torch' or 'onnx'.")
+        if backend == "onnx" and precision != "fp32":
+            raise Exception("The ONNX backend only supports fp32 precision.")
+
         self.modelname = modelname
-        self.model = load_from_checkpoint(download_model(modelname))
+        self.max_tokens = max_tokens
+        self.num_threads = num_threads
+        self.precision = precision
+        self.backend = backend
+        self.n_procs = n_procs
+        self.model = load_model(
+            (self.name, modelname, default_device(), precision),
+            lambda: quantize(load_from_checkpoint(download_model(modelname)), precision),
+        )
+        self.onnx_model = None
+        if backend == "onnx":
+            if not self.shared_encoding:
+                raise Exception(f"{modelname} cannot be exported to ONNX.")
+            folder = export_model(self.model, modelname)
+            self.onnx_model = load_model(
+                (self.name, modelname, "onnx", num_threads),
+                lambda: ONNXModel(folder, num_threads),
+                size=directory_size(folder),
+            )
+
+    @property
+    def cache_namespace(self) -> str:
+        if self.onnx_model is not None:
+            return f"{self.name}/{self.modelname}/onnx"
+        return f"{self.name}/{self.modelname}/{self.precision}"
+
+    @property
+    def shared_encoding(self) -> bool:
+        """Estimator-based models embed each sentence independently, so source and
+        reference embeddings can be reused across candidate systems."""
+        return isinstance(self.model, RegressionMetric) and not isinstance(
+            self.model, ReferencelessRegression
+        )
+
+    @property
+    def direct_inference(self) -> bool:
+        """Regression models score a batch with a single forward pass, which is all
+        their `predict_step` does. Other models (e.g. ranking models) go through the
+        Lightning Trainer so that their own `predict_step` is used."""
+        return isinstance(self.model, RegressionMetric)
 
     def score(self, src: List[str], cand: List[str], ref: List[str]) -> COMETResult:
+        scores = self.cached_scores(src, cand, ref, self._predict)[:, 0].tolist()
+        return COMETResult(
+            sum(scores) / len(scores),
+            scores,
+            src,
+            cand,
+            ref,
+            self.name,
+            self.modelname,
+            self.precision,
+        )
+
+    def _predict(self, src: List[str], cand: List[str], ref: List[str]) -> np.ndarray:
+        if self.onnx_model is not None:
+            embeddings = self._embed_missing({}, src + ref)
+            return self._score_embedded(embeddings, src, cand, ref)
+
         data = {"src": src, "mt": cand, "ref": ref}
         data = [dict(zip(data, t)) for t in zip(*data.values())]
+        if not self.direct_inference:
+            return self._trainer_predict(data)
+
+        # Each sample goes through the encoder three times (src, mt and ref)
+        lengths = (
+            self._token_lengths(src) + self._token_lengths(cand) + self._token_lengths(ref)
+        )
+        batches = length_sorted_batches(lengths, self.max_tokens)
+        scores = np.empty(len(data))
+        with self._inference() as device:
+            for batch in batches:
+                inputs = self.model.prepare_sample([data[i] for i in batch], inference=True)
+                inputs = {k: v.to(device) for k, v in inputs.items()}
+                scores[batch] = self.model(**inputs)["score"].float().cpu().numpy()
+        return scores[:, None]
+
+    def _trainer_predict(self, data: List[Dict[str, str]]) -> np.ndarray:
+        """Scores the samples with the `predict_step` of the model."""
         dataloader = DataLoader(
             dataset=data,
             batch_size=16,
             collate_fn=lambda x: self.model.prepare_sample(x, inference=True),
-            num_workers=4,
         )
-        cuda = 1 if torch.cuda.is_available() else 0
-        trainer = Trainer(gpus=cuda, deterministic=True, logger=False)
+        trainer = Trainer(
+            gpus=1 if default_device() == "cuda" else 0,
+            deterministic=True,
+            logger=False,
+        )
         predictions = trainer.predict(
             self.model, dataloaders=dataloader, return_predictions=True
         )
-        scores = torch.cat(predictions, dim=0).tolist()
-        return COMETResult(
-            sum(scores) / len(scores), scores, src, cand, ref, self.name, self.modelname
+        return torch.cat(predictions, dim=0).float().cpu().numpy().reshape(-1, 1)
+
+    def pairwise_comparison(self, testset: PairwiseTestset) -> PairwiseResult:
+        results = self.multiple_score(
+            testset.src, {"x": testset.system_x, "y": testset.system_y}, testset.ref
+        )
+        return PairwiseResult(results["x"], results["y"])
+
+    def multiple_comparison(self, testset: MultipleTestset) -> Dict[str, COMETResult]:
+        return self.multiple_score(testset.src, testset.systems, testset.ref)
+
+    def multiple_score(
+        self,
+        src: List[str],
+        systems: Dict[str, List[str]],
+        ref: List[str],
+        chunk_size: int = 1024,
+    ) -> Dict[str, COMETResult]:
+        """
+        Scores several candidate systems against the same sources and references.
+        Sources and references are encoded once per chunk of segments and their
+        embeddings are reused for every system, so each segment needs 2 + N encoder
+        passes instead of 3N. With `n_procs > 1` sources and references are encoded
+        in this process and only the candidates are encoded in the forked workers,
+        so the embeddings are kept for the next systems.
+
+        :param src: Source segments.
+        :param systems: Dictionary with the MT outputs of each system.
+        :param ref: Reference segments.
+        :param chunk_size: Number of segments whose embeddings are kept in memory.
+        """
+        if not self.shared_encoding:
+            return {name: self.score(src, cand, ref) for name, cand in systems.items()}
+
+        scores = {name: [] for name in systems}
+        for start in range(0, len(ref), chunk_size):
+            end = start + chunk_size
+            embeddings = {}
+            for name, cand in systems.items():
+                scores[name].extend(
+                    self.cached_scores(
+                        src[start:end],
+                        cand[start:end],
+                        ref[start:end],
+                        partial(self._predict_shared, embeddings),
+                        sharded=False,
+                    )[:, 0].tolist()
+                )
+        return {
+            name: COMETResult(
+                sum(scores[name]) / len(scores[name]),
+                scores[name],
+                src,
+                cand,
+                ref,
+                self.name,
+                self.modelname,
+                self.precision,
+            )
+            for name, cand in systems.items()
+        }
+
+    def _predict_shared(
+        self,
+        embeddings: Dict[str, torch.Tensor],
+        src: List[str],
+        cand: List[str],
+        ref: List[str],
+    ) -> np.ndarray:
+        """Scores a system reusing (and filling) the given source/reference embeddings.
+        Missing embeddings are computed in this process before the candidates are
+        scored (in `n_procs` forked workers that inherit them)."""
+        self._embed_missing(embeddings, src + ref)
+        score_fn = partial(self._score_embedded, embeddings)
+        if self.n_procs > 1:
+            return self.sharded_scores(score_fn, src, cand, ref)
+        return score_fn(src, cand, ref)
+
+    def _embed_missing(
+        self, embeddings: Dict[str, torch.Tensor], sentences: List[str]
+    ) -> Dict[str, torch.Tensor]:
+        """Adds the embeddings of the sentences that are not in `embeddings` yet."""
+        missing = [s for s in dict.fromkeys(sentences) if s not in embeddings]
+        embeddings.update(zip(missing, self._embed(missing)))
+        return embeddings
+
+    def _score_embedded(
+        self,
+        embeddings: Dict[str, torch.Tensor],
+        src: List[str],
+        cand: List[str],
+        ref: List[str],
+    ) -> np.ndarray:
+        """Scores the candidates given the embeddings of their sources and references."""
+        with self._inference():
+            src_sentemb = torch.stack([embeddings[s] for s in src])
+            ref_sentemb = torch.stack([embeddings[r] for r in ref])
+            mt_sentemb = self._embed(cand)
+            scores = self._estimate(src_sentemb, mt_sentemb, ref_sentemb)
+        return scores.float().cpu().numpy()[:, None]
+
+    def segment_costs(
+        self, src: List[str], cand: List[str], ref: List[str]
+    ) -> np.ndarray:
+        return (
+            self._token_lengths(src) + self._token_lengths(cand) + self._token_lengths(ref)
         )
+
+    def _token_lengths(self, sentences: List[str]) -> np.ndarray:
+        if not sentences:
+            return np.zeros(0, dtype=int)
+        input_ids = self.model.encoder.tokenizer(sentences)["input_ids"]
+        return np.array([len(ids) for ids in input_ids])
+
+    @contextmanager
+    def _inference(self):
+        """Runs the model in evaluation mode without autograd, with the configured
+        number of threads and precision. Yields the device where the model is."""
+        device = default_device()
+        self.model.to(device)
+        self.model.eval()
+        num_threads = torch.get_num_threads()
+        if self.num_threads is not None:
+            torch.set_num_threads(self.num_threads)
+        try:
+            with torch.inference_mode(), autocast(self.precision, device):
+                yield device
+        finally:
+            torch.set_num_threads(num_threads)
+
+    def _embed(self, sentences: List[str]) -> torch.Tensor:
+        if not sentences:
+            return torch.empty(0)
+        batches = length_sorted_batches(self._token_lengths(sentences), self.max_tokens)
+        embeddings = []
+        with self._inference() as device:
+            for batch in batches:
+                inputs = self.model.encoder.prepare_sample([sentences[i] for i in batch])
+                if self.onnx_model is not None:
+                    embedding = self.onnx_model.embed(
+                        inputs["input_ids"].numpy(), inputs["attention_mask"].numpy()
+                    )
+                    embeddings.append(torch.from_numpy(embedding))
+                else:
+                    embeddings.append(
+                        self.model.get_sentence_embedding(
+                            inputs["input_ids"].to(device),
+                            inputs["attention_mask"].to(device),
+                        )
+                    )
+        # Scatter the embeddings back to the original order
+        return torch.cat(embeddings)[np.argsort(np.concatenate(batches))]
+
+    def _estimate(
+        self,
+        src_sentemb: torch.Tensor,
+        mt_sentemb: torch.Tensor,
+        ref_sentemb: torch.Tensor,
+    ) -> torch.Tensor:
+        """Feed-forward estimator of `comet.models.RegressionMetric` on top of the
+        sentence embeddings."""
+        if self.onnx_model is not None:
+            scores = self.onnx_model.estimate(
+                src_sentemb.numpy(), mt_sentemb.numpy(), ref_sentemb.numpy()
+            )
+            return torch.from_numpy(scores)
+        return Estimator(self.model)(src_sentemb, mt_sentemb, ref_sentemb)
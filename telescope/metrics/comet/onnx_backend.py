@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""
+COMET ONNX backend
+==============
+    Exports the sentence encoder and the feed-forward estimator of a COMET
+    regression model to ONNX graphs cached in the telescope cache folder, and runs
+    them on CPU with ONNX Runtime (`pip install onnxruntime`).
+"""
+import os
+from typing import Optional
+
+import numpy as np
+import torch
+
+from telescope.utils import telescope_cache_folder
+
+ONNX_OPSET = 14
+
+
+class SentenceEncoder(torch.nn.Module):
+    """Token ids and attention mask -> pooled sentence embeddings."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor):
+        return self.model.get_sentence_embedding(input_ids, attention_mask)
+
+
+class Estimator(torch.nn.Module):
+    """Source, translation and reference embeddings -> segment scores."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.estimator = model.estimator
+
+    def forward(self, src: torch.Tensor, mt: torch.Tensor, ref: torch.Tensor):
+        features = torch.cat(
+            (mt, ref, mt * ref, torch.abs(mt - ref), mt * src, torch.abs(mt - src)),
+            dim=1,
+        )
+        return self.estimator(features).view(-1)
+
+
+def onnx_folder(modelname: str) -> str:
+    return os.path.join(telescope_cache_folder(), "onnx", modelname)
+
+
+def export_model(model, modelname: str, folder: Optional[str] = None) -> str:
+    """
+    Exports the encoder and estimator of a loaded COMET model unless they are
+    already in `folder` (defaults to `onnx_folder(modelname)`).
+
+    :return: Folder with `encoder.onnx` and `estimator.onnx`.
+    """
+    folder = folder or onnx_folder(modelname)
+    encoder_path = os.path.join(folder, "encoder.onnx")
+    estimator_path = os.path.join(folder, "estimator.onnx")
+    if os.path.exists(encoder_path) and os.path.exists(estimator_path):
+        return folder
+
+    os.makedirs(folder, exist_ok=True)
+    model = model.to("cpu").eval()
+    input_ids = torch.ones(2, 8, dtype=torch.long)
+    attention_mask = torch.ones(2, 8, dtype=torch.long)
+    with torch.no_grad():
+        embedding = SentenceEncoder(model)(input_ids, attention_mask)
+        # Writes to a temporary file first so an interrupted export is not reused
+        torch.onnx.export(
+            SentenceEncoder(model),
+            (input_ids, attention_mask),
+            encoder_path + ".tmp",
+            input_names=["input_ids", "attention_mask"],
+            output_names=["embeddings"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "tokens"},
+                "attention_mask": {0: "batch", 1: "tokens"},
+                "embeddings": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET,
+        )
+        # Distinct tensors: torch.export binds a tensor passed twice to one input
+        torch.onnx.export(
+            Estimator(model),
+            (embedding, embedding.clone(), embedding.clone()),
+            estimator_path + ".tmp",
+            input_names=["src", "mt", "ref"],
+            output_names=["scores"],
+            dynamic_axes={
+                "src": {0: "batch"},
+                "mt": {0: "batch"},
+                "ref": {0: "batch"},
+                "scores": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET,
+        )
+    os.replace(encoder_path + ".tmp", encoder_path)
+    os.replace(estimator_path + ".tmp", estimator_path)
+    return folder
+
+
+class ONNXModel:
+    """
+    ONNX Runtime sessions of an exported COMET model.
+
+    :param folder: Folder returned by `export_model`.
+    :param num_threads: Intra-op threads of each session (ONNX Runtime default if
+        None).
+    """
+
+    def __init__(self, folder: str, num_threads: Optional[int] = None):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise Exception(
+                "The ONNX backend requires onnxruntime: pip install onnxruntime"
+            )
+
+        options = onnxruntime.SessionOptions()
+        if num_threads is not None:
+            options.intra_op_num_threads = num_threads
+        self.folder = folder
+        self.encoder = onnxruntime.InferenceSession(
+            os.path.join(folder, "encoder.onnx"),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.estimator = onnxruntime.InferenceSession(
+            os.path.join(folder, "estimator.onnx"),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    @property
+    def size(self) -> int:
+        return sum(
+            os.path.getsize(os.path.join(self.folder, f))
+            for f in ("encoder.onnx", "estimator.onnx")
+        )
+
+    def embed(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        return self.encoder.run(
+            None,
+            {
+                "input_ids": input_ids.astype(np.int64),
+                "attention_mask": attention_mask.astype(np.int64),
+            },
+        )[0]
+
+    def estimate(self, src: np.ndarray, mt: np.ndarray, ref: np.ndarray) -> np.ndarray:
+        return self.estimator.run(None, {"src": src, "mt": mt, "ref": ref})[0]
@@ -25,9 +25,13 @@ class COMETResult(MetricResult):
         ref: list,
         metric: str,
         model: str,
+        inference_precision: str = "fp32",
     ) -> None:
         super().__init__(sys_score, seg_scores, src, cand, ref, metric)
         self.model = model
+        self.inference_precision = inference_precision
 
     def __str__(self):
+        if self.inference_precision != "fp32":
+            return f"{self.metric}({self.sys_score}, Model={self.model}, Precision={self.inference_precision})"
         return f"{self.metric}({self.sys_score}, Model={self.model})"
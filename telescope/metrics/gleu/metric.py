@@ -16,8 +16,16 @@ from collections import Counter
 from itertools import chain
 from typing import List
 
-from sacrebleu.metrics.bleu import _get_tokenizer
+import numpy as np
+from telescope.metrics.lexical import (
+    bleu_stats,
+    corpus_stats,
+    get_tokenizer,
+    tokenized_words,
+    word_stats,
+)
 from telescope.metrics.metric import Metric
+from telescope.metrics.ngrams import gleu_scores
 from telescope.metrics.result import MetricResult
 
 
@@ -25,42 +33,71 @@ class GLEU(Metric):
 
     name = "GLEU"
     segment_level = True
+    max_len = 4
 
-    def __init__(self, language: str, lowercase: bool = False, tokenize: bool = True):
+    def __init__(
+        self,
+        language: str,
+        lowercase: bool = False,
+        tokenize: bool = True,
+        n_jobs: int = 1,
+    ):
+        """
+        :param tokenize: Tokenizes segments with the sacreBLEU tokenizer of the
+            language (and counts the same word n-grams as BLEU); otherwise words are
+            separated by spaces.
+        :param n_jobs: Number of processes used to extract the n-grams.
+        """
         super().__init__(language)
         if language == "zh":
-            self.tokenizer = _get_tokenizer("zh")()
+            self.tokenizer_name = "zh"
         elif language == "ja":
-            self.tokenizer = _get_tokenizer("ja-mecab")()
+            self.tokenizer_name = "ja-mecab"
         else:
-            self.tokenizer = _get_tokenizer("13a")()
+            self.tokenizer_name = "13a"
+        self.tokenizer = get_tokenizer(self.tokenizer_name)
 
         self.lowercase = lowercase
         self.tokenize = tokenize
+        self.n_jobs = n_jobs
 
     def score(self, src: List[str], cand: List[str], ref: List[str]) -> MetricResult:
-        org_cand = cand
-        org_ref = ref
+        stats = self.segment_stats(src, cand, ref)
+        matches, hyp_counts = stats[:, 2 : 2 + self.max_len], stats[:, 2 + self.max_len :]
+        orders = np.arange(1, self.max_len + 1)
+        ref_counts = np.maximum(stats[:, 1:2] - orders + 1, 0)
+        segment_gleu = gleu_scores(matches, hyp_counts, ref_counts).tolist()
+        corpus_gleu = sum(segment_gleu) / len(segment_gleu)
+        return MetricResult(corpus_gleu, segment_gleu, src, cand, ref, self.name)
+
+    def segment_stats(self, src: List[str], cand: List[str], ref: List[str]) -> np.ndarray:
+        """ Returns [hyp_len, ref_len, correct_1..4, total_1..4] for each segment
+        (the statistics of BLEU when tokenizing). """
         if self.tokenize:
-            cand = [self.tokenizer(c.strip("\n")) for c in cand]
-            ref = [self.tokenizer(r.strip("\n")) for r in ref]
-        else:
-            cand = [c.strip("\n").split(" ") for c in cand]
-            ref = [r.strip("\n").split(" ") for r in ref]
+            return bleu_stats(
+                cand, ref, self.tokenizer_name, self.max_len, self.lowercase, self.n_jobs
+            )
 
-        if self.lowercase:
-            cand = [c.lower() for c in cand]
-            ref = [r.lower() for r in ref]
+        def extract(cand, ref):
+            return word_stats(
+                self.preprocess(cand), self.preprocess(ref), self.max_len, self.n_jobs
+            )
 
-        segment_gleu = [self.sentence_gleu(r, h) for r, h in zip(ref, cand)]
-        corpus_gleu = sum(segment_gleu) / len(segment_gleu)
-        cand = [" ".join(seg) for seg in cand]
-        ref = [" ".join(seg) for seg in ref]
-        return MetricResult(
-            corpus_gleu, segment_gleu, src, org_cand, org_ref, self.name
-        )
+        kind = f"gleu/{self.max_len}" + ("/lc" if self.lowercase else "")
+        return corpus_stats(kind, cand, ref, extract)
+
+    def preprocess(self, segments: List[str]) -> List[List[str]]:
+        if self.tokenize:
+            return tokenized_words(segments, self.tokenizer_name, self.lowercase)
+
+        segments = [s.strip("\n") for s in segments]
+        if self.lowercase:
+            segments = [s.lower() for s in segments]
+        return [s.split(" ") for s in segments]
 
     def sentence_gleu(self, reference, hypothesis, min_len=1, max_len=4):
+        """Reference implementation of the GLEU of a single segment (`score` uses the
+        vectorized n-gram statistics)."""
         references = [
             reference,
         ]
@@ -149,7 +186,11 @@ class GLEU(Metric):
         )
         history = []
         while n > 1:
-            history.append(next(sequence))
+            # Sequences shorter than n have no n-grams
+            try:
+                history.append(next(sequence))
+            except StopIteration:
+                return
             n -= 1
         for item in sequence:
             history.append(item)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""
+Lexical preprocessing
+==============
+    Preprocessing shared by BLEU, chrF, TER and GLEU:
+        - tokenizers are created once and each distinct segment is tokenized once
+          per tokenizer;
+        - the segment statistics of each (candidates, references) corpus pair are
+          kept in memory, so scoring a system and resampling it (e.g. in Bootstrap
+          resampling) extracts the statistics once. The cached arrays are shared
+          and read-only.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+import numpy as np
+from sacrebleu.metrics.bleu import _get_tokenizer
+
+from telescope.metrics.ngrams import corpus_ngram_stats
+
+# Distinct segments kept per tokenizer
+MAX_TOKENIZED = 1_000_000
+# Bytes of corpus statistics kept in memory
+MAX_CORPUS_STATS_BYTES = 1 << 30
+
+_tokenizers = {}
+_tokenized: Dict[str, Dict[str, str]] = {}
+_corpus_stats = OrderedDict()
+_corpus_stats_bytes = 0
+# Guards the caches above (metrics may run in several threads, e.g. in the app)
+_lock = threading.Lock()
+
+
+def get_tokenizer(name: str) -> Callable[[str], str]:
+    """Shared sacreBLEU tokenizer (e.g. '13a', 'zh' or 'ja-mecab')."""
+    with _lock:
+        if name not in _tokenizers:
+            _tokenizers[name] = _get_tokenizer(name)()
+        return _tokenizers[name]
+
+
+def tokenize(segments: List[str], name: str) -> List[str]:
+    """Tokenizes the segments with the given sacreBLEU tokenizer, reusing the
+    tokenization of segments seen before."""
+    tokenizer = get_tokenizer(name)
+    with _lock:
+        cache = _tokenized.setdefault(name, {})
+        if len(cache) > MAX_TOKENIZED:
+            cache.clear()
+        tokenized = [cache.get(segment) for segment in segments]
+
+    # Segments are tokenized outside the lock
+    missing = {}
+    for i, segment in enumerate(segments):
+        if tokenized[i] is None:
+            if segment not in missing:
+                missing[segment] = tokenizer(segment)
+            tokenized[i] = missing[segment]
+    if missing:
+        with _lock:
+            _tokenized.setdefault(name, {}).update(missing)
+    return tokenized
+
+
+def fingerprint(segments: List[str]) -> str:
+    return hashlib.sha1("\x00".join(segments).encode("utf-8")).hexdigest()
+
+
+def corpus_stats(
+    kind: str,
+    cand: List[str],
+    ref: List[str],
+    extract: Callable[[List[str], List[str]], np.ndarray],
+) -> np.ndarray:
+    """
+    Segment statistics of a corpus pair, extracted only if they are not in memory.
+
+    :param kind: Identifies the statistics and their options (e.g. 'bleu/13a/4').
+    :param extract: Function that extracts the statistics of all the segments.
+    """
+    global _corpus_stats_bytes
+    key = (kind, len(cand), fingerprint(cand), fingerprint(ref))
+    with _lock:
+        if key in _corpus_stats:
+            _corpus_stats.move_to_end(key)
+            return _corpus_stats[key]
+
+    # Statistics are extracted outside the lock
+    stats = extract(cand, ref)
+    # Callers share the cached array: copy it before modifying it
+    stats.setflags(write=False)
+    if stats.nbytes <= MAX_CORPUS_STATS_BYTES:
+        with _lock:
+            if key not in _corpus_stats:
+                _corpus_stats[key] = stats
+                _corpus_stats_bytes += stats.nbytes
+            while _corpus_stats_bytes > MAX_CORPUS_STATS_BYTES:
+                _corpus_stats_bytes -= _corpus_stats.popitem(last=False)[1].nbytes
+    return stats
+
+
+def tokenized_words(
+    segments: List[str], tokenizer: str = "13a", lowercase: bool = False
+) -> List[List[str]]:
+    """Words of the segments tokenized with the given sacreBLEU tokenizer."""
+    segments = tokenize([s.rstrip() for s in segments], tokenizer)
+    return [(s.lower() if lowercase else s).split() for s in segments]
+
+
+def word_stats(
+    hyps: List[List[str]], refs: List[List[str]], max_order: int = 4, n_jobs: int = 1
+) -> np.ndarray:
+    """
+    [hyp_len, ref_len, correct_1..max_order, total_1..max_order] of each pair of
+    tokenized segments (the reference n-grams of each order follow from ref_len).
+    """
+    matches, hyp_counts, _ = corpus_ngram_stats(hyps, refs, max_order, n_jobs=n_jobs)
+    return np.concatenate(
+        [
+            np.array([[len(h), len(r)] for h, r in zip(hyps, refs)]).reshape(-1, 2),
+            matches,
+            hyp_counts,
+        ],
+        axis=1,
+    ).astype(np.float64)
+
+
+def bleu_stats(
+    cand: List[str],
+    ref: List[str],
+    tokenizer: str = "13a",
+    max_order: int = 4,
+    lowercase: bool = False,
+    n_jobs: int = 1,
+) -> np.ndarray:
+    """
+    Same statistics as `sacrebleu.BLEU` with a single reference:
+    [hyp_len, ref_len, correct_1..max_order, total_1..max_order] for each segment.
+    GLEU is computed from the same statistics, so the word n-grams are extracted
+    once for both metrics.
+
+    :param lowercase: Lowercases the segments after tokenizing them.
+    :param n_jobs: Number of processes used to extract the n-grams.
+    """
+
+    def extract(cand, ref):
+        return word_stats(
+            tokenized_words(cand, tokenizer, lowercase),
+            tokenized_words(ref, tokenizer, lowercase),
+            max_order,
+            n_jobs,
+        )
+
+    kind = f"bleu/{tokenizer}/{max_order}" + ("/lc" if lowercase else "")
+    return corpus_stats(kind, cand, ref, extract)
+
+
+def chrf_stats(
+    cand: List[str], ref: List[str], char_order: int = 6, whitespace: bool = False
+) -> np.ndarray:
+    """
+    Same statistics as `sacrebleu.CHRF` (without word n-grams) with a single
+    reference: the [hyp, ref, match] character n-gram counts of each order.
+    """
+
+    def extract(cand, ref):
+        if not whitespace:
+            cand = ["".join(c.split()) for c in cand]
+            ref = ["".join(r.split()) for r in ref]
+        matches, hyp_counts, ref_counts = corpus_ngram_stats(cand, ref, char_order)
+        # sacreBLEU does not count hypothesis n-grams of orders without references
+        hyp_counts = np.where(ref_counts > 0, hyp_counts, 0)
+        stats = np.stack([hyp_counts, ref_counts, matches], axis=2)
+        return stats.reshape(len(cand), 3 * char_order).astype(np.float64)
+
+    return corpus_stats(f"chrf/{char_order}/{whitespace}", cand, ref, extract)
+
+
+def pair_stats(
+    kind: str,
+    cand: List[str],
+    ref: List[str],
+    extract: Callable[[List[str], List[str]], List[List[float]]],
+) -> np.ndarray:
+    """Statistics of metrics without n-grams (e.g. TER) extracted once per distinct
+    (candidate, reference) pair."""
+
+    def extract_unique(cand, ref):
+        pairs = list(dict.fromkeys(zip(cand, ref)))
+        if not pairs:
+            return np.zeros((0, 0))
+        index = {pair: i for i, pair in enumerate(pairs)}
+        unique_cand, unique_ref = zip(*pairs)
+        stats = np.array(extract(list(unique_cand), list(unique_ref)), dtype=np.float64)
+        return stats[[index[pair] for pair in zip(cand, ref)]]
+
+    return corpus_stats(kind, cand, ref, extract_unique)
+
+
+def clear() -> None:
+    global _corpus_stats_bytes
+    with _lock:
+        _tokenized.clear()
+        _corpus_stats.clear()
+        _corpus_stats_bytes = 0
+# Guards the caches above (metrics may run in several threads, e.g. in the app)
+_lock = threading.Lock()
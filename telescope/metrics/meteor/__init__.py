@@ -0,0 +1,2 @@
+from .metric import METEOR
+from .result import METEORResult
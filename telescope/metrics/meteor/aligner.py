@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""
+METEOR aligner
+==============
+    Word alignment of METEOR with exact and stem matching. Words and stems are
+    mapped to integer ids once per corpus. The stages run one after the other
+    like in NLTK's `meteor_score`: each stage aligns the words left unaligned by
+    the previous ones, going from the last hypothesis word to the first and taking
+    the last free reference word with the same token. Every word that can match
+    gets aligned, and with the same stemmer the alignments (hence the chunks and
+    the scores) are the ones of NLTK. There is no WordNet synonym stage, so NLTK's
+    default synonym matches are not found here.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import snowballstemmer
+
+# Snowball stemmer of each language (Meteor uses the Snowball stemmers)
+SNOWBALL_LANGUAGES = {
+    "ar": "arabic",
+    "ca": "catalan",
+    "cs": "czech",
+    "da": "danish",
+    "de": "german",
+    "el": "greek",
+    "en": "english",
+    "es": "spanish",
+    "eu": "basque",
+    "fi": "finnish",
+    "fr": "french",
+    "ga": "irish",
+    "hi": "hindi",
+    "hu": "hungarian",
+    "hy": "armenian",
+    "id": "indonesian",
+    "it": "italian",
+    "lt": "lithuanian",
+    "ne": "nepali",
+    "nl": "dutch",
+    "no": "norwegian",
+    "pt": "portuguese",
+    "ro": "romanian",
+    "ru": "russian",
+    "sr": "serbian",
+    "sv": "swedish",
+    "ta": "tamil",
+    "tr": "turkish",
+}
+
+# Token ids of a segment for each matching stage
+Stages = Tuple[Sequence[int], ...]
+
+
+def get_stemmer(language: str) -> Optional[Callable[[List[str]], List[str]]]:
+    """Snowball stemmer of the language or None if there is no stemmer for it."""
+    name = SNOWBALL_LANGUAGES.get(language.lower())
+    if name is None or name not in snowballstemmer.algorithms():
+        return None
+    return snowballstemmer.stemmer(name).stemWords
+
+
+def encode_stages(
+    corpora: List[List[List[str]]],
+    stemmer: Optional[Callable[[List[str]], List[str]]] = None,
+) -> List[List[Stages]]:
+    """
+    Maps the words of several tokenized corpora to word ids and stem ids shared by
+    all of them. Each distinct word is stemmed once.
+
+    :return: For each corpus, the (word ids, stem ids) of each segment (only the
+        word ids when there is no stemmer).
+    """
+    vocab: Dict[str, int] = {}
+    encoded = [
+        [[vocab.setdefault(w, len(vocab)) for w in segment] for segment in corpus]
+        for corpus in corpora
+    ]
+    if stemmer is None:
+        return [[(ids,) for ids in corpus] for corpus in encoded]
+
+    words = list(vocab)
+    stems: Dict[str, int] = {}
+    stem_of = [stems.setdefault(s, len(stems)) for s in stemmer(words)]
+    return [
+        [(ids, [stem_of[i] for i in ids]) for ids in corpus] for corpus in encoded
+    ]
+
+
+def align(hyp: Stages, ref: Stages) -> List[int]:
+    """
+    Aligns a hypothesis with its reference.
+
+    :param hyp: Token ids of the hypothesis for each stage (e.g. words and stems).
+    :param ref: Token ids of the reference for each stage.
+    :return: Reference position aligned with each hypothesis word (-1 if none).
+    """
+    alignment = [-1] * len(hyp[0])
+    ref_free = [True] * len(ref[0])
+    for hyp_ids, ref_ids in zip(hyp, ref):
+        # Free reference positions of each token, in ascending order
+        positions: Dict[int, List[int]] = {}
+        for j, token in enumerate(ref_ids):
+            if ref_free[j]:
+                positions.setdefault(token, []).append(j)
+        # From the last hypothesis word to the first, take the last free position
+        for i in range(len(hyp_ids) - 1, -1, -1):
+            if alignment[i] < 0 and positions.get(hyp_ids[i]):
+                j = positions[hyp_ids[i]].pop()
+                alignment[i] = j
+                ref_free[j] = False
+    return alignment
+
+
+def count_chunks(alignment: List[int]) -> int:
+    """Number of runs of aligned words that are contiguous in both segments."""
+    chunks, previous = 0, -2
+    for j in alignment:
+        if j >= 0 and j != previous + 1:
+            chunks += 1
+        previous = j if j >= 0 else -2
+    return chunks
+
+
+def alignment_stats(hyps: List[Stages], refs: List[Stages]) -> np.ndarray:
+    """[hyp_len, ref_len, matches, chunks] of each segment pair."""
+    stats = np.zeros((len(hyps), 4), dtype=np.float64)
+    for s, (hyp, ref) in enumerate(zip(hyps, refs)):
+        alignment = align(hyp, ref)
+        matches = len(alignment) - alignment.count(-1)
+        stats[s] = (len(hyp[0]), len(ref[0]), matches, count_chunks(alignment))
+    return stats
+
+
+def _chunk_stats(args) -> np.ndarray:
+    return alignment_stats(*args)
+
+
+def corpus_alignment_stats(
+    hyps: List[Stages],
+    refs: List[Stages],
+    chunk_size: int = 10000,
+    n_jobs: int = 1,
+) -> np.ndarray:
+    """
+    `alignment_stats` of a whole corpus, computed in chunks of segments.
+
+    :param chunk_size: Number of segments aligned by each job.
+    :param n_jobs: Number of processes used to align the chunks.
+    """
+    chunks = [
+        (hyps[start : start + chunk_size], refs[start : start + chunk_size])
+        for start in range(0, len(hyps), chunk_size)
+    ]
+    if n_jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            stats = list(executor.map(_chunk_stats, chunks))
+    else:
+        stats = [_chunk_stats(chunk) for chunk in chunks]
+    if not stats:
+        return np.zeros((0, 4), dtype=np.float64)
+    return np.concatenate(stats)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from typing import List
+
+import numpy as np
+from telescope.metrics.lexical import corpus_stats, tokenize
+from telescope.metrics.meteor.aligner import (
+    corpus_alignment_stats,
+    encode_stages,
+    get_stemmer,
+)
+from telescope.metrics.meteor.result import METEORResult
+from telescope.metrics.metric import Metric
+
+
+class METEOR(Metric):
+
+    name = "METEOR"
+    segment_level = True
+    sufficient_stats = True
+
+    def __init__(
+        self,
+        language: str,
+        alpha: float = 0.9,
+        beta: float = 3.0,
+        gamma: float = 0.5,
+        stem: bool = True,
+        n_jobs: int = 1,
+    ):
+        """
+        METEOR with exact and stem matching (Banerjee and Lavie, 2005). The default
+        parameters are the ones of NLTK's `meteor_score`, whose scores are
+        reproduced without its WordNet synonyms. Segments are tokenized with the
+        sacreBLEU tokenizer of the language and lowercased.
+
+        :param alpha: Weight of precision and recall in the harmonic mean.
+        :param beta: Shape of the fragmentation penalty.
+        :param gamma: Maximum fragmentation penalty.
+        :param stem: Matches words with the same Snowball stem after exact matches.
+        :param n_jobs: Number of processes used to align chunks of segments.
+        """
+        super().__init__(language)
+        if language == "zh":
+            self.tokenizer_name = "zh"
+        elif language == "ja":
+            self.tokenizer_name = "ja-mecab"
+        else:
+            self.tokenizer_name = "13a"
+        self.stemmer = get_stemmer(language) if stem else None
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.n_jobs = n_jobs
+
+    def score(self, src: List[str], cand: List[str], ref: List[str]) -> METEORResult:
+        stats = self.segment_stats(src, cand, ref)
+        return self.stats_result(
+            stats.sum(axis=0), self.segment_scores(stats).tolist(), src, cand, ref
+        )
+
+    def stats_result(self, stats, seg_scores, src, cand, ref) -> METEORResult:
+        hyp_len, ref_len, matches, chunks = stats
+        return METEORResult(
+            float(self.aggregate_stats(stats)),
+            seg_scores,
+            src,
+            cand,
+            ref,
+            self.name,
+            matches / hyp_len if hyp_len else 0.0,
+            matches / ref_len if ref_len else 0.0,
+            chunks / matches if matches else 0.0,
+        )
+
+    def preprocess(self, segments: List[str]) -> List[List[str]]:
+        segments = tokenize([s.strip() for s in segments], self.tokenizer_name)
+        return [s.lower().split() for s in segments]
+
+    def segment_stats(self, src: List[str], cand: List[str], ref: List[str]) -> np.ndarray:
+        """ Returns [hyp_len, ref_len, matches, chunks] for each segment. """
+
+        def extract(cand, ref):
+            hyps, refs = encode_stages(
+                [self.preprocess(cand), self.preprocess(ref)], self.stemmer
+            )
+            return corpus_alignment_stats(hyps, refs, n_jobs=self.n_jobs)
+
+        kind = f"meteor/{self.tokenizer_name}/{self.language if self.stemmer else ''}"
+        return corpus_stats(kind, cand, ref, extract)
+
+    def aggregate_stats(self, stats: np.ndarray) -> np.ndarray:
+        """ METEOR of the aggregated statistics: recall-weighted harmonic mean of
+        unigram precision and recall, discounted by the fragmentation penalty. """
+        stats = np.asarray(stats, dtype=np.float64)
+        hyp_len, ref_len, matches, chunks = (stats[..., i] for i in range(4))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision, recall = matches / hyp_len, matches / ref_len
+            fmean = precision * recall / (self.alpha * precision + (1 - self.alpha) * recall)
+            penalty = self.gamma * (chunks / matches) ** self.beta
+            scores = fmean * (1 - penalty)
+        return np.where(matches > 0, scores, 0.0)
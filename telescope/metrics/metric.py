@@ -13,11 +13,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import abc
-from typing import List, Tuple
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
 
 import numpy as np
-from telescope.metrics.result import BootstrapResult, MetricResult, PairwiseResult
-from telescope.testset import PairwiseTestset
+import torch
+from telescope import __version__
+from telescope.cache import get_segment_cache, segment_key
+from telescope.metrics.registry import default_device
+from telescope.metrics.result import (
+    BootstrapResult,
+    MetricResult,
+    MultipleBootstrapResult,
+    PairwiseResult,
+    RandomizationResult,
+    count_wins,
+)
+from telescope.metrics.utils import lpt_partition
+from telescope.testset import MultipleTestset, PairwiseTestset
+
+# Scoring function inherited by forked workers so that models are not pickled
+_shard_score_fn = None
+# Testset of each bootstrap worker process, sent once when the worker starts
+_bootstrap_testset = None
 
 
 class Metric(metaclass=abc.ABCMeta):
@@ -26,6 +47,13 @@ class Metric(metaclass=abc.ABCMeta):
 
     name = None
     segment_level = True
+    sufficient_stats = False
+    use_cache = True
+    # Accepts a `precision` argument ('fp32', 'bf16' or 'int8')
+    reduced_precision = False
+    # Accepts an `n_procs` argument to score segments in several processes
+    sharded_inference = False
+    n_procs = 1
 
     def __init__(self, language: str):
         if not self.language_support(language):
@@ -42,12 +70,237 @@ class Metric(metaclass=abc.ABCMeta):
     def language_support(cls, language: str):
         return True
 
+    @property
+    def cache_namespace(self) -> str:
+        """
+        Identifies the metric and model whose segment scores can be cached (e.g.
+        'COMET/wmt20-comet-da'). Metrics that are cheaper to recompute than to look
+        up return None.
+        """
+        return None
+
+    def cached_scores(
+        self,
+        src: List[str],
+        cand: List[str],
+        ref: List[str],
+        score_fn: Callable[[List[str], List[str], List[str]], np.ndarray],
+        sharded: bool = True,
+    ) -> np.ndarray:
+        """
+        Looks up the segments in the persistent segment cache (see `telescope.cache`)
+        and runs `score_fn` only on the segments that are missing.
+
+        :param score_fn: Function that returns a matrix with shape (n, k) with the
+            scores of n segments.
+        :param sharded: Runs `score_fn` in `n_procs` workers (see `sharded_scores`).
+            Score functions that shard part of their own work pass False.
+        :return: Matrix with shape (len(cand), k).
+        """
+        if self.n_procs > 1 and sharded:
+            score_fn = partial(self.sharded_scores, score_fn)
+        cache = get_segment_cache() if self.use_cache else None
+        if cache is None or self.cache_namespace is None:
+            return np.asarray(score_fn(src, cand, ref), dtype=np.float64)
+
+        namespace = f"{self.cache_namespace}/{__version__}"
+        src = src if src is not None else [""] * len(cand)
+        keys = [segment_key(namespace, s, c, r) for s, c, r in zip(src, cand, ref)]
+        values = cache.get_many(keys)
+        # Segments repeated in the testset are scored once
+        misses = {key: i for i, key in enumerate(keys) if key not in values}
+        if misses:
+            ids = list(misses.values())
+            scores = score_fn(
+                [src[i] for i in ids], [cand[i] for i in ids], [ref[i] for i in ids]
+            )
+            scored = dict(zip(misses, np.asarray(scores, dtype=np.float64)))
+            cache.set_many(scored)
+            values.update(scored)
+        return np.stack([values[key] for key in keys])
+
+    def segment_costs(
+        self, src: List[str], cand: List[str], ref: List[str]
+    ) -> np.ndarray:
+        """Relative cost of scoring each segment (characters by default), used to
+        balance the shards of `sharded_scores`."""
+        src = src if src is not None else [""] * len(cand)
+        return np.array([len(s) + len(c) + len(r) for s, c, r in zip(src, cand, ref)])
+
+    def sharded_scores(
+        self,
+        score_fn: Callable[[List[str], List[str], List[str]], np.ndarray],
+        src: List[str],
+        cand: List[str],
+        ref: List[str],
+    ) -> np.ndarray:
+        """
+        Splits the segments into `n_procs` shards with balanced `segment_costs` and
+        runs `score_fn` on each shard in a forked worker. Workers share the loaded
+        model copy-on-write and each one gets an equal share of the CPU threads.
+
+        :return: Matrix with shape (len(cand), k) in the original segment order.
+        """
+        if default_device() != "cpu":
+            raise Exception("Scoring with n_procs > 1 is only supported on CPU.")
+        shards = lpt_partition(self.segment_costs(src, cand, ref), self.n_procs)
+        if len(shards) < 2:
+            return np.asarray(score_fn(src, cand, ref), dtype=np.float64)
+
+        num_threads = max(1, (os.cpu_count() or 1) // len(shards))
+        global _shard_score_fn
+        _shard_score_fn = score_fn
+        try:
+            with ProcessPoolExecutor(
+                max_workers=len(shards), mp_context=multiprocessing.get_context("fork")
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _score_shard,
+                        num_threads,
+                        [src[i] for i in ids] if src is not None else None,
+                        [cand[i] for i in ids],
+                        [ref[i] for i in ids],
+                    )
+                    for ids in shards
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            _shard_score_fn = None
+
+        scores = np.empty((len(cand), results[0].shape[1]))
+        for ids, result in zip(shards, results):
+            scores[ids] = result
+        return scores
+
+    def segment_stats(self, src: List[str], cand: List[str], ref: List[str]) -> np.ndarray:
+        """
+        Extracts the sufficient statistics of each segment (e.g. n-gram matches and totals,
+        hypothesis and reference lengths, edit counts). Only metrics with
+        `sufficient_stats = True` implement this.
+
+        :return: Matrix with shape (len(cand), num_stats).
+        """
+        raise NotImplementedError(f"{self.name} does not have sufficient statistics.")
+
+    def aggregate_stats(self, stats: np.ndarray) -> np.ndarray:
+        """
+        Computes corpus scores from aggregated sufficient statistics.
+
+        :param stats: Summed segment statistics with shape (..., num_stats).
+        :return: Corpus scores with shape (...).
+        """
+        raise NotImplementedError(f"{self.name} does not have sufficient statistics.")
+
+    def segment_scores(self, stats: np.ndarray) -> np.ndarray:
+        """
+        Computes the sentence-level score of each segment from its own statistics.
+        Defaults to `aggregate_stats`; metrics that smooth sentence scores differently
+        from corpus scores (e.g. BLEU) override it.
+
+        :param stats: Segment statistics with shape (num_segments, num_stats).
+        :return: Segment scores with shape (num_segments,).
+        """
+        return self.aggregate_stats(stats)
+
+    def stats_result(
+        self,
+        stats: np.ndarray,
+        seg_scores: List[float],
+        src: List[str],
+        cand: List[str],
+        ref: List[str],
+    ) -> MetricResult:
+        """
+        Builds the result of a corpus from its summed sufficient statistics. Metrics
+        whose results carry more than the score (e.g. BLEU precisions) override it.
+
+        :param stats: Segment statistics summed over the corpus.
+        """
+        return MetricResult(
+            float(self.aggregate_stats(stats)), seg_scores, src, cand, ref, self.name
+        )
+
+    def score_iter(
+        self, chunks: Iterable[Tuple[List[str], List[str], List[str]]]
+    ) -> Iterator[MetricResult]:
+        """
+        Scores a stream of (src, cand, ref) chunks and yields the result of each chunk
+        as soon as it is scored.
+        """
+        for src, cand, ref in chunks:
+            yield self.score(src, cand, ref)
+
+    def score_stream(
+        self,
+        chunks: Iterable[Tuple[List[str], List[str], List[str]]],
+        keep_seg_scores: bool = True,
+        keep_text: bool = False,
+    ) -> MetricResult:
+        """
+        Scores a corpus given as a stream of (src, cand, ref) chunks (e.g. the
+        `iter_chunks` of `telescope.utils.MappedLines`) without holding it in memory.
+        Metrics with sufficient statistics sum the statistics of each chunk and
+        compute the corpus score at the end (segment scores come from the same
+        statistics). Other metrics average the segment scores.
+
+        :param chunks: Iterable of (src, cand, ref) lists.
+        :param keep_seg_scores: Store the segment scores in the result.
+        :param keep_text: Store the source, candidate and reference segments in the
+            result.
+        :return: MetricResult object
+        """
+        seg_scores, src, cand, ref = [], [], [], []
+        if self.sufficient_stats:
+            total = self.segment_stats([], [], []).sum(axis=0)
+            for chunk in chunks:
+                stats = self.segment_stats(*chunk)
+                total += stats.sum(axis=0)
+                if keep_seg_scores and self.segment_level:
+                    seg_scores.extend(self.segment_scores(stats).tolist())
+                if keep_text:
+                    for column, segments in zip((src, cand, ref), chunk):
+                        column.extend(segments)
+            return self.stats_result(total, seg_scores, src, cand, ref)
+        else:
+            total, count = 0.0, 0
+            for result in self.score_iter(chunks):
+                total += sum(result.seg_scores)
+                count += len(result.seg_scores)
+                if keep_seg_scores:
+                    seg_scores.extend(result.seg_scores)
+                if keep_text:
+                    src.extend(result.src)
+                    cand.extend(result.cand)
+                    ref.extend(result.ref)
+            sys_score = total / count if count else 0.0
+            return MetricResult(sys_score, seg_scores, src, cand, ref, self.name)
+
     def pairwise_comparison(self, testset: PairwiseTestset):
         """ Function that scores the two candidate systems inside a paired testset. """
         x_result = self.score(testset.src, testset.system_x, testset.ref)
         y_result = self.score(testset.src, testset.system_y, testset.ref)
         return PairwiseResult(x_result, y_result)
 
+    def multiple_comparison(self, testset: MultipleTestset) -> Dict[str, MetricResult]:
+        """ Function that scores every candidate system inside a multiple testset. """
+        return {
+            name: self.score(testset.src, system, testset.ref)
+            for name, system in testset.systems.items()
+        }
+
+    @staticmethod
+    def draw_partitions(
+        n: int, num_samples: int, sample_ratio: float, seed: int = None
+    ) -> np.ndarray:
+        """
+        Draws the segment ids of each bootstrap partition (with replacement).
+
+        :return: Matrix with shape (num_samples, sample_size).
+        """
+        sample_size = max(int(n * sample_ratio), 1)
+        return np.random.default_rng(seed).integers(0, n, size=(num_samples, sample_size))
+
     @classmethod
     def bootstrap_resampling(
         cls,
@@ -55,72 +308,510 @@ class Metric(metaclass=abc.ABCMeta):
         num_samples: int,
         sample_ratio: float,
         pairwise_result: PairwiseResult = None,
+        n_jobs: int = 1,
+        seed: int = None,
+        tolerance: float = None,
+        decision_threshold: float = 0.95,
+        chunk_size: int = 25,
+        method: str = "index",
     ):
 
         """
-        Bootstrap resampling for system-level metrics such as BLEU that have to recompute
-        the system-level score for each partition
+        Bootstrap resampling between two systems. For segment-level metrics with
+        precomputed scores all partitions are drawn at once as a (num_samples, sample_size)
+        matrix of segment ids and the system scores are computed with array operations.
+        Metrics with sufficient statistics such as BLEU extract them once and aggregate
+        them for each partition. Other metrics have to recompute the system-level score
+        for each partition, which can be split across `n_jobs` processes.
+
+        When a `tolerance` is given partitions are drawn in chunks and resampling stops
+        as soon as the comparison converges (see `bootstrap_converged`). In that case
+        `num_samples` is the maximum number of partitions.
+
+        With `method="poisson"` each partition gives every segment a Poisson(sample_ratio)
+        weight instead of drawing segment ids. The segment scores (or sufficient
+        statistics) are then walked in blocks and the weighted sums of all partitions
+        are accumulated, so memory grows with `num_samples` and not with the size of
+        the testset. This requires segment scores or sufficient statistics.
 
         :param testset: Testset
         :param num_samples: Number of testset splits.
         :param sample_ratio: % of the testset to be used in each partition.
         :param pairwise_result: Precomputed scores between two systems.
+        :param n_jobs: Number of processes used to recompute system-level scores.
+        :param seed: Seed for the random partitions. Results are identical for a given
+            seed regardless of `n_jobs`.
+        :param tolerance: Maximum half-width of the 95% confidence intervals of the win
+            rates and of the mean score difference. Enables early stopping.
+        :param decision_threshold: Stop early once the lower bound of the win rate of
+            one of the systems crosses this threshold.
+        :param chunk_size: Number of partitions drawn between convergence checks.
+        :param method: 'index' to draw segment ids with replacement or 'poisson' to
+            weight segments with Poisson(sample_ratio) counts.
         :return: BootstrapResult object
         """
+        n = len(testset)
+        sample_size = max(int(n * sample_ratio), 1)
+        rng = np.random.default_rng(seed)
+        executor = None
+
+        if method not in ("index", "poisson"):
+            raise Exception(f"Unknown bootstrap method '{method}'.")
+
+        if method == "poisson":
+            if cls.sufficient_stats:
+                metric = cls(testset.target_language)
+                x_stats = metric.segment_stats(testset.src, testset.system_x, testset.ref)
+                y_stats = metric.segment_stats(testset.src, testset.system_y, testset.ref)
+                k = x_stats.shape[1]
+                columns = np.hstack([x_stats, y_stats])
+
+                def aggregate(sums, _):
+                    return (
+                        metric.aggregate_stats(sums[:, :k]),
+                        metric.aggregate_stats(sums[:, k:]),
+                    )
+
+            elif cls.segment_level:
+                if pairwise_result is None:
+                    pairwise_result = cls(testset.target_language).pairwise_comparison(
+                        testset
+                    )
+                columns = np.stack(
+                    [
+                        np.asarray(pairwise_result.x_result.seg_scores, dtype=np.float64),
+                        np.asarray(pairwise_result.y_result.seg_scores, dtype=np.float64),
+                    ],
+                    axis=1,
+                )
+
+                def aggregate(sums, weights):
+                    # Partitions where every weight is 0 are scored as ties
+                    means = sums / np.maximum(weights, 1)[:, None]
+                    return means[:, 0], means[:, 1]
 
-        def update_wins(x_score: int, y_score: int, wins: Tuple[int]):
-            if y_score > x_score:
-                wins[1] += 1
-            elif y_score < x_score:
-                wins[0] += 1
             else:
-                wins[2] += 1
-            return wins
+                raise Exception(
+                    f"{cls.name} has neither segment scores nor sufficient statistics "
+                    "to run Poisson bootstrap resampling."
+                )
 
-        def recompute_sys_scores(pairwise_result: PairwiseResult) -> (float, float):
-            if cls.segment_level and pairwise_result is not None:
-                reduces_x_scr = [
-                    pairwise_result.x_result.seg_scores[i] for i in reduced_ids
-                ]
-                reduces_y_scr = [
-                    pairwise_result.y_result.seg_scores[i] for i in reduced_ids
-                ]
+            def resample(num_partitions: int) -> Tuple[np.ndarray, np.ndarray]:
+                return aggregate(
+                    *cls.poisson_weighted_sums(columns, num_partitions, sample_ratio, rng)
+                )
+
+        elif cls.sufficient_stats:
+            # Extract segment statistics once and aggregate them for each partition
+            metric = cls(testset.target_language)
+            x_stats = metric.segment_stats(testset.src, testset.system_x, testset.ref)
+            y_stats = metric.segment_stats(testset.src, testset.system_y, testset.ref)
+
+            def resample(num_partitions: int) -> Tuple[np.ndarray, np.ndarray]:
+                reduced_ids = rng.integers(0, n, size=(num_partitions, sample_size))
                 return (
-                    sum(reduces_x_scr) / len(reduces_x_scr),
-                    sum(reduces_y_scr) / len(reduces_y_scr),
+                    metric.aggregate_stats(cls.resample_stats(x_stats, reduced_ids)),
+                    metric.aggregate_stats(cls.resample_stats(y_stats, reduced_ids)),
                 )
-            else:
-                result = cls(testset.target_language).pairwise_comparison(
-                    PairwiseTestset(
-                        reduced_src,
-                        reduced_x,
-                        reduced_y,
-                        reduced_ref,
-                        language_pair=testset.language_pair,
-                        filenames=testset.filenames,
+
+        elif cls.segment_level and pairwise_result is not None:
+
+            def resample(num_partitions: int) -> Tuple[np.ndarray, np.ndarray]:
+                # Subsample all partitions at once (with replacement)
+                reduced_ids = rng.integers(0, n, size=(num_partitions, sample_size))
+                return cls.resample_seg_scores(pairwise_result, reduced_ids)
+
+        else:
+            # Each partition gets its own random stream so that the partitions do not
+            # depend on how they are distributed across processes.
+            seed_sequence = np.random.SeedSequence(seed)
+            if n_jobs > 1:
+                executor = ProcessPoolExecutor(
+                    max_workers=n_jobs,
+                    initializer=_init_bootstrap_worker,
+                    initargs=(testset,),
+                )
+
+            def resample(num_partitions: int) -> Tuple[np.ndarray, np.ndarray]:
+                seeds = seed_sequence.spawn(num_partitions)
+                if executor is None:
+                    return recompute_partitions(cls, testset, sample_size, seeds)
+
+                chunks = [chunk for chunk in np.array_split(seeds, n_jobs) if len(chunk)]
+                scores = list(
+                    executor.map(
+                        partial(_recompute_worker_partitions, cls, sample_size), chunks
                     )
                 )
-                return (result.x_result.sys_score, result.y_result.sys_score)
+                return (
+                    [score for x, _ in scores for score in x],
+                    [score for _, y in scores for score in y],
+                )
+
+        try:
+            if tolerance is None:
+                x_scores, y_scores = resample(num_samples)
+            else:
+                x_scores, y_scores = np.empty(0), np.empty(0)
+                while len(x_scores) < num_samples:
+                    x_chunk, y_chunk = resample(min(chunk_size, num_samples - len(x_scores)))
+                    x_scores = np.concatenate([x_scores, x_chunk])
+                    y_scores = np.concatenate([y_scores, y_chunk])
+                    if cls.bootstrap_converged(
+                        x_scores, y_scores, tolerance, decision_threshold
+                    ):
+                        break
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return BootstrapResult(
+            x_scores, y_scores, cls.count_wins(x_scores, y_scores), cls.name, method
+        )
+
+    @classmethod
+    def multiple_bootstrap_resampling(
+        cls,
+        testset: MultipleTestset,
+        reduced_ids: np.ndarray,
+        results: Dict[str, MetricResult] = None,
+    ) -> MultipleBootstrapResult:
+        """
+        Bootstrap resampling between any number of systems using a given matrix of
+        partitions. Sharing the same partitions across metrics makes their win rates
+        comparable and avoids drawing them once per metric and pair of systems.
+
+        The segment scores (or sufficient statistics) of all systems are stacked in a
+        single matrix and resampled in one pass. Only metrics without segment scores
+        rescore each partition.
+
+        :param testset: MultipleTestset
+        :param reduced_ids: Matrix with shape (num_samples, sample_size) with the
+            segment ids of each partition (see `draw_partitions`).
+        :param results: Precomputed scores of each system.
+        :return: MultipleBootstrapResult object
+        """
+        systems = testset.system_names
+        num_samples, sample_size = reduced_ids.shape
+
+        if cls.sufficient_stats:
+            metric = cls(testset.target_language)
+            stats = np.stack(
+                [
+                    metric.segment_stats(testset.src, testset.system(name), testset.ref)
+                    for name in systems
+                ],
+                axis=1,
+            )
+            sums = cls.resample_stats(stats.reshape(len(testset), -1), reduced_ids)
+            scores = metric.aggregate_stats(sums.reshape(num_samples, len(systems), -1))
+
+        elif cls.segment_level:
+            if results is None:
+                # Scores each system once and resamples its segment scores
+                results = cls(testset.target_language).multiple_comparison(testset)
+            seg_scores = np.stack(
+                [np.asarray(results[name].seg_scores, dtype=np.float64) for name in systems],
+                axis=1,
+            )
+            scores = cls.resample_stats(seg_scores, reduced_ids) / sample_size
+
+        else:
+            metric = cls(testset.target_language)
+            scores = np.empty((num_samples, len(systems)))
+            for i, ids in enumerate(reduced_ids):
+                partition = testset.select(ids)
+                reduced_src, reduced_ref = partition.src, partition.ref
+                for k, name in enumerate(systems):
+                    scores[i, k] = metric.score(
+                        reduced_src, partition.system(name), reduced_ref
+                    ).sys_score
+
+        return MultipleBootstrapResult(scores, systems, cls.name)
 
+    @classmethod
+    def bootstrap_converged(
+        cls,
+        x_scores: np.ndarray,
+        y_scores: np.ndarray,
+        tolerance: float,
+        decision_threshold: float = 0.95,
+        z: float = 1.96,
+    ) -> bool:
+        """
+        Checks if a sequential bootstrap can stop. That happens when the Wilson score
+        intervals of the X-win, Y-win and tie rates and the normal interval of the mean
+        score difference are all narrower than the tolerance, or when the lower bound of
+        the win rate of one of the systems crosses the decision threshold.
+
+        :param x_scores: System X scores of the partitions drawn so far.
+        :param y_scores: System Y scores of the partitions drawn so far.
+        :param tolerance: Maximum half-width of the confidence intervals.
+        :param decision_threshold: Win rate that decides the comparison.
+        :param z: Quantile of the standard normal distribution (1.96 for 95%).
+        """
+        num_partitions = len(x_scores)
+        if num_partitions < 2:
+            return False
+
+        win_count = np.array(cls.count_wins(x_scores, y_scores))
+        lower, upper = wilson_interval(win_count, num_partitions, z)
+        if decision_threshold is not None and (lower[:2] >= decision_threshold).any():
+            return True
+
+        delta = np.asarray(y_scores) - np.asarray(x_scores)
+        delta_half_width = z * delta.std(ddof=1) / np.sqrt(num_partitions)
+        return bool(
+            ((upper - lower) / 2 <= tolerance).all() and delta_half_width <= tolerance
+        )
+
+    @classmethod
+    def approximate_randomization(
+        cls,
+        testset: PairwiseTestset,
+        num_trials: int,
+        pairwise_result: PairwiseResult = None,
+        block_size: int = 256,
+        seed: int = None,
+    ) -> RandomizationResult:
+        """
+        Paired approximate randomization test. Each trial swaps the outputs of system X
+        and system Y on a random subset of segments and the test counts how often the
+        absolute score difference is at least as large as the observed one.
+
+        The swap masks are drawn as (block_size, n) matrices. For segment-level metrics
+        the shuffled differences are a matrix product with the segment score
+        differences and for metrics with sufficient statistics a matrix product with the
+        statistics differences.
+
+        :param testset: Testset
+        :param num_trials: Number of random shuffles.
+        :param pairwise_result: Precomputed scores between two systems.
+        :param block_size: Number of trials drawn at a time.
+        :param seed: Seed for the random shuffles.
+        :return: RandomizationResult object
+        """
         n = len(testset)
-        ids = list(range(n))
-        sample_size = max(int(n * sample_ratio), 1)
+        if cls.sufficient_stats:
+            metric = cls(testset.target_language)
+            x_stats = metric.segment_stats(testset.src, testset.system_x, testset.ref)
+            y_stats = metric.segment_stats(testset.src, testset.system_y, testset.ref)
+            x_total, y_total = x_stats.sum(axis=0), y_stats.sum(axis=0)
+            stats_delta = y_stats - x_stats
+            x_score, y_score = metric.aggregate_stats(np.stack([x_total, y_total]))
+
+            def shuffled_deltas(swaps: np.ndarray) -> np.ndarray:
+                swapped = swaps @ stats_delta
+                return metric.aggregate_stats(y_total - swapped) - metric.aggregate_stats(
+                    x_total + swapped
+                )
+
+        elif cls.segment_level:
+            if pairwise_result is None:
+                pairwise_result = cls(testset.target_language).pairwise_comparison(
+                    testset
+                )
+            x_seg_scores = np.asarray(pairwise_result.x_result.seg_scores, dtype=np.float64)
+            y_seg_scores = np.asarray(pairwise_result.y_result.seg_scores, dtype=np.float64)
+            seg_delta = y_seg_scores - x_seg_scores
+            x_score, y_score = x_seg_scores.mean(), y_seg_scores.mean()
+
+            def shuffled_deltas(swaps: np.ndarray) -> np.ndarray:
+                # swapping a segment flips the sign of its difference
+                return (seg_delta.sum() - 2 * (swaps @ seg_delta)) / n
+
+        else:
+            metric = cls(testset.target_language)
+            if pairwise_result is None:
+                pairwise_result = metric.pairwise_comparison(testset)
+            x_score = pairwise_result.x_result.sys_score
+            y_score = pairwise_result.y_result.sys_score
+
+            def shuffled_deltas(swaps: np.ndarray) -> np.ndarray:
+                deltas = []
+                for mask in swaps.astype(bool):
+                    system_x = np.where(mask, testset.system_y, testset.system_x)
+                    system_y = np.where(mask, testset.system_x, testset.system_y)
+                    x_result = metric.score(testset.src, system_x.tolist(), testset.ref)
+                    y_result = metric.score(testset.src, system_y.tolist(), testset.ref)
+                    deltas.append(y_result.sys_score - x_result.sys_score)
+                return np.array(deltas)
+
+        observed = abs(y_score - x_score)
+        rng = np.random.default_rng(seed)
+        hits = 0
+        for i in range(0, num_trials, block_size):
+            swaps = rng.random((min(block_size, num_trials - i), n)) < 0.5
+            deltas = shuffled_deltas(swaps.astype(np.float64))
+            hits += int(np.count_nonzero(np.abs(deltas) >= observed - 1e-12))
+
+        p_value = (hits + 1) / (num_trials + 1)
+        return RandomizationResult(x_score, y_score, p_value, num_trials, cls.name)
+
+    @staticmethod
+    def poisson_weighted_sums(
+        columns: np.ndarray,
+        num_partitions: int,
+        sample_ratio: float,
+        rng: np.random.Generator,
+        block_size: int = 4096,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Weighted column sums for a number of Poisson bootstrap partitions. Segments
+        are visited in contiguous blocks of `block_size` rows and only the weights of
+        the current block are kept in memory.
+
+        :param columns: Matrix with shape (n, k) with a row for each segment.
+        :param num_partitions: Number of partitions.
+        :param sample_ratio: Expected number of times each segment is drawn.
+        :param rng: Random generator used to draw the weights.
+        :param block_size: Number of segments weighted at once.
+        :return: Matrix with shape (num_partitions, k) with the weighted sums and the
+            total weight of each partition.
+        """
+        sums = np.zeros((num_partitions, columns.shape[1]))
+        weights = np.zeros(num_partitions)
+        for start in range(0, columns.shape[0], block_size):
+            block = columns[start : start + block_size]
+            w = rng.poisson(sample_ratio, size=(num_partitions, block.shape[0]))
+            w = w.astype(np.float64)
+            sums += w @ block
+            weights += w.sum(axis=1)
+        return sums, weights
+
+    @staticmethod
+    def resample_seg_scores(
+        pairwise_result: PairwiseResult, reduced_ids: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the system scores of every partition from precomputed segment scores.
+
+        :param pairwise_result: Precomputed scores between two systems.
+        :param reduced_ids: Matrix with shape (num_samples, sample_size) with the
+            segment ids of each partition.
+        :return: Arrays with the X and Y system score of each partition.
+        """
+        x_seg_scores = np.asarray(pairwise_result.x_result.seg_scores, dtype=np.float64)
+        y_seg_scores = np.asarray(pairwise_result.y_result.seg_scores, dtype=np.float64)
+        return (
+            x_seg_scores[reduced_ids].mean(axis=-1),
+            y_seg_scores[reduced_ids].mean(axis=-1),
+        )
+
+    @staticmethod
+    def resample_stats(
+        stats: np.ndarray, reduced_ids: np.ndarray, block_size: int = 32
+    ) -> np.ndarray:
+        """
+        Sums the segment statistics of every partition. Partitions are processed in
+        blocks: each block is turned into a (block_size, n) matrix with the number of
+        times each segment was drawn, which is then multiplied by the statistics. This
+        avoids materializing a (num_samples, sample_size, num_stats) tensor.
+
+        :param stats: Segment statistics with shape (n, num_stats).
+        :param reduced_ids: Matrix with shape (num_samples, sample_size) with the
+            segment ids of each partition.
+        :return: Aggregated statistics with shape (num_samples, num_stats).
+        """
+        n = stats.shape[0]
+        sums = np.empty((reduced_ids.shape[0], stats.shape[1]), dtype=np.float64)
+        for i in range(0, reduced_ids.shape[0], block_size):
+            block = reduced_ids[i : i + block_size]
+            offsets = np.arange(block.shape[0])[:, None] * n
+            counts = np.bincount(
+                (block + offsets).ravel(), minlength=block.shape[0] * n
+            ).reshape(block.shape[0], n)
+            sums[i : i + block_size] = counts @ stats
+        return sums
+
+    count_wins = staticmethod(count_wins)
+
+
+def bootstrap_systems(
+    metrics: List[type],
+    testset: MultipleTestset,
+    num_samples: int,
+    sample_ratio: float,
+    results: Dict[str, Dict[str, MetricResult]] = None,
+    seed: int = None,
+) -> Dict[str, MultipleBootstrapResult]:
+    """
+    Bootstrap resampling between all systems of a testset for several metrics. The
+    partitions are drawn once and shared by every system and every metric.
+
+    :param metrics: Metric classes.
+    :param testset: MultipleTestset
+    :param num_samples: Number of testset splits.
+    :param sample_ratio: % of the testset to be used in each partition.
+    :param results: Precomputed scores of each system for each metric (e.g. obtained
+        with `multiple_comparison`).
+    :param seed: Seed for the random partitions.
+    :return: Dictionary with a MultipleBootstrapResult for each metric.
+    """
+    results = results if results is not None else {}
+    reduced_ids = Metric.draw_partitions(len(testset), num_samples, sample_ratio, seed)
+    return {
+        metric.name: metric.multiple_bootstrap_resampling(
+            testset, reduced_ids, results.get(metric.name)
+        )
+        for metric in metrics
+    }
+
+
+def wilson_interval(
+    successes: np.ndarray, total: int, z: float = 1.96
+) -> Tuple[np.ndarray, np.ndarray]:
+    """ Wilson score interval for binomial proportions. """
+    p = np.asarray(successes, dtype=np.float64) / total
+    denominator = 1 + z ** 2 / total
+    center = (p + z ** 2 / (2 * total)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / total + z ** 2 / (4 * total ** 2)) / denominator
+    return center - half_width, center + half_width
+
+
+def _score_shard(
+    num_threads: int, src: List[str], cand: List[str], ref: List[str]
+) -> np.ndarray:
+    torch.set_num_threads(num_threads)
+    return np.asarray(_shard_score_fn(src, cand, ref), dtype=np.float64)
+
+
+def recompute_partitions(
+    metric_cls: type,
+    testset: PairwiseTestset,
+    sample_size: int,
+    seeds: List[np.random.SeedSequence],
+) -> Tuple[List[float], List[float]]:
+    """
+    Recomputes the system-level scores of both systems for the bootstrap partitions
+    drawn from each seed. This runs inside the bootstrap worker processes.
+
+    :param metric_cls: Metric class.
+    :param testset: Testset
+    :param sample_size: Number of segments in each partition.
+    :param seeds: One seed sequence per partition.
+    :return: System X and system Y scores for each partition.
+    """
+    metric = metric_cls(testset.target_language)
+    x_scores, y_scores = [], []
+    for seed in seeds:
+        # Subsample the gold and system outputs (with replacement)
+        reduced_ids = np.random.default_rng(seed).integers(
+            0, len(testset), size=sample_size
+        )
+        result = metric.pairwise_comparison(testset.select(reduced_ids))
+        x_scores.append(result.x_result.sys_score)
+        y_scores.append(result.y_result.sys_score)
+    return x_scores, y_scores
 
-        x_scores, y_scores = [], []
-        wins = [0, 0, 0]
-        for _ in range(num_samples):
-            # Subsample the gold and system outputs (with replacement)
-            reduced_ids = np.random.choice(ids, size=sample_size, replace=True)
 
-            # Calculate accuracy on the reduced sample and save stats
-            reduced_src = [testset[i][0] for i in reduced_ids]
-            reduced_x = [testset[i][1] for i in reduced_ids]
-            reduced_y = [testset[i][2] for i in reduced_ids]
-            reduced_ref = [testset[i][3] for i in reduced_ids]
+def _init_bootstrap_worker(testset: PairwiseTestset) -> None:
+    global _bootstrap_testset
+    _bootstrap_testset = testset
 
-            x_result, y_result = recompute_sys_scores(pairwise_result)
-            wins = update_wins(x_result, y_result, wins)
-            x_scores.append(x_result)
-            y_scores.append(y_result)
 
-        return BootstrapResult(x_scores, y_scores, wins, cls.name)
+def _recompute_worker_partitions(
+    metric_cls: type, sample_size: int, seeds: List[np.random.SeedSequence]
+) -> Tuple[List[float], List[float]]:
+    """ `recompute_partitions` on the testset of the bootstrap worker. """
+    return recompute_partitions(metric_cls, _bootstrap_testset, sample_size, seeds)
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""
+N-gram statistics engine
+==============
+    Vectorized n-gram matching shared by the lexical metrics (BLEU, chrF and
+    GLEU). Tokens are mapped to integer ids once per corpus and all segments are
+    concatenated into a single id array. N-grams of each order are encoded as
+    integers by extending the ids of the (n-1)-grams with the next token, and the
+    clipped overlap of each segment is the intersection of the sorted
+    (segment, n-gram) keys of hypotheses and references.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+Segments = Union[Sequence[str], Sequence[Sequence[str]]]
+# Codes are kept below this value so that int64 arithmetic cannot overflow
+MAX_CODE = 2 ** 62
+
+
+def encode_corpus(*corpora: Segments) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Maps the tokens of several corpora to integer ids shared by all of them.
+    Segments can be strings (their characters are the tokens) or lists of tokens.
+
+    :return: For each corpus, the concatenated token ids and the offsets of its
+        segments (with length `len(corpus) + 1`).
+    """
+    vocab = {}
+    encoded = []
+    for corpus in corpora:
+        lengths = np.fromiter((len(s) for s in corpus), dtype=np.int64, count=len(corpus))
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        if all(isinstance(s, str) for s in corpus):
+            # Characters are already integers: their code points
+            ids = np.frombuffer("".join(corpus).encode("utf-32-le"), dtype=np.uint32)
+            ids = ids.astype(np.int64)
+        else:
+            ids = np.fromiter(
+                (vocab.setdefault(t, len(vocab)) for s in corpus for t in s),
+                dtype=np.int64,
+                count=int(offsets[-1]),
+            )
+        encoded.append((ids, offsets))
+    return encoded
+
+
+def ngram_keys(
+    ids: np.ndarray, offsets: np.ndarray, max_len: int
+) -> List[Tuple[np.ndarray, np.ndarray, int]]:
+    """
+    Integer codes of the n-grams of each order that do not cross segment
+    boundaries. Codes are exact (collision free) within a call.
+
+    :return: For n in 1..max_len, the segment of each n-gram, its code and an upper
+        bound of the codes. Bounds are small enough to combine codes with segments.
+    """
+    num_segments = len(offsets) - 1
+    segment = np.repeat(np.arange(num_segments), np.diff(offsets))
+    # Dense token ids keep the n-gram codes small (e.g. for code points)
+    present = np.zeros(int(ids.max()) + 1 if len(ids) else 1, dtype=bool)
+    present[ids] = True
+    ids = (np.cumsum(present) - 1)[ids]
+    base = max(int(present.sum()), 1)
+    codes, bound = ids, base
+    keys = []
+    for n in range(1, max_len + 1):
+        if n > 1:
+            if bound * base >= MAX_CODE:
+                # Renumbers the (n-1)-grams so that codes do not overflow
+                unique, codes = np.unique(codes, return_inverse=True)
+                codes, bound = codes.reshape(-1), len(unique)
+            # Extends each (n-1)-gram with the token that follows it
+            codes = codes[:-1] * base + ids[n - 1 :]
+            bound *= base
+        valid = segment[: len(codes)] == segment[n - 1 :]
+        ngram_codes, ngram_bound = codes[valid], bound
+        if ngram_bound * num_segments >= MAX_CODE:
+            unique, ngram_codes = np.unique(ngram_codes, return_inverse=True)
+            ngram_codes, ngram_bound = ngram_codes.reshape(-1), max(len(unique), 1)
+        keys.append((segment[: len(codes)][valid], ngram_codes, ngram_bound))
+    return keys
+
+
+def clipped_matches(
+    segment: np.ndarray, codes: np.ndarray, bound: int, is_ref: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Clipped counts of the n-grams shared by hypotheses and references. Keys combine
+    the segment, the n-gram code and the side in the lowest bit, so a single sort
+    groups every n-gram of a segment with the hypothesis occurrences first.
+
+    :return: Segment of each shared n-gram and its clipped count.
+    """
+    keys = np.sort((segment * bound + codes) * 2 + is_ref)
+    ngrams = keys >> 1
+    starts = np.flatnonzero(np.diff(ngrams, prepend=-1))
+    totals = np.diff(np.append(starts, len(keys)))
+    refs = np.add.reduceat(keys & 1, starts) if len(keys) else np.zeros(0, np.int64)
+    overlap = np.minimum(totals - refs, refs)
+    shared = overlap > 0
+    return ngrams[starts[shared]] // bound, overlap[shared]
+
+
+NgramStats = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def ngram_stats(
+    hyp_ids: np.ndarray,
+    hyp_offsets: np.ndarray,
+    ref_ids: np.ndarray,
+    ref_offsets: np.ndarray,
+    max_len: int = 4,
+) -> NgramStats:
+    """
+    N-gram statistics of each segment pair for the orders 1..max_len.
+
+    :return: Clipped matches, hypothesis n-grams and reference n-grams, each with
+        shape (num_segments, max_len).
+    """
+    num_segments = len(hyp_offsets) - 1
+    # Hypotheses and references share the n-gram codes
+    ids = np.concatenate([hyp_ids, ref_ids])
+    offsets = np.concatenate([hyp_offsets, ref_offsets[1:] + hyp_offsets[-1]])
+
+    matches = np.zeros((num_segments, max_len), dtype=np.int64)
+    for n, (segment, codes, bound) in enumerate(ngram_keys(ids, offsets, max_len)):
+        # References are numbered after the hypotheses
+        is_ref = segment >= num_segments
+        segment = np.where(is_ref, segment - num_segments, segment)
+        shared, overlap = clipped_matches(segment, codes, bound, is_ref)
+        matches[:, n] = np.bincount(shared, weights=overlap, minlength=num_segments)
+
+    orders = np.arange(1, max_len + 1)
+    hyp_counts = np.maximum(np.diff(hyp_offsets)[:, None] - orders + 1, 0)
+    ref_counts = np.maximum(np.diff(ref_offsets)[:, None] - orders + 1, 0)
+    return matches, hyp_counts, ref_counts
+
+
+def _chunk_stats(args) -> NgramStats:
+    (hyp_ids, hyp_offsets), (ref_ids, ref_offsets), max_len = args
+    return ngram_stats(hyp_ids, hyp_offsets, ref_ids, ref_offsets, max_len)
+
+
+def _chunk(ids: np.ndarray, offsets: np.ndarray, start: int, end: int):
+    return ids[offsets[start] : offsets[end]], offsets[start : end + 1] - offsets[start]
+
+
+def corpus_ngram_stats(
+    hypotheses: Segments,
+    references: Segments,
+    max_len: int = 4,
+    chunk_size: int = 100000,
+    n_jobs: int = 1,
+) -> NgramStats:
+    """
+    `ngram_stats` of a whole corpus. Segments can be strings (character n-grams)
+    or lists of tokens (word n-grams).
+
+    :param chunk_size: Number of segments processed at once.
+    :param n_jobs: Number of processes used to process the chunks.
+    """
+    (hyp_ids, hyp_offsets), (ref_ids, ref_offsets) = encode_corpus(
+        hypotheses, references
+    )
+    chunks = []
+    for start in range(0, len(hypotheses), chunk_size):
+        end = min(start + chunk_size, len(hypotheses))
+        chunks.append(
+            (
+                _chunk(hyp_ids, hyp_offsets, start, end),
+                _chunk(ref_ids, ref_offsets, start, end),
+                max_len,
+            )
+        )
+    if n_jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            stats = list(executor.map(_chunk_stats, chunks))
+    else:
+        stats = [_chunk_stats(chunk) for chunk in chunks]
+    if not stats:
+        return tuple(np.zeros((0, max_len), dtype=np.int64) for _ in range(3))
+    return tuple(np.concatenate(arrays) for arrays in zip(*stats))
+
+
+def gleu_scores(
+    matches: np.ndarray,
+    hyp_counts: np.ndarray,
+    ref_counts: np.ndarray,
+    min_len: int = 1,
+) -> np.ndarray:
+    """
+    Sentence GLEU of each segment from its n-gram statistics (orders 1..max_len):
+    clipped n-gram matches divided by the largest number of n-grams of both sides
+    (0 when both are empty).
+    """
+    matches = matches[:, min_len - 1 :].sum(axis=1)
+    totals = np.maximum(
+        hyp_counts[:, min_len - 1 :].sum(axis=1), ref_counts[:, min_len - 1 :].sum(axis=1)
+    )
+    return np.divide(matches, totals, out=np.zeros(len(totals)), where=totals > 0)
+
+
+def sentence_gleu_scores(
+    hypotheses: Segments,
+    references: Segments,
+    min_len: int = 1,
+    max_len: int = 4,
+    chunk_size: int = 100000,
+    n_jobs: int = 1,
+) -> np.ndarray:
+    """Sentence GLEU of each hypothesis against its reference."""
+    return gleu_scores(
+        *corpus_ngram_stats(hypotheses, references, max_len, chunk_size, n_jobs),
+        min_len=min_len,
+    )
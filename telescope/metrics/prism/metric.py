@@ -29,6 +29,7 @@ from fairseq import checkpoint_utils, utils
 from fairseq.data import LanguagePairDataset
 from telescope.metrics.metric import Metric
 from telescope.metrics.prism.result import PrismResult
+from telescope.metrics.registry import default_device, load_model
 from telescope.utils import telescope_cache_folder
 from torchnlp.download import download_file_maybe_extract
 
@@ -266,19 +267,29 @@ class Prism(Metric):
                 directory=telescope_cache_folder(),
             )
 
-        self.sp = spm.SentencePieceProcessor()
-        self.sp.Load(model_dir + "/spm.model")
+        self.use_cuda = torch.cuda.is_available()
+        self.sp, self.models, self.args, self.task, self.model_hash = load_model(
+            (self.name, model_dir, default_device()),
+            lambda: self._load_model(model_dir),
+        )
 
         self.lang = language
         self.temperature = temperature
 
+        self.generator = SequenceScorer(
+            self.task.target_dictionary, temperature=temperature
+        )
+
+        if not self.language_support(language):
+            raise Exception(f"{language} is not supported by {self.name}.")
+
+    def _load_model(self, model_dir: str):
+        sp = spm.SentencePieceProcessor()
+        sp.Load(model_dir + "/spm.model")
+
         # this prints things and I can't figure out how to disable it
         with open(os.devnull, "w") as sys.stdout:
-            (
-                self.models,
-                self.args,
-                self.task,
-            ) = checkpoint_utils.load_model_ensemble_and_task(
+            models, args, task = checkpoint_utils.load_model_ensemble_and_task(
                 [
                     model_dir + "/checkpoint.pt",
                 ],
@@ -286,24 +297,14 @@ class Prism(Metric):
             )
             sys.stdout = sys.__stdout__
 
-        self.use_cuda = torch.cuda.is_available()
-
-        self.generator = SequenceScorer(
-            self.task.target_dictionary, temperature=temperature
-        )
-
-        for model in self.models:
+        for model in models:
             if self.use_cuda:
                 model.cuda()
             model.make_generation_fast_(
                 beamable_mm_beam_size=None,
                 need_attn=False,
             )
-
-        # hash model
-        self.model_hash = hash_model(model_dir)
-        if not self.language_support(language):
-            raise Exception(f"{language} is not supported by {self.name}.")
+        return sp, models, args, task, hash_model(model_dir)
 
     @classmethod
     def language_support(self, language: str) -> bool:
@@ -419,25 +420,19 @@ class Prism(Metric):
 
         return np.array(results)
 
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}/{self.model_hash}/{self.lang}/{self.temperature}"
+
     def score(self, src, cand, ref):
         if len(cand) != len(ref):
             raise Exception(
                 f"Length of cand ({len(cand)}) does not match length of ref ({len(ref)})"
             )
 
-        tokenized_cand = [self._encode(sentence, prepend=False) for sentence in cand]
-        tokenized_cand_prep = [
-            self._encode(sentence, prepend=True) for sentence in cand
-        ]
-        tokenized_ref = [self._encode(sentence, prepend=False) for sentence in ref]
-        tokenized_ref_prep = [self._encode(sentence, prepend=True) for sentence in ref]
-
-        forward_scores = self._score_forward(
-            tok_sents_in=tokenized_ref, tok_sents_out=tokenized_cand_prep
-        )
-        reverse_scores = self._score_forward(
-            tok_sents_in=tokenized_cand, tok_sents_out=tokenized_ref_prep
-        )
+        forward_scores, reverse_scores = self.cached_scores(
+            src, cand, ref, self._predict
+        ).T
         scores = (0.5 * forward_scores + 0.5 * reverse_scores).tolist()
 
         forward_score = sum(forward_scores.tolist()) / len(scores)
@@ -452,3 +447,19 @@ class Prism(Metric):
             forward_score,
             reverse_score,
         )
+
+    def _predict(self, src, cand, ref) -> np.ndarray:
+        tokenized_cand = [self._encode(sentence, prepend=False) for sentence in cand]
+        tokenized_cand_prep = [
+            self._encode(sentence, prepend=True) for sentence in cand
+        ]
+        tokenized_ref = [self._encode(sentence, prepend=False) for sentence in ref]
+        tokenized_ref_prep = [self._encode(sentence, prepend=True) for sentence in ref]
+
+        forward_scores = self._score_forward(
+            tok_sents_in=tokenized_ref, tok_sents_out=tokenized_cand_prep
+        )
+        reverse_scores = self._score_forward(
+            tok_sents_in=tokenized_cand, tok_sents_out=tokenized_ref_prep
+        )
+        return np.stack([forward_scores, reverse_scores], axis=1)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""
+Model registry
+==============
+    Keeps the models of neural metrics loaded in memory so that creating a metric
+    several times (e.g. on every Streamlit rerun) does not reload its checkpoint.
+    Models are evicted in least-recently-used order once the registry holds more
+    parameter memory than `TELESCOPE_MODEL_MEMORY` gigabytes (8 by default).
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import torch
+
+
+def model_size(model: Any) -> int:
+    """Bytes taken by the parameters of a model, or of the models it holds."""
+    if isinstance(model, torch.nn.Module):
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    if isinstance(model, (list, tuple)):
+        return sum(model_size(m) for m in model)
+    if hasattr(model, "__dict__"):
+        return sum(
+            model_size(m)
+            for m in vars(model).values()
+            if isinstance(m, (torch.nn.Module, list, tuple))
+        )
+    return 0
+
+
+def default_device() -> str:
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class ModelRegistry:
+    """
+    LRU cache of loaded models bounded by the memory of their parameters.
+
+    :param max_bytes: Memory budget. The most recently used model is always kept
+        even if it exceeds the budget on its own.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    @property
+    def size(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def load(self, key: Hashable, loader: Callable[[], Any], size: int = None) -> Any:
+        """
+        Returns the model stored under `key`, calling `loader` only if it is not
+        loaded yet.
+
+        :param key: Model identifier, usually (metric, model name, device).
+        :param loader: Function that loads the model.
+        :param size: Memory taken by the model. Computed from its parameters if None.
+        """
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+
+            model = loader()
+            self._models[key] = (model, model_size(model) if size is None else size)
+            while len(self._models) > 1 and self.size > self.max_bytes:
+                self._models.popitem(last=False)
+            return model
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+MODEL_REGISTRY = ModelRegistry(
+    int(float(os.environ.get("TELESCOPE_MODEL_MEMORY", 8)) * 1024 ** 3)
+)
+
+
+def load_model(key: Hashable, loader: Callable[[], Any], size: int = None) -> Any:
+    """Loads a model through the shared `MODEL_REGISTRY`."""
+    return MODEL_REGISTRY.load(key, loader, size)
@@ -13,12 +13,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import abc
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
 
 
+def count_wins(x_scores: np.ndarray, y_scores: np.ndarray) -> List[int]:
+    """ Returns the number of X wins, Y wins and ties across partitions. """
+    x_scores, y_scores = np.asarray(x_scores), np.asarray(y_scores)
+    return [
+        int(np.count_nonzero(x_scores > y_scores)),
+        int(np.count_nonzero(y_scores > x_scores)),
+        int(np.count_nonzero(x_scores == y_scores)),
+    ]
+
+
 class MetricResult(metaclass=abc.ABCMeta):
     def __init__(
         self,
@@ -96,19 +106,89 @@ class PairwiseResult:
 class BootstrapResult:
     def __init__(
         self,
-        x_scores: List[float],
-        y_scores: List[float],
+        x_scores: np.ndarray,
+        y_scores: np.ndarray,
         win_count: Tuple[int],
         metric: str,
+        method: str = "index",
     ):
-        self.x_scores = x_scores
-        self.y_scores = y_scores
+        self.x_scores = np.asarray(x_scores, dtype=np.float64)
+        self.y_scores = np.asarray(y_scores, dtype=np.float64)
         self.win_count = win_count
         self.metric = metric
+        self.method = method
+        self.num_splits = len(self.x_scores)
         self.stats = {
             "x_wins (%)": win_count[0] / sum(win_count),
             "y_wins (%)": win_count[1] / sum(win_count),
             "ties (%)": win_count[2] / sum(win_count),
-            "x-mean": np.mean(self.x_scores),
-            "y-mean": np.mean(self.y_scores),
+            "x-mean": self.x_scores.mean(),
+            "y-mean": self.y_scores.mean(),
+            "splits": self.num_splits,
+        }
+
+    def confidence_intervals(self, alpha: float = 0.05) -> Dict[str, Tuple[float]]:
+        """Percentile confidence intervals for the scores of both systems and for
+        their difference (y - x).
+
+        :param alpha: Significance level (e.g 0.05 for 95% confidence intervals).
+        """
+        percentiles = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+        scores = np.stack([self.x_scores, self.y_scores, self.y_scores - self.x_scores])
+        bounds = np.percentile(scores, percentiles, axis=1).T
+        return {
+            key: (lower, upper)
+            for key, (lower, upper) in zip(["x", "y", "delta"], bounds.tolist())
         }
+
+
+class MultipleBootstrapResult:
+    def __init__(
+        self,
+        scores: np.ndarray,
+        systems: List[str],
+        metric: str,
+    ):
+        """
+        :param scores: Matrix with shape (num_samples, num_systems) with the score of
+            each system in each partition.
+        :param systems: System names.
+        :param metric: Metric name.
+        """
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.systems = systems
+        self.metric = metric
+        self.num_splits = self.scores.shape[0]
+        # win_rates[i, j] is the % of partitions where system i beats system j
+        self.win_rates = (self.scores[:, :, None] > self.scores[:, None, :]).mean(axis=0)
+
+    def win_rates_to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.win_rates, index=self.systems, columns=self.systems)
+
+    def pairwise(self, x: str, y: str) -> BootstrapResult:
+        """ Bootstrap result between two of the systems. """
+        x_scores = self.scores[:, self.systems.index(x)]
+        y_scores = self.scores[:, self.systems.index(y)]
+        return BootstrapResult(
+            x_scores, y_scores, count_wins(x_scores, y_scores), self.metric
+        )
+
+
+class RandomizationResult:
+    def __init__(
+        self,
+        x_score: float,
+        y_score: float,
+        p_value: float,
+        num_trials: int,
+        metric: str,
+    ):
+        self.x_score = x_score
+        self.y_score = y_score
+        self.p_value = p_value
+        self.num_trials = num_trials
+        self.metric = metric
+        self.stats = {"p-value": p_value}
+
+    def __str__(self):
+        return f"{self.metric}(p-value = {self.p_value}, trials = {self.num_trials})"
@@ -14,6 +14,8 @@
 # limitations under the License.
 from typing import List
 
+import numpy as np
+from telescope.metrics.lexical import bleu_stats
 from telescope.metrics.metric import Metric
 from telescope.metrics.sacrebleu.result import BLEUResult
 
@@ -23,10 +25,82 @@ import sacrebleu
 class sacreBLEU(Metric):
 
     name = "BLEU"
-    segment_level = False
+    segment_level = True
+    sufficient_stats = True
+
+    def __init__(self, language: str):
+        super().__init__(language)
+        self.bleu = sacrebleu.BLEU()
 
     def score(self, src: List[str], cand: List[str], ref: List[str]) -> BLEUResult:
-        bleu = sacrebleu.corpus_bleu(cand, [ref])
+        stats = self.segment_stats(src, cand, ref)
+        return self.stats_result(
+            stats.sum(axis=0), self.segment_scores(stats).tolist(), src, cand, ref
+        )
+
+    def stats_result(self, stats, seg_scores, src, cand, ref) -> BLEUResult:
+        bleu = self.bleu._compute_score_from_stats(stats.astype(int).tolist())
         return BLEUResult(
-            bleu.score / 100, [], src, cand, ref, self.name, bleu.precisions, bleu.bp
+            bleu.score / 100,
+            seg_scores,
+            src,
+            cand,
+            ref,
+            self.name,
+            bleu.precisions,
+            bleu.bp,
+        )
+
+    def segment_stats(self, src: List[str], cand: List[str], ref: List[str]) -> np.ndarray:
+        """ Returns [hyp_len, ref_len, correct_1..4, total_1..4] for each segment. """
+        return bleu_stats(
+            cand, ref, self.bleu.tokenizer_signature, self.bleu.max_ngram_order
         )
+
+    def segment_scores(self, stats: np.ndarray) -> np.ndarray:
+        """ Same sentence scores as `sacrebleu.sentence_bleu` (effective order). """
+        return self.aggregate_stats(stats, effective_order=True)
+
+    def aggregate_stats(
+        self, stats: np.ndarray, effective_order: bool = False
+    ) -> np.ndarray:
+        """
+        Vectorized version of `sacrebleu.BLEU.compute_bleu` with exp smoothing.
+
+        :param effective_order: Averages only the n-gram orders with hypothesis
+            n-grams, as sacreBLEU does for sentence-level BLEU.
+        """
+        order = self.bleu.max_ngram_order
+        stats = np.asarray(stats, dtype=np.float64)
+        sys_len, ref_len = stats[..., 0], stats[..., 1]
+        correct, total = stats[..., 2 : 2 + order], stats[..., 2 + order :]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            brevity_penalty = np.where(
+                sys_len < ref_len,
+                np.where(sys_len > 0, np.exp(1 - ref_len / sys_len), 0.0),
+                1.0,
+            )
+            smooth, stopped = np.ones_like(sys_len), np.zeros(sys_len.shape, dtype=bool)
+            log_precisions, orders = np.zeros_like(sys_len), np.zeros_like(sys_len)
+            for n in range(order):
+                # orders after the first one without hypothesis n-grams have precision 0
+                stopped |= total[..., n] == 0
+                no_match = ~stopped & (correct[..., n] == 0)
+                smooth = np.where(no_match, smooth * 2, smooth)
+                precision = np.where(
+                    no_match,
+                    100.0 / (smooth * total[..., n]),
+                    100.0 * correct[..., n] / total[..., n],
+                )
+                orders += ~stopped
+                if effective_order:
+                    log_precisions += np.where(stopped, 0.0, np.log(precision))
+                else:
+                    log_precisions += np.where(stopped, -9999999999, np.log(precision))
+
+            if effective_order:
+                scores = brevity_penalty * np.exp(log_precisions / np.maximum(orders, 1))
+            else:
+                scores = brevity_penalty * np.exp(log_precisions / order)
+        return np.where(correct.sum(axis=-1) > 0, scores, 0.0) / 100
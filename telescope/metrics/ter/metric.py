@@ -14,7 +14,9 @@
 # limitations under the License.
 from typing import List
 
+import numpy as np
 import sacrebleu
+from telescope.metrics.lexical import pair_stats
 from telescope.metrics.metric import Metric
 from telescope.metrics.ter.result import TERResult
 
@@ -22,8 +24,41 @@ from telescope.metrics.ter.result import TERResult
 class TER(Metric):
 
     name = "TER"
-    segment_level = False
+    segment_level = True
+    sufficient_stats = True
+
+    def __init__(self, language: str):
+        super().__init__(language)
+        self.ter = sacrebleu.TER()
 
     def score(self, src: List[str], cand: List[str], ref: List[str]) -> TERResult:
-        ter = sacrebleu.corpus_ter(cand, [ref])
-        return TERResult(ter.score/100, [], src, cand, ref, self.name, ter.num_edits)
+        stats = self.segment_stats(src, cand, ref)
+        return self.stats_result(
+            stats.sum(axis=0), self.segment_scores(stats).tolist(), src, cand, ref
+        )
+
+    def stats_result(self, stats, seg_scores, src, cand, ref) -> TERResult:
+        ter = self.ter._compute_score_from_stats(stats.tolist())
+        return TERResult(
+            ter.score/100,
+            seg_scores,
+            src,
+            cand,
+            ref,
+            self.name,
+            ter.num_edits,
+        )
+
+    def segment_stats(self, src: List[str], cand: List[str], ref: List[str]) -> np.ndarray:
+        """ Returns [num_edits, ref_length] for each segment. """
+        return pair_stats(
+            "ter", cand, ref, lambda c, r: self.ter._extract_corpus_statistics(c, [r])
+        ).reshape(len(cand), 2)
+
+    def aggregate_stats(self, stats: np.ndarray) -> np.ndarray:
+        stats = np.asarray(stats, dtype=np.float64)
+        num_edits, ref_length = stats[..., 0], stats[..., 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(
+                ref_length > 0, num_edits / ref_length, (num_edits > 0).astype(float)
+            )
@@ -12,7 +12,13 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import heapq
 import os
+from contextlib import nullcontext
+from typing import List, Sequence
+
+import numpy as np
+import torch
 
 
 def telescope_cache_folder():
@@ -23,3 +29,79 @@ def telescope_cache_folder():
         return cache_directory
     else:
         raise Exception("HOME environment variable is not defined.")
+
+
+def length_sorted_batches(
+    lengths: Sequence[int], max_tokens: int, max_batch_size: int = None
+) -> List[np.ndarray]:
+    """
+    Groups segments of similar length into batches whose padded size (number of
+    segments times the longest segment) fits in a token budget. Segments are sorted
+    from the longest to the shortest so that the most expensive batch runs first.
+    Segments longer than the budget get a batch of their own.
+
+    :param lengths: Length (in tokens) of each segment.
+    :param max_tokens: Maximum number of padded tokens in a batch.
+    :param max_batch_size: Maximum number of segments in a batch.
+    :return: List with the segment ids of each batch. Concatenating the batches
+        gives the order in which segments are processed.
+    """
+    lengths = np.asarray(lengths)
+    order = np.argsort(-lengths, kind="stable")
+    batches, start = [], 0
+    while start < len(order):
+        # The first segment of each batch is the longest one
+        size = max(int(max_tokens // max(lengths[order[start]], 1)), 1)
+        if max_batch_size is not None:
+            size = min(size, max_batch_size)
+        batches.append(order[start : start + size])
+        start += size
+    return batches
+
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+
+def check_precision(precision: str, device: str) -> None:
+    if precision not in PRECISIONS:
+        raise Exception(
+            f"Unknown precision '{precision}'. Choose one of: {', '.join(PRECISIONS)}."
+        )
+    if precision == "int8" and device != "cpu":
+        raise Exception("int8 precision is only supported on CPU.")
+
+
+def quantize(model: torch.nn.Module, precision: str) -> torch.nn.Module:
+    """Dynamic int8 quantization of the linear layers when `precision` is 'int8'."""
+    if precision == "int8":
+        return torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
+def autocast(precision: str, device: str):
+    """Context that runs the enclosed operations in bfloat16 when `precision` is
+    'bf16'."""
+    if precision == "bf16":
+        return torch.autocast(device_type=device, dtype=torch.bfloat16)
+    return nullcontext()
+
+
+def lpt_partition(costs: Sequence[float], num_shards: int) -> List[np.ndarray]:
+    """
+    Longest-processing-time-first assignment: segments are taken in decreasing cost
+    order and each one goes to the shard with the lowest total cost so far.
+
+    :param costs: Cost of each segment (e.g. its number of tokens).
+    :param num_shards: Maximum number of shards.
+    :return: Non-empty shards with the (sorted) segment ids they contain.
+    """
+    costs = np.asarray(costs)
+    loads = [(0, shard) for shard in range(num_shards)]
+    shards = [[] for _ in range(num_shards)]
+    for i in np.argsort(-costs, kind="stable"):
+        load, shard = heapq.heappop(loads)
+        shards[shard].append(i)
+        heapq.heappush(loads, (load + costs[i], shard))
+    return [np.sort(np.array(shard, dtype=int)) for shard in shards if shard]
@@ -22,7 +22,11 @@ import pandas as pd
 import plotly.figure_factory as ff
 import streamlit as st
 
-from telescope.metrics.result import BootstrapResult, PairwiseResult
+from telescope.metrics.result import (
+    BootstrapResult,
+    PairwiseResult,
+    RandomizationResult,
+)
 
 T1_COLOR = "#2E8B57"
 T2_COLOR = "#9ACD32"
@@ -320,7 +324,23 @@ def plot_bootstraping_result(bootstrap_result: BootstrapResult):
             "x win (%)": metric_x_wins,
             "y win (%)": metric_y_wins,
             "ties (%)": metric_ties,
+            "splits": bootstrap_result.num_splits,
         }
     )
     df = pd.DataFrame(data)
     st.dataframe(df)
+
+
+def plot_randomization_results(randomization_results: List[RandomizationResult]):
+    df = pd.DataFrame(
+        [
+            {
+                "metric": result.metric,
+                "x": result.x_score,
+                "y": result.y_score,
+                "p-value": result.p_value,
+            }
+            for result in randomization_results
+        ]
+    )
+    st.dataframe(df)
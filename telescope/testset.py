@@ -12,14 +12,38 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from typing import List, Tuple
+import copy
+import hashlib
+import os
+from typing import Dict, List, Sequence, Tuple
 
+import numpy as np
 import streamlit as st
 
-from telescope.utils import read_lines
+from telescope.utils import MappedLines, read_lines
+
+
+def intern_columns(*columns: List[str]) -> List[np.ndarray]:
+    """Stores each column as a numpy object array. Equal strings (within and across
+    columns) point to the same object so that repeated sources and references are
+    stored only once.
+    """
+    pool = {}
+    interned = []
+    for column in columns:
+        array = np.empty(len(column), dtype=object)
+        array[:] = [pool.setdefault(segment, segment) for segment in column]
+        interned.append(array)
+    return interned
 
 
 class Testset:
+    """Columnar testset. Columns are stored once and are never modified: filters
+    return views that share the columns of the original testset and only hold the
+    index of the rows they keep. Columns read from files stay memory-mapped until a
+    segment is needed.
+    """
+
     def __init__(
         self,
         src: List[str],
@@ -27,11 +51,6 @@ class Testset:
         ref: List[str],
         language_pair: str,
     ) -> None:
-        self.src = src
-        self.ref = ref
-        self.mt = mt
-        self.language_pair = language_pair
-
         assert len(ref) == len(
             src
         ), "mismatch between references and sources ({} > {})".format(
@@ -41,6 +60,11 @@ class Testset:
             ref
         ), "mismatch between MT and references ({} > {})".format(len(mt), len(ref))
 
+        self.language_pair = language_pair
+        self._columns = [src, mt, ref]
+        self._index = None
+        self._lists = {}
+
     @property
     def source_language(self):
         return self.language_pair.split("-")[0]
@@ -49,17 +73,84 @@ class Testset:
     def target_language(self):
         return self.language_pair.split("-")[1]
 
+    @property
+    def src(self) -> List[str]:
+        return self._column(0)
+
+    @property
+    def mt(self) -> List[str]:
+        return self._column(1)
+
+    @property
+    def ref(self) -> List[str]:
+        return self._column(-1)
+
+    @property
+    def index(self) -> np.ndarray:
+        """Rows of the original columns that are part of this testset."""
+        if self._index is None:
+            return np.arange(len(self._columns[0]))
+        return self._index
+
+    def _arrays(self) -> List[np.ndarray]:
+        """Columns as object arrays. The first call decodes and interns the columns
+        in place, so the testset and all its views share the result.
+        """
+        if not all(isinstance(column, np.ndarray) for column in self._columns):
+            columns = list(self._columns)
+            self._columns[:] = intern_columns(*columns)
+            for column in columns:
+                if isinstance(column, MappedLines):
+                    column.close()
+        return self._columns
+
+    def _column(self, i: int) -> List[str]:
+        """Segments of a column in this view, materialised once per view."""
+        i %= len(self._columns)
+        if i not in self._lists:
+            column = self._arrays()[i]
+            self._lists[i] = (
+                column if self._index is None else column[self._index]
+            ).tolist()
+        return self._lists[i]
+
     def __len__(self) -> int:
-        return len(self.ref)
+        return len(self._columns[0]) if self._index is None else len(self._index)
 
     def __getitem__(self, i) -> Tuple[str]:
-        return self.src[i], self.mt[i], self.ref[i]
+        if self._index is not None:
+            i = self._index[i]
+        return tuple(column[i] for column in self._arrays())
+
+    def __copy__(self) -> "Testset":
+        # Views share the columns without decoding them (unlike `__getstate__`)
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view._lists = {}
+        return view
 
-    def apply_filter(self, filter):
-        to_keep = filter.apply_filter()
-        self.src = [self.src[idx] for idx in to_keep]
-        self.mt = [self.mt[idx] for idx in to_keep]
-        self.ref = [self.ref[idx] for idx in to_keep]
+    def __getstate__(self):
+        # Memory-mapped columns cannot be pickled
+        self._arrays()
+        return dict(self.__dict__, _lists={})
+
+    def __iter__(self):
+        return zip(*(self._column(i) for i in range(len(self._columns))))
+
+    def select(self, to_keep: Sequence[int]) -> "Testset":
+        """Returns a view with the given rows of this testset. The columns are shared
+        and only the index is stored.
+
+        :param to_keep: Indexes of the rows to keep (relative to this testset).
+        """
+        view = copy.copy(self)
+        to_keep = np.asarray(to_keep, dtype=np.intp)
+        view._index = to_keep if self._index is None else self._index[to_keep]
+        return view
+
+    def apply_filter(self, filter) -> "Testset":
+        """Returns a view with the segments kept by the filter."""
+        return self.select(filter.apply_filter())
 
 
 class PairwiseTestset(Testset):
@@ -72,13 +163,6 @@ class PairwiseTestset(Testset):
         language_pair: str,
         filenames: List[str],
     ) -> None:
-        self.src = src
-        self.ref = ref
-        self.system_x = system_x
-        self.system_y = system_y
-        self.language_pair = language_pair
-        self.filenames = filenames
-
         assert len(ref) == len(
             src
         ), "mismatch between references and sources ({} > {})".format(
@@ -95,9 +179,46 @@ class PairwiseTestset(Testset):
             len(system_x), len(ref)
         )
 
+        self.language_pair = language_pair
+        self.filenames = filenames
+        self._columns = [src, system_x, system_y, ref]
+        self._index = None
+        self._lists = {}
+
+    @property
+    def system_x(self) -> List[str]:
+        return self._column(1)
+
+    @property
+    def system_y(self) -> List[str]:
+        return self._column(2)
+
     @staticmethod
     def hash_func(testset):
-        return " ".join(testset.filenames)
+        # Views of the same files only differ in the rows they keep
+        index = testset._index
+        digest = "" if index is None else hashlib.sha1(index.tobytes()).hexdigest()
+        return " ".join(testset.filenames) + " " + digest
+
+    @classmethod
+    def from_files(
+        cls,
+        src: str,
+        system_x: str,
+        system_y: str,
+        ref: str,
+        language_pair: str,
+    ) -> "PairwiseTestset":
+        """Loads a testset from text files. The files are memory-mapped and their line
+        counts are checked before any line is decoded.
+        """
+        files = [MappedLines(path) for path in (src, system_x, system_y, ref)]
+        try:
+            return cls(*files, language_pair, [src, system_x, system_y, ref])
+        except Exception:
+            for file in files:
+                file.close()
+            raise
 
     @classmethod
     def read_data(cls):
@@ -140,12 +261,115 @@ class PairwiseTestset(Testset):
                 [source_file.name, x_file.name, y_file.name, ref_file.name],
             )
 
-    def __getitem__(self, i) -> Tuple[str]:
-        return self.src[i], self.system_x[i], self.system_y[i], self.ref[i]
-
-    def apply_filter(self, filter):
-        to_keep = filter.apply_filter()
-        self.src = [self.src[idx] for idx in to_keep]
-        self.system_x = [self.system_x[idx] for idx in to_keep]
-        self.system_y = [self.system_y[idx] for idx in to_keep]
-        self.ref = [self.ref[idx] for idx in to_keep]
+
+class MultipleTestset(Testset):
+    def __init__(
+        self,
+        src: List[str],
+        systems: Dict[str, List[str]],
+        ref: List[str],
+        language_pair: str,
+        filenames: List[str],
+    ) -> None:
+        assert len(ref) == len(
+            src
+        ), "mismatch between references and sources ({} > {})".format(
+            len(ref), len(src)
+        )
+        for name, system in systems.items():
+            assert len(system) == len(
+                ref
+            ), "mismatch between system {} and references ({} > {})".format(
+                name, len(system), len(ref)
+            )
+
+        self.language_pair = language_pair
+        self.filenames = filenames
+        self._system_names = list(systems.keys())
+        self._columns = [src, *systems.values(), ref]
+        self._index = None
+        self._lists = {}
+
+    @property
+    def system_names(self) -> List[str]:
+        return list(self._system_names)
+
+    @property
+    def systems(self) -> Dict[str, List[str]]:
+        return {
+            name: self._column(i + 1) for i, name in enumerate(self._system_names)
+        }
+
+    def system(self, name: str) -> List[str]:
+        return self._column(self._system_names.index(name) + 1)
+
+    hash_func = staticmethod(PairwiseTestset.hash_func)
+
+    @classmethod
+    def from_files(
+        cls,
+        src: str,
+        systems: List[str],
+        ref: str,
+        language_pair: str,
+    ) -> "MultipleTestset":
+        """Loads a testset from text files. Systems are named after their files
+        (without extension)."""
+        names = [os.path.splitext(os.path.basename(path))[0] for path in systems]
+        if len(set(names)) < len(names):
+            raise Exception("System files must have different names.")
+        files = [MappedLines(path) for path in [src] + list(systems) + [ref]]
+        try:
+            return cls(
+                files[0],
+                dict(zip(names, files[1:-1])),
+                files[-1],
+                language_pair,
+                [src] + list(systems) + [ref],
+            )
+        except Exception:
+            for file in files:
+                file.close()
+            raise
+
+    @classmethod
+    def read_data(cls):
+        st.subheader("Upload Files for analysis:")
+        left1, right1 = st.beta_columns(2)
+        source_file = left1.file_uploader("Upload Sources", type=["txt"])
+        sources = read_lines(source_file)
+
+        ref_file = right1.file_uploader("Upload References", type=["txt"])
+        references = read_lines(ref_file)
+
+        system_files = st.file_uploader(
+            "Upload the Translations of each System",
+            type=["txt"],
+            accept_multiple_files=True,
+        )
+        names = [os.path.splitext(f.name)[0] for f in system_files]
+        if len(set(names)) < len(names):
+            st.error("System files must have different names.")
+            return None
+
+        language_pair = st.text_input(
+            "Please input the lanaguage pair of the files to analyse (e.g. 'en-ru'):",
+            "",
+        )
+
+        if (
+            (ref_file is not None)
+            and (source_file is not None)
+            and len(system_files) > 1
+            and (language_pair != "")
+        ):
+            st.success(
+                "Source, References, Translations and LP were successfully uploaded!"
+            )
+            return cls(
+                sources,
+                {name: read_lines(f) for name, f in zip(names, system_files)},
+                references,
+                language_pair,
+                [source_file.name] + [f.name for f in system_files] + [ref_file.name],
+            )
@@ -13,8 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import mmap
 import os
-from io import StringIO
+from typing import Iterator, List, Union
+
+import numpy as np
 
 
 def telescope_cache_folder():
@@ -27,9 +30,101 @@ def telescope_cache_folder():
         raise Exception("HOME environment variable is not defined.")
 
 
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files inside a directory."""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
 def read_lines(file):
     if file is not None:
-        file = StringIO(file.getvalue().decode())
-        lines = [line.strip() for line in file.readlines()]
-        return lines
+        return MappedLines(file.getvalue()).tolist()
     return None
+
+
+class MappedLines:
+    """Lines of a text file that are decoded only when accessed.
+
+    The file is memory-mapped and a single scan over its bytes builds the offsets
+    of every line, so the number of lines is known before anything is decoded.
+    Lines are stripped like `read_lines` does.
+
+    :param source: Path to a text file or an in-memory bytes buffer.
+    :param block_size: Number of bytes scanned at once when looking for newlines.
+    """
+
+    def __init__(self, source: Union[str, bytes], block_size: int = 1 << 26):
+        self._file = None
+        if isinstance(source, (bytes, bytearray)):
+            self._buffer = source
+        else:
+            self._file = open(source, "rb")
+            size = os.fstat(self._file.fileno()).st_size
+            # Empty files cannot be memory-mapped
+            self._buffer = (
+                mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                if size > 0
+                else b""
+            )
+
+        data = np.frombuffer(self._buffer, dtype=np.uint8)
+        newlines = np.concatenate(
+            [np.empty(0, dtype=np.int64)]
+            + [
+                np.flatnonzero(data[i : i + block_size] == 10) + i
+                for i in range(0, len(data), block_size)
+            ]
+        )
+        ends = newlines
+        if len(data) and data[-1] != 10:
+            # Last line without a trailing newline
+            ends = np.append(ends, len(data))
+        self._starts = np.concatenate([[0], newlines + 1])[: len(ends)]
+        self._ends = ends
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            return self.lines(start, stop)
+        return self._buffer[self._starts[i] : self._ends[i]].decode("utf-8").strip()
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def lines(self, start: int, stop: int) -> List[str]:
+        """Decodes the lines between `start` and `stop` at once."""
+        if stop <= start:
+            return []
+        text = self._buffer[self._starts[start] : self._ends[stop - 1]].decode("utf-8")
+        return [line.strip() for line in text.split("\n")]
+
+    def iter_chunks(self, chunk_size: int = 10000) -> Iterator[List[str]]:
+        """Yields the decoded lines in chunks of `chunk_size` lines."""
+        for start in range(0, len(self), chunk_size):
+            yield self.lines(start, min(start + chunk_size, len(self)))
+
+    def tolist(self) -> List[str]:
+        return [line for chunk in self.iter_chunks() for line in chunk]
+
+    def close(self) -> None:
+        if self._file is not None:
+            if isinstance(self._buffer, mmap.mmap):
+                self._buffer.close()
+            self._file.close()
+            self._file = None
+            self._buffer = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
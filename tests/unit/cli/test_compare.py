@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
+import tempfile
 import unittest
 
 from click.testing import CliRunner
@@ -73,6 +74,31 @@ class TestCompareCli(unittest.TestCase):
         result = self.runner.invoke(compare, args, catch_exceptions=False)
         self.assertEqual(result.exit_code, 0)
 
+    def test_with_approximate_randomization(self):
+        args = [
+            "-s",
+            self.src,
+            "-x",
+            self.system_x,
+            "-y",
+            self.system_y,
+            "-r",
+            self.ref,
+            "-l",
+            "en",
+            "-m",
+            "chrF",
+            "--seg_metric",
+            "GLEU",
+            "--significance",
+            "ar",
+            "--trials",
+            100,
+        ]
+        result = self.runner.invoke(compare, args, catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("p-value", result.stdout)
+
     def test_ner_filter(self):
         args = [
             "-s",
@@ -96,6 +122,46 @@ class TestCompareCli(unittest.TestCase):
         self.assertIn("Filters Successfully applied. Corpus reduced in", result.stdout)
         self.assertEqual(result.exit_code, 0)
 
+    def test_stacked_filters(self):
+        # Sources with duplicates, so the length filter runs on a smaller view
+        folder = tempfile.TemporaryDirectory()
+        files = []
+        for path in (self.src, self.system_x, self.system_y, self.ref):
+            lines = open(path).readlines()[:100]
+            files.append(os.path.join(folder.name, os.path.basename(path)))
+            with open(files[-1], "w") as fp:
+                fp.writelines(lines + lines[:20])
+        src, system_x, system_y, ref = files
+        args = [
+            "-s",
+            src,
+            "-x",
+            system_x,
+            "-y",
+            system_y,
+            "-r",
+            ref,
+            "-l",
+            "en",
+            "-f",
+            "duplicates",
+            "-f",
+            "length",
+            "--length_min_val",
+            0.0,
+            "--length_max_val",
+            0.5,
+            "-m",
+            "chrF",
+            "--seg_metric",
+            "GLEU",
+        ]
+        result = self.runner.invoke(compare, args, catch_exceptions=False)
+        folder.cleanup()
+        self.assertEqual(result.exit_code, 0)
+        # 100 unique segments, half of them in the shortest length buckets
+        self.assertIn("Corpus reduced in 58.33%", result.stdout)
+
     def test_with_output(self):
         args = [
             "-s",
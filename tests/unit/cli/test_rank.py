@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+from telescope.cli import rank
+from tests.data import DATA_PATH
+
+
+class TestRankCli(unittest.TestCase):
+
+    system_a = os.path.join(DATA_PATH, "OnlineA.txt")
+    system_b = os.path.join(DATA_PATH, "OnlineB.txt")
+    src = os.path.join(DATA_PATH, "src_400.ru.txt")
+    ref = os.path.join(DATA_PATH, "ref_400.en.txt")
+
+    def setUp(self):
+        self.runner = CliRunner()
+
+    def test_rank(self):
+        folder = tempfile.TemporaryDirectory()
+        args = [
+            "-s",
+            self.src,
+            "-t",
+            self.system_a,
+            "-t",
+            self.system_b,
+            "-t",
+            self.ref,
+            "-r",
+            self.ref,
+            "-l",
+            "en",
+            "-m",
+            "BLEU",
+            "-m",
+            "GLEU",
+            "--num_splits",
+            20,
+            "--seed",
+            3,
+            "-o",
+            folder.name,
+        ]
+        result = self.runner.invoke(rank, args, catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("GLEU win rates", result.stdout)
+        with open(os.path.join(folder.name, "win-rates.json")) as fp:
+            win_rates = json.load(fp)
+        folder.cleanup()
+        for metric in ["BLEU", "GLEU"]:
+            # The reference (used as a system) beats both systems in every partition
+            self.assertEqual(win_rates[metric]["ref_400.en"]["OnlineA"], 1.0)
+            self.assertEqual(win_rates[metric]["ref_400.en"]["OnlineB"], 1.0)
+            self.assertEqual(win_rates[metric]["OnlineA"]["OnlineA"], 0.0)
+
+    def test_single_system(self):
+        args = ["-s", self.src, "-t", self.system_a, "-r", self.ref, "-l", "en"]
+        args += ["-m", "BLEU"]
+        result = self.runner.invoke(rank, args)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("at least two systems", result.output)
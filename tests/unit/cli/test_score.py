@@ -17,6 +17,9 @@ import unittest
 
 from click.testing import CliRunner
 from telescope.cli import score
+from telescope.metrics.sacrebleu.metric import sacreBLEU
+from telescope.metrics.ter.metric import TER
+from telescope.metrics.zero_edit.metric import ZeroEdit
 from tests.data import DATA_PATH
 
 
@@ -132,3 +135,36 @@ class TestScoreCli(unittest.TestCase):
         ]
         result = self.runner.invoke(score, args, catch_exceptions=False)
         self.assertEqual(result.exit_code, 0)
+
+    def test_line_count_mismatch(self):
+        args = [
+            "-s",
+            self.src,
+            "-t",
+            os.path.join(DATA_PATH, "OnlineA.txt"),
+            "-r",
+            self.ref,
+            "-l",
+            "en",
+            "-m",
+            "chrF",
+        ]
+        result = self.runner.invoke(score, args)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("mismatch", result.output)
+
+    def test_streamed_scores(self):
+        # Metrics with sufficient statistics score the files chunk by chunk
+        args = ["-s", self.src, "-t", self.hyp, "-r", self.ref, "-l", "en"]
+        args += ["-m", "BLEU", "-m", "ZeroEdit", "-m", "TER"]
+        result = self.runner.invoke(score, args, catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+
+        src, hyp, ref = [
+            [l.strip() for l in open(path)] for path in (self.src, self.hyp, self.ref)
+        ]
+        expected = [
+            str(metric(language="en").score(src, hyp, ref))
+            for metric in (sacreBLEU, ZeroEdit, TER)
+        ]
+        self.assertListEqual(result.output.splitlines(), expected)
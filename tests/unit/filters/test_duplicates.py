@@ -32,10 +32,11 @@ class TestDuplicatesFilter(unittest.TestCase):
     def test_sucess_filter(self):
         filter = DuplicatesFilter(self.testset)
         orig_size = len(self.testset)
-        self.testset.apply_filter(filter)
-        self.assertEqual(len(self.testset), 2)
-        self.assertTrue(len(self.testset) < orig_size)
-        src, x, y, ref = self.testset[0]
+        testset = self.testset.apply_filter(filter)
+        self.assertEqual(len(self.testset), orig_size)
+        self.assertEqual(len(testset), 2)
+        self.assertTrue(len(testset) < orig_size)
+        src, x, y, ref = testset[0]
         self.assertEqual(src, "A")
-        src, x, y, ref = self.testset[1]
+        src, x, y, ref = testset[1]
         self.assertEqual(src, "cD")
@@ -13,8 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import os
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
 
+from telescope.cache import SegmentCache
 from telescope.filters.ner import NERFilter
 from telescope.testset import PairwiseTestset
 from tests.data import DATA_PATH
@@ -33,10 +38,11 @@ class TestNERFilter(unittest.TestCase):
     def test_sucess_filter(self):
         filter = NERFilter(self.testset)
         orig_size = len(self.testset)
-        self.testset.apply_filter(filter)
-        self.assertEqual(len(self.testset), 1)
-        self.assertTrue(len(self.testset) < orig_size)
-        src, x, y, ref = self.testset[0]
+        testset = self.testset.apply_filter(filter)
+        self.assertEqual(len(self.testset), orig_size)
+        self.assertEqual(len(testset), 1)
+        self.assertTrue(len(testset) < orig_size)
+        src, x, y, ref = testset[0]
         self.assertEqual(ref, "I love to live in Lisbon")
 
     def test_unsuported_language(self):
@@ -45,3 +51,74 @@ class TestNERFilter(unittest.TestCase):
             NERFilter(self.testset)
         the_exception = cm.exception
         self.assertEqual(str(the_exception), "pt-ja is not supperted by Stanza NER.")
+
+
+class FakePipeline:
+    """Tags "Lisbon" as an entity and records the batches it receives."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, docs):
+        self.batches.append([doc.text for doc in docs])
+        return [
+            SimpleNamespace(ents=["Lisbon"] if "Lisbon" in doc.text else [])
+            for doc in docs
+        ]
+
+
+class TestNERFilterCache(unittest.TestCase):
+
+    src = ["Ich wohne in Lissabon.", "Hallo!", "Hallo!", "Ein langer Satz ohne Namen."]
+    ref = ["I live in Lisbon.", "Hello!", "Hello!", "A long sentence without names."]
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = SegmentCache(os.path.join(self.folder.name, "scores.sqlite"))
+        self.testset = PairwiseTestset(
+            self.src, self.ref, self.ref, self.ref, "pt-en", ["src", "x", "y", "ref"]
+        )
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_batches_and_cache(self):
+        pipeline = FakePipeline()
+        load_pipeline = mock.patch(
+            "telescope.filters.ner.load_pipeline", return_value=pipeline
+        )
+        get_segment_cache = mock.patch(
+            "telescope.filters.ner.get_segment_cache", return_value=self.cache
+        )
+        with load_pipeline, get_segment_cache:
+            filter = NERFilter(self.testset, batch_size=2)
+            self.assertListEqual(filter.apply_filter(), [0])
+            # Distinct segments sorted by length in batches of 2
+            self.assertListEqual(
+                pipeline.batches,
+                [["Hello!", "I live in Lisbon."], ["A long sentence without names."]],
+            )
+            # Flags come from the persistent cache the second time
+            self.assertListEqual(NERFilter(self.testset).apply_filter(), [0])
+            self.assertEqual(len(pipeline.batches), 2)
+
+    def test_worker_thread(self):
+        # Streamlit runs the filters in its script threads: the cache connection
+        # opened by the main thread must not be reused there
+        self.cache.set_many({"warm": [0.0]})
+        pipeline = FakePipeline()
+        load_pipeline = mock.patch(
+            "telescope.filters.ner.load_pipeline", return_value=pipeline
+        )
+        get_segment_cache = mock.patch(
+            "telescope.filters.ner.get_segment_cache", return_value=self.cache
+        )
+        with load_pipeline, get_segment_cache:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                kept = executor.submit(
+                    lambda: NERFilter(self.testset).apply_filter()
+                ).result()
+            self.assertListEqual(kept, [0])
+            # The flags written by the worker thread are read by the main thread
+            self.assertListEqual(NERFilter(self.testset).apply_filter(), [0])
+            self.assertEqual(len(pipeline.batches), 1)
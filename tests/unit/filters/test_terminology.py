@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from telescope.filters import TerminologyFilter
+from telescope.filters.terminology import Glossary, TermAutomaton
+from telescope.testset import PairwiseTestset
+
+
+class TestTerminologyFilter(unittest.TestCase):
+
+    src = [
+        "Der Drucker ist kaputt.",
+        "Ein schöner Tag.",
+        "Die Druckerpatrone ist leer.",
+        "Das Betriebssystem und der Drucker.",
+    ]
+    x = [
+        "The printer is broken.",
+        "A nice day.",
+        "The cartridge is empty.",
+        "The OS and the printer.",
+    ]
+    y = [
+        "The printing machine is broken.",
+        "A beautiful day.",
+        "The ink cartridge is empty.",
+        "The operating system and the printer.",
+    ]
+    ref = y
+    testset = PairwiseTestset(
+        src, x, y, ref, "de-en", ["src.de", "x.en", "y.en", "ref.en"]
+    )
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.glossary = os.path.join(self.folder.name, "glossary.tsv")
+        with open(self.glossary, "w") as fp:
+            fp.write("Drucker\tprinter\n")
+            fp.write("Betriebssystem\toperating system\tOS\n")
+            fp.write("Druckerpatrone\tink cartridge\n")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_automaton(self):
+        automaton = TermAutomaton([("a", "b"), ("b", "c"), ("a", "b", "c", "d"), ("c",)])
+        self.assertSetEqual(automaton.find(list("xabcd")), {0, 1, 2, 3})
+        self.assertSetEqual(automaton.find(list("abx")), {0})
+        self.assertSetEqual(automaton.find(list("bcx")), {1, 3})
+        self.assertSetEqual(automaton.find(list("xyz")), set())
+
+    def test_filter(self):
+        with mock.patch.dict(os.environ, {"HOME": self.folder.name}):
+            filter = TerminologyFilter(self.testset, self.glossary)
+        # Terms match whole tokens: "Druckerpatrone" does not contain "Drucker"
+        terms = [
+            sorted(filter.glossary.source_terms[t] for t in segment_terms)
+            for segment_terms in filter.source_terms
+        ]
+        self.assertListEqual(
+            terms, [["drucker"], [], ["druckerpatrone"], ["betriebssystem", "drucker"]]
+        )
+        testset = self.testset.apply_filter(filter)
+        self.assertListEqual(testset.src, [self.src[0], self.src[2], self.src[3]])
+
+        accuracy = filter.term_accuracy()
+        self.assertAlmostEqual(accuracy["x"], 3 / 4)
+        self.assertAlmostEqual(accuracy["y"], 3 / 4)
+
+    def test_glossary_cache(self):
+        with mock.patch.dict(os.environ, {"HOME": self.folder.name}):
+            glossary = Glossary.from_file(self.glossary)
+            cache = os.path.join(self.folder.name, ".cache/mt-telescope/glossaries")
+            self.assertEqual(len(os.listdir(cache)), 1)
+            with mock.patch.object(Glossary, "__init__", side_effect=AssertionError):
+                reloaded = Glossary.from_file(self.glossary)
+        self.assertListEqual(reloaded.source_terms, glossary.source_terms)
+        self.assertListEqual(reloaded.translations, glossary.translations)
@@ -12,8 +12,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import hashlib
 import unittest
+from unittest import mock
 
+import numpy as np
+import torch
 from telescope.metrics.bertscore.metric import BERTScore
 
 cands = [
@@ -56,5 +60,44 @@ class TestBertScore(unittest.TestCase):
         self.assertListEqual(result.cand, cands)
         self.assertTrue(self.bertscore.segment_level)
 
+    def test_multiple_score(self):
+        systems = {"x": cands, "y": refs[::-1]}
+        with mock.patch.object(self.bertscore, "use_cache", False):
+            results = self.bertscore.multiple_score(None, systems, refs)
+            expected = {
+                n: self.bertscore.score(None, c, refs) for n, c in systems.items()
+            }
+        for name, result in expected.items():
+            for i in range(3):
+                self.assertAlmostEqual(
+                    results[name].seg_scores[i], result.seg_scores[i], places=4
+                )
+
+    def test_sharded_multiple_score(self):
+        def fake_embed(metric, sentences):
+            stats = []
+            for s in sentences:
+                seed = int(hashlib.sha1(s.encode("utf-8")).hexdigest()[:8], 16)
+                generator = torch.Generator().manual_seed(seed)
+                length = len(s.split()) + 2
+                embedding = torch.randn(length, 8, generator=generator)
+                stats.append((embedding, torch.ones(length)))
+            return stats
+
+        systems = {"x": cands, "y": refs[::-1]}
+        sharded = BERTScore(language="en", n_procs=2)
+        with mock.patch.object(BERTScore, "use_cache", False), mock.patch.object(
+            BERTScore, "_embed", autospec=True, side_effect=fake_embed
+        ) as embed, mock.patch.object(
+            BERTScore, "segment_costs", return_value=np.array([1, 2, 3])
+        ):
+            results = sharded.multiple_score(None, systems, refs)
+            # References are embedded once in this process, candidates in the workers
+            embedded = [c.args[1] for c in embed.call_args_list if c.args[1]]
+            self.assertListEqual(embedded, [refs])
+            expected = self.bertscore.multiple_score(None, systems, refs)
+        for name, result in expected.items():
+            np.testing.assert_allclose(results[name].seg_scores, result.seg_scores)
+
     def test_name_property(self):
         self.assertEqual(self.bertscore.name, "BERTScore")
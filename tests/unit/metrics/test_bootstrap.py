@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+from telescope.metrics.gleu.metric import GLEU
+from telescope.metrics.metric import bootstrap_systems
+from telescope.metrics.sacrebleu.metric import sacreBLEU
+from telescope.metrics.zero_edit.metric import ZeroEdit
+from telescope.testset import MultipleTestset, PairwiseTestset
+from tests.data import DATA_PATH
+
+
+class TestBootstrap(unittest.TestCase):
+
+    ref = ["a", "b", "c", "d", "e", "f", "g", "h"]
+    system_x = ["a", "b", "c", "d", "e", "f", "x", "x"]
+    system_y = ["a", "x", "x", "x", "x", "x", "x", "x"]
+    testset = PairwiseTestset(
+        src=ref,
+        system_x=system_x,
+        system_y=system_y,
+        ref=ref,
+        language_pair="en-en",
+        filenames=["src.txt", "x.txt", "y.txt", "ref.txt"],
+    )
+
+    def test_segment_level_bootstrap(self):
+        pairwise_result = ZeroEdit("en").pairwise_comparison(self.testset)
+        result = ZeroEdit.bootstrap_resampling(self.testset, 200, 0.5, pairwise_result)
+
+        self.assertIsInstance(result.x_scores, np.ndarray)
+        self.assertEqual(result.x_scores.shape, (200,))
+        self.assertEqual(result.y_scores.shape, (200,))
+        self.assertEqual(sum(result.win_count), 200)
+        self.assertGreater(result.win_count[0], result.win_count[1])
+        self.assertTrue(((result.x_scores >= 0) & (result.x_scores <= 1)).all())
+        self.assertAlmostEqual(result.stats["x-mean"], 0.75, places=1)
+
+    def test_count_wins(self):
+        wins = ZeroEdit.count_wins([0.1, 0.5, 0.3, 0.2], [0.2, 0.4, 0.3, 0.1])
+        self.assertListEqual(wins, [2, 1, 1])
+
+    def test_confidence_intervals(self):
+        pairwise_result = ZeroEdit("en").pairwise_comparison(self.testset)
+        result = ZeroEdit.bootstrap_resampling(self.testset, 100, 1.0, pairwise_result)
+        intervals = result.confidence_intervals(alpha=0.1)
+        self.assertLessEqual(intervals["x"][0], intervals["x"][1])
+        self.assertLessEqual(intervals["delta"][1], 0)
+
+    def test_sufficient_stats_bootstrap(self):
+        x = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineA.txt"))]
+        y = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineB.txt"))]
+        ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+        testset = PairwiseTestset(
+            ref, x, y, ref, "ru-en", ["src.txt", "x.txt", "y.txt", "ref.txt"]
+        )
+        result = sacreBLEU.bootstrap_resampling(testset, 20, 0.5)
+        self.assertEqual(result.x_scores.shape, (20,))
+        self.assertEqual(sum(result.win_count), 20)
+
+        # Aggregated statistics must match recomputing BLEU on the partition
+        bleu = sacreBLEU("en")
+        reduced_ids = np.array([[0, 5, 5, 17, 399], [1, 2, 3, 4, 5]])
+        scores = bleu.aggregate_stats(
+            sacreBLEU.resample_stats(bleu.segment_stats([], x, ref), reduced_ids)
+        )
+        for i, ids in enumerate(reduced_ids):
+            expected = bleu.score([], [x[j] for j in ids], [ref[j] for j in ids])
+            self.assertAlmostEqual(scores[i], expected.sys_score, places=6)
+
+    def test_parallel_bootstrap_is_deterministic(self):
+        # Without precomputed scores every partition is rescored
+        sequential = ZeroEdit.bootstrap_resampling(self.testset, 12, 0.5, seed=42)
+        parallel = ZeroEdit.bootstrap_resampling(
+            self.testset, 12, 0.5, n_jobs=3, seed=42
+        )
+        np.testing.assert_array_equal(sequential.x_scores, parallel.x_scores)
+        np.testing.assert_array_equal(sequential.y_scores, parallel.y_scores)
+        self.assertListEqual(sequential.win_count, parallel.win_count)
+
+    def test_parallel_bootstrap_sends_testset_once(self):
+        # Sequential bootstrap maps several chunks of partitions to the workers
+        patch = mock.patch.object(
+            PairwiseTestset,
+            "__getstate__",
+            autospec=True,
+            side_effect=lambda testset: testset.__dict__,
+        )
+        with patch as getstate:
+            ZeroEdit.bootstrap_resampling(
+                self.testset, 12, 0.5, n_jobs=3, seed=42, tolerance=0.0, chunk_size=2
+            )
+        self.assertLessEqual(getstate.call_count, 3)
+
+    def test_seed(self):
+        pairwise_result = ZeroEdit("en").pairwise_comparison(self.testset)
+        first = ZeroEdit.bootstrap_resampling(
+            self.testset, 50, 0.5, pairwise_result, seed=1
+        )
+        second = ZeroEdit.bootstrap_resampling(
+            self.testset, 50, 0.5, pairwise_result, seed=1
+        )
+        np.testing.assert_array_equal(first.x_scores, second.x_scores)
+
+    def test_sequential_bootstrap(self):
+        ref = ["a", "b", "c", "d", "e", "f", "g", "h"] * 10
+        testset = PairwiseTestset(
+            ref, ref, ["x"] * len(ref), ref, "en-en", ["a", "b", "c", "d"]
+        )
+        pairwise_result = ZeroEdit("en").pairwise_comparison(testset)
+        result = ZeroEdit.bootstrap_resampling(
+            testset, 1000, 0.5, pairwise_result, seed=0, tolerance=0.01
+        )
+        # System X always wins so the decision threshold is crossed early
+        self.assertLess(result.num_splits, 100)
+        self.assertEqual(result.num_splits % 25, 0)
+        self.assertEqual(result.stats["splits"], result.num_splits)
+        self.assertEqual(result.win_count[0], result.num_splits)
+
+        # Without early stopping all partitions are drawn
+        result = ZeroEdit.bootstrap_resampling(
+            testset, 60, 0.5, pairwise_result, seed=0
+        )
+        self.assertEqual(result.num_splits, 60)
+
+    def test_sequential_bootstrap_matches_full_run(self):
+        bleu_result = sacreBLEU.bootstrap_resampling(
+            self.testset, 50, 0.5, seed=3, tolerance=1e-9, decision_threshold=None
+        )
+        full_result = sacreBLEU.bootstrap_resampling(self.testset, 50, 0.5, seed=3)
+        np.testing.assert_array_equal(bleu_result.x_scores, full_result.x_scores)
+
+    def test_poisson_bootstrap(self):
+        pairwise_result = ZeroEdit("en").pairwise_comparison(self.testset)
+        result = ZeroEdit.bootstrap_resampling(
+            self.testset, 200, 1.0, pairwise_result, seed=5, method="poisson"
+        )
+        self.assertEqual(result.method, "poisson")
+        self.assertEqual(result.x_scores.shape, (200,))
+        self.assertGreater(result.win_count[0], result.win_count[1])
+        self.assertAlmostEqual(result.stats["x-mean"], 0.75, places=1)
+
+        bleu_result = sacreBLEU.bootstrap_resampling(
+            self.testset, 30, 1.0, seed=5, method="poisson", tolerance=0.05
+        )
+        self.assertLessEqual(bleu_result.num_splits, 30)
+        self.assertTrue(((bleu_result.x_scores >= 0) & (bleu_result.x_scores <= 1)).all())
+
+        with self.assertRaises(Exception):
+            ZeroEdit.bootstrap_resampling(self.testset, 10, 1.0, method="jackknife")
+
+    def test_poisson_weighted_sums(self):
+        columns = np.arange(24, dtype=np.float64).reshape(8, 3)
+        sums, weights = ZeroEdit.poisson_weighted_sums(
+            columns, 5, 1.0, np.random.default_rng(0), block_size=3
+        )
+        rng = np.random.default_rng(0)
+        w = np.hstack([rng.poisson(1.0, size=(5, b)) for b in (3, 3, 2)])
+        np.testing.assert_allclose(sums, w @ columns)
+        np.testing.assert_array_equal(weights, w.sum(axis=1))
+
+    def test_bootstrap_converged(self):
+        x_scores = np.array([0.5, 0.6, 0.5, 0.6] * 50)
+        self.assertTrue(ZeroEdit.bootstrap_converged(x_scores, x_scores + 0.1, 0.05))
+        self.assertFalse(ZeroEdit.bootstrap_converged(x_scores[:2], x_scores[:2], 0.05))
+        y_scores = x_scores + np.tile([0.1, -0.1], 100)
+        self.assertFalse(ZeroEdit.bootstrap_converged(x_scores, y_scores, 0.01))
+
+
+class TestMultipleBootstrap(unittest.TestCase):
+
+    x = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineA.txt"))]
+    y = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineB.txt"))]
+    ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+    testset = MultipleTestset(
+        src=ref,
+        systems={"x": x, "y": y, "ref": ref},
+        ref=ref,
+        language_pair="ru-en",
+        filenames=["src.txt", "x.txt", "y.txt", "ref.txt"],
+    )
+
+    def test_bootstrap_systems(self):
+        results = {"GLEU": GLEU("en").multiple_comparison(self.testset)}
+        bootstrap_results = bootstrap_systems(
+            [sacreBLEU, GLEU], self.testset, 30, 0.5, results, seed=11
+        )
+        for metric in ["BLEU", "GLEU"]:
+            result = bootstrap_results[metric]
+            self.assertEqual(result.scores.shape, (30, 3))
+            self.assertEqual(result.win_rates.shape, (3, 3))
+            # The reference always wins against both systems
+            self.assertEqual(result.win_rates[2, 0], 1.0)
+            self.assertEqual(result.win_rates[2, 1], 1.0)
+            np.testing.assert_array_equal(np.diag(result.win_rates), 0)
+            self.assertListEqual(
+                list(result.win_rates_to_dataframe().columns), ["x", "y", "ref"]
+            )
+
+    def test_matches_pairwise_bootstrap(self):
+        pairwise_testset = PairwiseTestset(
+            self.ref, self.x, self.y, self.ref, "ru-en", self.testset.filenames
+        )
+        expected = sacreBLEU.bootstrap_resampling(pairwise_testset, 20, 0.5, seed=5)
+        reduced_ids = sacreBLEU.draw_partitions(len(self.testset), 20, 0.5, seed=5)
+        result = sacreBLEU.multiple_bootstrap_resampling(self.testset, reduced_ids)
+        pairwise = result.pairwise("x", "y")
+        np.testing.assert_allclose(pairwise.x_scores, expected.x_scores)
+        np.testing.assert_allclose(pairwise.y_scores, expected.y_scores)
+        self.assertListEqual(pairwise.win_count, expected.win_count)
+
+        pairwise_result = GLEU("en").pairwise_comparison(pairwise_testset)
+        expected = GLEU.bootstrap_resampling(
+            pairwise_testset, 20, 0.5, pairwise_result, seed=5
+        )
+        result = GLEU.multiple_bootstrap_resampling(
+            self.testset, reduced_ids, GLEU("en").multiple_comparison(self.testset)
+        )
+        np.testing.assert_allclose(result.pairwise("x", "y").x_scores, expected.x_scores)
+
+    def test_scores_segment_level_metrics_once(self):
+        reduced_ids = GLEU.draw_partitions(len(self.testset), 20, 0.5, seed=5)
+        expected = GLEU.multiple_bootstrap_resampling(
+            self.testset, reduced_ids, GLEU("en").multiple_comparison(self.testset)
+        )
+        with mock.patch.object(
+            GLEU, "score", autospec=True, side_effect=GLEU.score
+        ) as score:
+            result = GLEU.multiple_bootstrap_resampling(self.testset, reduced_ids)
+        # One call per system instead of one per system and partition
+        self.assertEqual(score.call_count, 3)
+        np.testing.assert_array_equal(result.scores, expected.scores)
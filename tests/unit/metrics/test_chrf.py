@@ -12,9 +12,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
 import unittest
 
+import sacrebleu
 from telescope.metrics.chrf.metric import chrF
+from tests.data import DATA_PATH
 
 
 class TestchrF(unittest.TestCase):
@@ -30,10 +33,34 @@ class TestchrF(unittest.TestCase):
         expected_sys = 0.528
         result = self.chrf.score(src, cand, ref)
         self.assertAlmostEqual(result.sys_score, expected_sys, places=2)
-        self.assertFalse(result.seg_scores)
+        expected_seg = [
+            sacrebleu.sentence_chrf(c, [r]).score / 100 for c, r in zip(cand, ref)
+        ]
+        for score, expected in zip(result.seg_scores, expected_seg):
+            self.assertAlmostEqual(score, expected, places=6)
+        self.assertEqual(len(result.seg_scores), len(cand))
         self.assertListEqual(result.ref, ref)
         self.assertListEqual(result.src, src)
         self.assertListEqual(result.cand, cand)
 
     def test_name_property(self):
         self.assertEqual(self.chrf.name, "chrF")
+
+    def test_sufficient_stats(self):
+        cand = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineA.txt"))]
+        ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+
+        stats = self.chrf.segment_stats([], cand, ref)
+        self.assertEqual(stats.shape[0], len(cand))
+        self.assertAlmostEqual(
+            self.chrf.aggregate_stats(stats.sum(axis=0)),
+            self.chrf.score([], cand, ref).sys_score,
+            places=6,
+        )
+        subset = [3, 7, 7, 100, 250]
+        expected = sacrebleu.corpus_chrf([cand[i] for i in subset], [[ref[i] for i in subset]])
+        self.assertAlmostEqual(
+            self.chrf.aggregate_stats(stats[subset].sum(axis=0)),
+            expected.score / 100,
+            places=6,
+        )
@@ -12,7 +12,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import importlib.util
 import unittest
+from unittest import mock
 
 import torch
 from telescope.metrics import COMET
@@ -46,5 +48,105 @@ class TestCOMET(unittest.TestCase):
         self.assertListEqual(result.src, src)
         self.assertListEqual(result.cand, cand)
 
+    def test_multiple_score(self):
+        src = [
+            "Dem Feuer konnte Einhalt geboten werden",
+            "Schulen und Kindergärten wurden eröffnet.",
+        ]
+        ref = [
+            "They were able to control the fire.",
+            "Schools and kindergartens opened",
+        ]
+        systems = {
+            "x": ["The fire could be stopped", "Schools and kindergartens were open"],
+            "y": ["The fire was stopped", "Schools and kindergartens opened"],
+        }
+        with mock.patch.object(self.comet, "use_cache", False):
+            results = self.comet.multiple_score(src, systems, ref)
+            expected = {n: self.comet.score(src, c, ref) for n, c in systems.items()}
+        for name, result in expected.items():
+            for i in range(2):
+                self.assertAlmostEqual(
+                    results[name].seg_scores[i], result.seg_scores[i], places=4
+                )
+
+    def test_same_scores_as_predict(self):
+        src = [
+            "Dem Feuer konnte Einhalt geboten werden",
+            "Schulen und Kindergärten wurden eröffnet.",
+            "Das ist ein Test.",
+        ]
+        cand = [
+            "The fire could be stopped",
+            "Schools and kindergartens were open",
+            "This is a test.",
+        ]
+        ref = [
+            "They were able to control the fire.",
+            "Schools and kindergartens opened",
+            "That is a test.",
+        ]
+        data = [{"src": s, "mt": c, "ref": r} for s, c, r in zip(src, cand, ref)]
+        expected, _ = self.comet.model.predict(data, batch_size=2, gpus=0)
+        with mock.patch.object(COMET, "use_cache", False):
+            result = self.comet.score(src, cand, ref)
+            # Models without a direct forward pass use the Trainer path
+            with mock.patch.object(COMET, "direct_inference", False):
+                trainer_result = self.comet.score(src, cand, ref)
+        for i in range(3):
+            self.assertAlmostEqual(result.seg_scores[i], expected[i], places=4)
+            self.assertAlmostEqual(trainer_result.seg_scores[i], expected[i], places=4)
+
+    def test_sharded_multiple_score(self):
+        src = [
+            "Dem Feuer konnte Einhalt geboten werden",
+            "Schulen und Kindergärten wurden eröffnet.",
+        ]
+        ref = [
+            "They were able to control the fire.",
+            "Schools and kindergartens opened",
+        ]
+        systems = {
+            "x": ["The fire could be stopped", "Schools and kindergartens were open"],
+            "y": ["The fire was stopped", "Schools and kindergartens opened"],
+        }
+        sharded = COMET(modelname="wmt21-cometinho-da", n_procs=2)
+        with mock.patch.object(COMET, "use_cache", False), mock.patch.object(
+            COMET, "_embed_missing", autospec=True, side_effect=COMET._embed_missing
+        ) as embed_missing:
+            results = sharded.multiple_score(src, systems, ref)
+            expected = self.comet.multiple_score(src, systems, ref)
+        # Source and reference embeddings are filled in this process and reused
+        embeddings = embed_missing.call_args_list[0].args[1]
+        self.assertSetEqual(set(embeddings), set(src + ref))
+        for name, result in expected.items():
+            for i in range(2):
+                self.assertAlmostEqual(
+                    results[name].seg_scores[i], result.seg_scores[i], places=4
+                )
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("onnxruntime"), "onnxruntime is not installed"
+    )
+    def test_onnx_backend(self):
+        src = [
+            "Dem Feuer konnte Einhalt geboten werden",
+            "Schulen und Kindergärten wurden eröffnet.",
+        ]
+        cand = ["The fire could be stopped", "Schools and kindergartens were open"]
+        ref = [
+            "They were able to control the fire.",
+            "Schools and kindergartens opened",
+        ]
+        onnx_comet = COMET(modelname="wmt21-cometinho-da", backend="onnx")
+        with mock.patch.object(COMET, "use_cache", False):
+            expected = self.comet.score(src, cand, ref)
+            result = onnx_comet.score(src, cand, ref)
+        self.assertAlmostEqual(result.sys_score, expected.sys_score, places=3)
+        for i in range(2):
+            self.assertAlmostEqual(
+                result.seg_scores[i], expected.seg_scores[i], places=3
+            )
+
     def test_name_property(self):
         self.assertEqual(self.comet.name, "COMET")
@@ -14,8 +14,11 @@
 # limitations under the License.
 import os
 import unittest
+from unittest import mock
 
+from telescope.metrics import lexical
 from telescope.metrics.gleu.metric import GLEU
+from telescope.metrics.sacrebleu.metric import sacreBLEU
 from tests.data import DATA_PATH
 
 
@@ -40,3 +43,30 @@ class TestGLEU(unittest.TestCase):
         gleu = GLEU(language="en", lowercase=False, tokenize=False)
         result = gleu.score([], ref, hyp1)
         self.assertAlmostEqual(expected_result, result.sys_score, places=3)
+
+    def test_matches_sentence_gleu(self):
+        cand = open(os.path.join(DATA_PATH, "OnlineA.txt")).readlines()
+        ref = open(os.path.join(DATA_PATH, "ref_400.en.txt")).readlines()
+        cand, ref = self.cand + cand + ["", "a b"], self.ref + ref + ["a", ""]
+        for tokenize in (True, False):
+            gleu = GLEU(language="en", tokenize=tokenize)
+            result = gleu.score(None, cand, ref)
+            expected = [
+                gleu.sentence_gleu(r, h)
+                for r, h in zip(gleu.preprocess(ref), gleu.preprocess(cand))
+            ]
+            self.assertListEqual(result.seg_scores, expected)
+
+    def test_shares_bleu_ngrams(self):
+        lexical.clear()
+        self.addCleanup(lexical.clear)
+        with mock.patch.object(
+            lexical, "corpus_ngram_stats", wraps=lexical.corpus_ngram_stats
+        ) as extract:
+            bleu = sacreBLEU(language="en").score(None, self.cand, self.ref)
+            gleu = GLEU(language="en").score(None, self.cand, self.ref)
+            self.assertEqual(extract.call_count, 1)
+            # Lowercasing counts other n-grams
+            GLEU(language="en", lowercase=True).score(None, self.cand, self.ref)
+            self.assertEqual(extract.call_count, 2)
+        self.assertEqual(len(gleu.seg_scores), len(bleu.seg_scores))
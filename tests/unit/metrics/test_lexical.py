@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import sacrebleu
+from telescope.metrics import lexical
+from telescope.metrics.chrf.metric import chrF
+from telescope.metrics.sacrebleu.metric import sacreBLEU
+from telescope.metrics.ter.metric import TER
+from tests.data import DATA_PATH
+
+
+class TestLexical(unittest.TestCase):
+    cand = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineA.txt"))]
+    ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+    cand, ref = cand + ["", "a", "x y"], ref + ["b", "", "x y"]
+
+    def setUp(self):
+        lexical.clear()
+
+    def tearDown(self):
+        lexical.clear()
+
+    def test_same_stats_as_sacrebleu(self):
+        for metric, sacrebleu_metric in [
+            (sacreBLEU("en"), sacrebleu.BLEU()),
+            (chrF("en"), sacrebleu.CHRF()),
+            (TER("en"), sacrebleu.TER()),
+        ]:
+            expected = sacrebleu_metric._extract_corpus_statistics(self.cand, [self.ref])
+            np.testing.assert_array_equal(
+                metric.segment_stats(None, self.cand, self.ref), expected
+            )
+            self.assertEqual(
+                metric.score(None, self.cand, self.ref).sys_score,
+                sacrebleu_metric.corpus_score(self.cand, [self.ref]).score / 100,
+            )
+
+    def test_tokenizes_once(self):
+        tokenizer = mock.Mock(side_effect=str.upper)
+        with mock.patch.dict(lexical._tokenizers, {"13a": tokenizer}):
+            stats = lexical.bleu_stats(self.cand, self.ref)
+            lexical.bleu_stats(self.cand[::-1], self.ref)
+            self.assertIs(lexical.bleu_stats(self.cand, self.ref), stats)
+        distinct = set(self.cand) | set(self.ref)
+        self.assertEqual(tokenizer.call_count, len(distinct))
+
+    def test_stats_cache(self):
+        stats = lexical.bleu_stats(self.cand, self.ref)
+        self.assertFalse(stats.flags.writeable)
+        with self.assertRaises(ValueError):
+            stats[0, 0] = 1
+
+        # Bounded by the bytes of the cached statistics
+        with mock.patch.object(lexical, "MAX_CORPUS_STATS_BYTES", 2 * stats.nbytes):
+            lexical.chrf_stats(self.cand, self.ref)
+            self.assertIsNot(lexical.bleu_stats(self.cand, self.ref), stats)
+            self.assertEqual(len(lexical._corpus_stats), 1)
+        self.assertEqual(
+            lexical._corpus_stats_bytes,
+            sum(s.nbytes for s in lexical._corpus_stats.values()),
+        )
+
+    def test_threads(self):
+        stats = lexical.bleu_stats(self.cand, self.ref)
+        corpora = [(self.cand[i:], self.ref[i:]) for i in range(0, 40, 2)]
+        # Small enough to evict statistics while other threads add theirs
+        with mock.patch.object(lexical, "MAX_CORPUS_STATS_BYTES", 4 * stats.nbytes):
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(
+                    executor.map(lambda pair: lexical.bleu_stats(*pair), corpora * 3)
+                )
+        for (cand, _), result in zip(corpora * 3, results):
+            self.assertEqual(len(result), len(cand))
+        np.testing.assert_array_equal(results[0], stats)
+        self.assertEqual(
+            lexical._corpus_stats_bytes,
+            sum(s.nbytes for s in lexical._corpus_stats.values()),
+        )
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import unittest
+
+import numpy as np
+from telescope.metrics.meteor.aligner import align, count_chunks, encode_stages
+from telescope.metrics.meteor.metric import METEOR
+from tests.data import DATA_PATH
+
+
+class TestMETEOR(unittest.TestCase):
+
+    meteor = METEOR(language="en")
+
+    def test_name_property(self):
+        self.assertEqual(self.meteor.name, "METEOR")
+
+    def test_score(self):
+        cand = ["the cat sat on the mat", "The cats are running.", "", "a b"]
+        ref = ["on the mat sat the cat", "the cat is running.", "a", ""]
+        src = []  # Will be ignored
+
+        result = self.meteor.score(src, cand, ref)
+        # The second "the" aligns with the last free "the": 6 matches in 6 chunks
+        self.assertAlmostEqual(result.seg_scores[0], 0.5)
+        # "cats" matches "cat" by stem: 4 of 5 words match in 2 chunks
+        fmean = 4 / 5
+        self.assertAlmostEqual(result.seg_scores[1], fmean * (1 - 0.5 * (2 / 4) ** 3))
+        self.assertListEqual(result.seg_scores[2:], [0.0, 0.0])
+
+        recall = (6 + 4) / (6 + 5 + 1)
+        precision = (6 + 4) / (6 + 5 + 2)
+        fmean = precision * recall / (0.9 * precision + 0.1 * recall)
+        self.assertAlmostEqual(
+            result.sys_score, fmean * (1 - 0.5 * (8 / 10) ** 3), places=6
+        )
+        self.assertListEqual(result.ref, ref)
+        self.assertListEqual(result.cand, cand)
+
+    def test_alignment(self):
+        hyp, ref = encode_stages(
+            [
+                [["the", "russian", "car", "lost", "power"]],
+                [["the", "car", "of", "the", "russian's", "lost", "power"]],
+            ],
+            self.meteor.stemmer,
+        )
+        alignment = align(hyp[0], ref[0])
+        # "the russian" matches "the russian's" as a single chunk
+        self.assertListEqual(alignment, [3, 4, 1, 5, 6])
+        self.assertEqual(count_chunks(alignment), 3)
+
+    def test_sufficient_stats(self):
+        cand = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineA.txt"))]
+        ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+
+        stats = self.meteor.segment_stats([], cand, ref)
+        self.assertEqual(stats.shape, (len(cand), 4))
+        result = self.meteor.score([], cand, ref)
+        self.assertAlmostEqual(
+            self.meteor.aggregate_stats(stats.sum(axis=0)), result.sys_score, places=10
+        )
+        subset = [3, 7, 7, 100, 250]
+        self.assertAlmostEqual(
+            self.meteor.aggregate_stats(stats[subset].sum(axis=0)),
+            self.meteor.score(
+                [], [cand[i] for i in subset], [ref[i] for i in subset]
+            ).sys_score,
+            places=10,
+        )
+        # Stem matching only adds matches to the exact ones
+        exact = METEOR(language="en", stem=False).segment_stats([], cand, ref)
+        self.assertTrue((stats[:, 2] >= exact[:, 2]).all())
+
+    def test_nltk_reference(self):
+        # NLTK meteor_score with the same stemmer and without WordNet synonyms
+        with open(os.path.join(DATA_PATH, "meteor-nltk.json")) as fp:
+            nltk = json.load(fp)
+        cand = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineA.txt"))]
+        ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+        stats = self.meteor.segment_stats([], cand, ref)
+        result = self.meteor.score([], cand, ref)
+
+        np.testing.assert_array_equal(stats[:, 2], nltk["matches"])
+        np.testing.assert_array_equal(stats[:, 3], nltk["chunks"])
+        np.testing.assert_allclose(result.seg_scores, nltk["segment_scores"], atol=1e-12)
+        self.assertAlmostEqual(result.sys_score, nltk["corpus_score"], places=12)
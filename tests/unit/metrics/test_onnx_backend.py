@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import importlib.util
+import tempfile
+import unittest
+
+import numpy as np
+import torch
+from telescope.metrics.comet.onnx_backend import (
+    Estimator,
+    ONNXModel,
+    SentenceEncoder,
+    export_model,
+)
+
+
+class TinyRegressionModel(torch.nn.Module):
+    """Sentence encoder and estimator with the interface of a COMET regression
+    model: mean-pooled token embeddings and a feed-forward estimator."""
+
+    def __init__(self, vocab_size: int = 50, hidden_size: int = 16):
+        super().__init__()
+        self.embeddings = torch.nn.Embedding(vocab_size, hidden_size)
+        self.estimator = torch.nn.Sequential(
+            torch.nn.Linear(6 * hidden_size, hidden_size),
+            torch.nn.Tanh(),
+            torch.nn.Linear(hidden_size, 1),
+        )
+
+    def get_sentence_embedding(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        mask = attention_mask.unsqueeze(-1).float()
+        return (self.embeddings(input_ids) * mask).sum(1) / mask.sum(1)
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("onnx") and importlib.util.find_spec("onnxruntime"),
+    "onnx and onnxruntime are not installed",
+)
+class TestONNXBackend(unittest.TestCase):
+    def test_same_scores_as_torch(self):
+        torch.manual_seed(0)
+        model = TinyRegressionModel().eval()
+        folder = tempfile.TemporaryDirectory()
+        onnx_model = ONNXModel(export_model(model, "tiny", folder.name))
+
+        # Batches with other sizes and lengths than the ones used for the export
+        input_ids = torch.randint(1, 50, (5, 11))
+        attention_mask = torch.ones(5, 11, dtype=torch.long)
+        attention_mask[1, 7:] = 0
+        attention_mask[4, 3:] = 0
+        with torch.no_grad():
+            embeddings = SentenceEncoder(model)(input_ids, attention_mask)
+            src, mt, ref = embeddings[:3], embeddings[1:4], embeddings[2:]
+            scores = Estimator(model)(src, mt, ref)
+
+        onnx_embeddings = onnx_model.embed(input_ids.numpy(), attention_mask.numpy())
+        np.testing.assert_allclose(onnx_embeddings, embeddings.numpy(), atol=1e-5)
+        onnx_scores = onnx_model.estimate(src.numpy(), mt.numpy(), ref.numpy())
+        np.testing.assert_allclose(onnx_scores, scores.numpy(), atol=1e-5)
+        folder.cleanup()
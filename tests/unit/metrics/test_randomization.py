@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import unittest
+
+from telescope.metrics.sacrebleu.metric import sacreBLEU
+from telescope.metrics.zero_edit.metric import ZeroEdit
+from telescope.testset import PairwiseTestset
+from tests.data import DATA_PATH
+
+
+class TestApproximateRandomization(unittest.TestCase):
+
+    x = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineA.txt"))]
+    y = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineB.txt"))]
+    ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+    filenames = ["src.txt", "x.txt", "y.txt", "ref.txt"]
+
+    def test_identical_systems(self):
+        testset = PairwiseTestset(
+            self.ref, self.x, self.x, self.ref, "ru-en", self.filenames
+        )
+        result = sacreBLEU.approximate_randomization(testset, 50)
+        self.assertEqual(result.p_value, 1.0)
+        self.assertEqual(result.x_score, result.y_score)
+
+    def test_sufficient_stats(self):
+        testset = PairwiseTestset(
+            self.ref, self.x, self.y, self.ref, "ru-en", self.filenames
+        )
+        result = sacreBLEU.approximate_randomization(testset, 200)
+        expected = sacreBLEU("en").pairwise_comparison(testset)
+        self.assertAlmostEqual(result.x_score, expected.x_result.sys_score, places=6)
+        self.assertAlmostEqual(result.y_score, expected.y_result.sys_score, places=6)
+        self.assertTrue(0 < result.p_value <= 1)
+        self.assertEqual(result.num_trials, 200)
+
+    def test_segment_level(self):
+        ref = ["a", "b", "c", "d", "e", "f", "g", "h"] * 10
+        testset = PairwiseTestset(
+            ref, ref, ["x"] * len(ref), ref, "en-en", self.filenames
+        )
+        result = ZeroEdit.approximate_randomization(testset, 500, seed=3)
+        self.assertEqual(result.x_score, 1.0)
+        self.assertEqual(result.y_score, 0.0)
+        self.assertAlmostEqual(result.p_value, 1 / 501)
+
+    def test_seed(self):
+        testset = PairwiseTestset(
+            self.ref, self.x, self.y, self.ref, "ru-en", self.filenames
+        )
+        first = sacreBLEU.approximate_randomization(testset, 100, seed=7)
+        second = sacreBLEU.approximate_randomization(testset, 100, seed=7)
+        self.assertEqual(first.p_value, second.p_value)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import torch
+from telescope.metrics.registry import ModelRegistry, model_size
+
+
+class TestModelRegistry(unittest.TestCase):
+    def test_model_size(self):
+        linear = torch.nn.Linear(10, 10)
+        self.assertEqual(model_size(linear), 110 * 4)
+        self.assertEqual(model_size((linear, "tokenizer", [linear])), 2 * 110 * 4)
+
+    def test_reuses_loaded_models(self):
+        registry = ModelRegistry(max_bytes=10 ** 6)
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return torch.nn.Linear(10, 10)
+
+        first = registry.load(("COMET", "model", "cpu"), loader)
+        second = registry.load(("COMET", "model", "cpu"), loader)
+        self.assertIs(first, second)
+        self.assertEqual(len(loads), 1)
+        registry.load(("COMET", "model", "cuda"), loader)
+        self.assertEqual(len(loads), 2)
+
+    def test_lru_eviction(self):
+        registry = ModelRegistry(max_bytes=2 * 110 * 4)
+        registry.load("a", lambda: torch.nn.Linear(10, 10))
+        registry.load("b", lambda: torch.nn.Linear(10, 10))
+        registry.load("a", lambda: None)
+        registry.load("c", lambda: torch.nn.Linear(10, 10))
+        self.assertIn("a", registry)
+        self.assertNotIn("b", registry)
+        self.assertEqual(registry.size, 2 * 110 * 4)
+
+        # Models larger than the budget are kept until the next load
+        registry.load("big", lambda: None, size=10 ** 9)
+        self.assertEqual(len(registry), 1)
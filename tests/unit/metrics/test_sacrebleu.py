@@ -12,9 +12,13 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
 import unittest
 
+import sacrebleu
 from telescope.metrics.sacrebleu.metric import sacreBLEU
+from telescope.utils import MappedLines
+from tests.data import DATA_PATH
 
 
 class TestSacreBLEU(unittest.TestCase):
@@ -30,10 +34,46 @@ class TestSacreBLEU(unittest.TestCase):
         expected_sys = 0.3913
         result = self.bleu.score(src, cand, ref)
         self.assertAlmostEqual(result.sys_score, expected_sys, places=3)
-        self.assertFalse(result.seg_scores)
+        expected_seg = [
+            sacrebleu.sentence_bleu(c, [r]).score / 100 for c, r in zip(cand, ref)
+        ]
+        for score, expected in zip(result.seg_scores, expected_seg):
+            self.assertAlmostEqual(score, expected, places=6)
+        self.assertEqual(len(result.seg_scores), len(cand))
         self.assertListEqual(result.ref, ref)
         self.assertListEqual(result.src, src)
         self.assertListEqual(result.cand, cand)
 
     def test_name_property(self):
         self.assertEqual(self.bleu.name, "BLEU")
+
+    def test_sufficient_stats(self):
+        cand = [l.strip() for l in open(os.path.join(DATA_PATH, "OnlineA.txt"))]
+        ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+
+        stats = self.bleu.segment_stats([], cand, ref)
+        self.assertEqual(stats.shape[0], len(cand))
+        self.assertAlmostEqual(
+            self.bleu.aggregate_stats(stats.sum(axis=0)),
+            self.bleu.score([], cand, ref).sys_score,
+            places=6,
+        )
+        subset = [3, 7, 7, 100, 250]
+        expected = sacrebleu.corpus_bleu([cand[i] for i in subset], [[ref[i] for i in subset]])
+        self.assertAlmostEqual(
+            self.bleu.aggregate_stats(stats[subset].sum(axis=0)),
+            expected.score / 100,
+            places=6,
+        )
+
+    def test_score_stream(self):
+        files = [
+            MappedLines(os.path.join(DATA_PATH, f))
+            for f in ("src_400.ru.txt", "OnlineA.txt", "ref_400.en.txt")
+        ]
+        chunks = zip(*(f.iter_chunks(64) for f in files))
+        result = self.bleu.score_stream(chunks)
+        expected = self.bleu.score(*(f.tolist() for f in files))
+        self.assertAlmostEqual(result.sys_score, expected.sys_score, places=10)
+        self.assertListEqual(result.seg_scores, expected.seg_scores)
+        self.assertFalse(result.cand)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import unittest
+
+import numpy as np
+import torch
+from telescope.metrics.metric import Metric
+from telescope.metrics.utils import (
+    autocast,
+    check_precision,
+    length_sorted_batches,
+    lpt_partition,
+    quantize,
+)
+
+
+class TestLengthSortedBatches(unittest.TestCase):
+    def test_token_budget(self):
+        lengths = [3, 50, 4, 10, 2, 3, 100, 1]
+        batches = length_sorted_batches(lengths, max_tokens=20)
+        order = np.concatenate(batches)
+        self.assertListEqual(sorted(order.tolist()), list(range(len(lengths))))
+        self.assertListEqual(order.tolist(), [6, 1, 3, 2, 0, 5, 4, 7])
+        for batch in batches:
+            padded = len(batch) * max(lengths[i] for i in batch)
+            self.assertTrue(padded <= 20 or len(batch) == 1)
+
+    def test_max_batch_size(self):
+        batches = length_sorted_batches([1] * 10, max_tokens=100, max_batch_size=4)
+        self.assertListEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertListEqual(length_sorted_batches([], max_tokens=100), [])
+
+
+class TestPrecision(unittest.TestCase):
+    def test_check_precision(self):
+        check_precision("bf16", "cpu")
+        check_precision("int8", "cpu")
+        with self.assertRaises(Exception):
+            check_precision("fp16", "cpu")
+        with self.assertRaises(Exception):
+            check_precision("int8", "cuda")
+
+    def test_reduced_precision_drift(self):
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(torch.nn.Linear(16, 16), torch.nn.Tanh())
+        x = torch.rand(8, 16)
+        with torch.inference_mode():
+            expected = model(x)
+            with autocast("bf16", "cpu"):
+                bf16 = model(x)
+            int8 = quantize(model, "int8")(x)
+        self.assertEqual(bf16.dtype, torch.bfloat16)
+        self.assertTrue(torch.allclose(bf16.float(), expected, atol=0.05))
+        self.assertTrue(torch.allclose(int8, expected, atol=0.05))
+        self.assertIs(quantize(model, "fp32"), model)
+
+
+class LengthMetric(Metric):
+
+    name = "Length"
+    use_cache = False
+
+    def __init__(self, language, n_procs):
+        super().__init__(language)
+        self.n_procs = n_procs
+
+    def score(self, src, cand, ref):
+        return self.cached_scores(src, cand, ref, self._predict)
+
+    def _predict(self, src, cand, ref):
+        return np.array([[len(c), os.getpid()] for c in cand], dtype=float)
+
+
+class TestSharding(unittest.TestCase):
+    def test_lpt_partition(self):
+        costs = [7, 5, 4, 3, 3, 2]
+        shards = lpt_partition(costs, 3)
+        self.assertListEqual([s.tolist() for s in shards], [[0, 5], [1, 4], [2, 3]])
+        self.assertListEqual([sum(costs[i] for i in s) for s in shards], [9, 8, 7])
+        self.assertEqual(len(lpt_partition([1, 1], 4)), 2)
+
+    def test_sharded_scores(self):
+        cand = ["a" * n for n in [5, 1, 8, 2, 3, 7, 4]]
+        scores = LengthMetric("en", n_procs=3).score(None, cand, cand)
+        self.assertListEqual(scores[:, 0].tolist(), [len(c) for c in cand])
+        self.assertNotIn(os.getpid(), scores[:, 1])
@@ -39,3 +39,17 @@ class TestSacreBLEU(unittest.TestCase):
 
     def test_name_property(self):
         self.assertEqual(ZeroEdit.name, "ZeroEdit")
+
+    def test_score_stream(self):
+        chunks = [
+            (["a", "b"], ["Hi world.", "This is a Test."], ["Hello world.", "This is a Test."]),
+            (["c"], ["Bye."], ["Bye."]),
+        ]
+        result = self.zero_edit.score_stream(iter(chunks), keep_text=True)
+        self.assertAlmostEqual(result.sys_score, 2 / 3)
+        self.assertListEqual(result.seg_scores, [0, 1, 1])
+        self.assertListEqual(result.src, ["a", "b", "c"])
+
+        result = self.zero_edit.score_stream(iter(chunks), keep_seg_scores=False)
+        self.assertFalse(result.seg_scores)
+        self.assertFalse(result.ref)
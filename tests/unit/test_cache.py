@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+from telescope import cache
+from telescope.cache import SegmentCache, segment_key
+from telescope.metrics.metric import Metric
+
+
+class CountingMetric(Metric):
+
+    name = "Counting"
+    cache_namespace = "Counting/test"
+
+    def __init__(self, language):
+        super().__init__(language)
+        self.scored = []
+
+    def score(self, src, cand, ref):
+        return self.cached_scores(src, cand, ref, self._predict)
+
+    def _predict(self, src, cand, ref):
+        self.scored.extend(cand)
+        return np.array([[len(c), len(r)] for c, r in zip(cand, ref)], dtype=float)
+
+
+class TestSegmentCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "scores.sqlite")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_get_and_set(self):
+        writer, reader = SegmentCache(self.path), SegmentCache(self.path)
+        key = segment_key("COMET/wmt20-comet-da", "src", "mt", "ref")
+        self.assertNotEqual(key, segment_key("COMET/other", "src", "mt", "ref"))
+        writer.set_many({key: np.array([0.5, 0.25])})
+        values = reader.get_many([key, "missing"])
+        self.assertListEqual(list(values), [key])
+        np.testing.assert_array_equal(values[key], [0.5, 0.25])
+
+    def test_lru_eviction(self):
+        segment_cache = SegmentCache(self.path, max_entries=2)
+        segment_cache.set_many({"a": [1.0]})
+        segment_cache.set_many({"b": [2.0]})
+        segment_cache.get_many(["a"])
+        segment_cache.set_many({"c": [3.0]})
+        self.assertEqual(len(segment_cache), 2)
+        self.assertListEqual(sorted(segment_cache.get_many(["a", "b", "c"])), ["a", "c"])
+
+    def test_counts_only_over_limit(self):
+        segment_cache = SegmentCache(self.path, max_entries=200)
+        with mock.patch.object(
+            SegmentCache, "__len__", autospec=True, side_effect=SegmentCache.__len__
+        ) as count:
+            for i in range(10):
+                segment_cache.set_many({f"{i}-{j}": [j] for j in range(20)})
+            # Counted once to start the size estimate
+            self.assertEqual(count.call_count, 1)
+            segment_cache.set_many({"last": [0.0]})
+            self.assertEqual(count.call_count, 2)
+        self.assertEqual(len(segment_cache), 198)
+        self.assertIn("last", segment_cache.get_many(["0-0", "last"]))
+
+    def test_threads(self):
+        segment_cache = SegmentCache(self.path)
+        segment_cache.set_many({"a": [1.0]})
+
+        def worker(i):
+            segment_cache.set_many({str(i): [float(i)]})
+            return segment_cache.get_many(["a", str(i)])
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(worker, range(8)))
+        for i, values in enumerate(results):
+            self.assertListEqual(sorted(values), sorted(["a", str(i)]))
+        self.assertEqual(len(segment_cache), 9)
+
+    def test_scores_only_misses(self):
+        metric = CountingMetric("en")
+        with mock.patch.object(cache, "_segment_cache", SegmentCache(self.path)):
+            first = metric.score(["s1", "s2", "s1"], ["a", "bb", "a"], ["x", "yy", "x"])
+            self.assertListEqual(metric.scored, ["a", "bb"])
+            second = metric.score(["s1", "s3"], ["a", "ccc"], ["x", "z"])
+            self.assertListEqual(metric.scored, ["a", "bb", "ccc"])
+
+        np.testing.assert_array_equal(first, [[1, 1], [2, 2], [1, 1]])
+        np.testing.assert_array_equal(second, [[1, 1], [3, 1]])
+
+    def test_disable_cache(self):
+        metric = CountingMetric("en")
+        with mock.patch.dict(os.environ, {"TELESCOPE_DISABLE_CACHE": "1"}):
+            metric.score(["s1"], ["a"], ["x"])
+            metric.score(["s1"], ["a"], ["x"])
+        self.assertListEqual(metric.scored, ["a", "a"])
@@ -12,9 +12,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
 import unittest
 
-from telescope.testset import PairwiseTestset
+import numpy as np
+from telescope.testset import MultipleTestset, PairwiseTestset
+from tests.data import DATA_PATH
 
 
 class TestTestset(unittest.TestCase):
@@ -39,4 +42,142 @@ class TestTestset(unittest.TestCase):
             'Hello world.'
         )
         self.assertTupleEqual(expected, self.testset[0])
-    
\ No newline at end of file
+
+    def test_filtered_views(self):
+        testset = PairwiseTestset(
+            src=["a", "b", "a", "c"],
+            system_x=["x1", "x2", "x3", "x4"],
+            system_y=["y1", "y2", "y3", "y4"],
+            ref=["a", "b", "a", "d"],
+            language_pair="en-en",
+            filenames=["src.txt", "x.txt", "y.txt", "ref.txt"],
+        )
+        # Repeated segments are stored once across columns
+        self.assertIs(testset[0][0], testset[2][0])
+        self.assertIs(testset[0][0], testset[0][3])
+
+        view = testset.select([1, 2, 3])
+        nested = view.select([0, 2])
+        self.assertEqual(len(testset), 4)
+        self.assertListEqual(view.src, ["b", "a", "c"])
+        self.assertListEqual(nested.system_x, ["x2", "x4"])
+        self.assertTupleEqual(nested[1], ("c", "x4", "y4", "d"))
+        self.assertListEqual(nested.index.tolist(), [1, 3])
+        self.assertIs(nested._columns, testset._columns)
+        # Each view materialises its columns once
+        self.assertIs(view.src, view.src)
+        self.assertListEqual(testset.src, ["a", "b", "a", "c"])
+
+        self.assertNotEqual(
+            PairwiseTestset.hash_func(view), PairwiseTestset.hash_func(nested)
+        )
+        self.assertEqual(
+            PairwiseTestset.hash_func(nested),
+            PairwiseTestset.hash_func(testset.select([1, 3])),
+        )
+
+    def test_from_files(self):
+        testset = PairwiseTestset.from_files(
+            os.path.join(DATA_PATH, "src_400.ru.txt"),
+            os.path.join(DATA_PATH, "OnlineA.txt"),
+            os.path.join(DATA_PATH, "OnlineB.txt"),
+            os.path.join(DATA_PATH, "ref_400.en.txt"),
+            language_pair="ru-en",
+        )
+        ref = [l.strip() for l in open(os.path.join(DATA_PATH, "ref_400.en.txt"))]
+        self.assertEqual(len(testset), 400)
+        self.assertListEqual(testset.ref, ref)
+
+        with self.assertRaises(AssertionError):
+            PairwiseTestset.from_files(
+                os.path.join(DATA_PATH, "src.de"),
+                os.path.join(DATA_PATH, "OnlineA.txt"),
+                os.path.join(DATA_PATH, "OnlineB.txt"),
+                os.path.join(DATA_PATH, "ref_400.en.txt"),
+                language_pair="ru-en",
+            )
+
+
+class TestMultipleTestset(unittest.TestCase):
+
+    testset = MultipleTestset(
+        src=["Bonjour le monde.", "C'est un test."],
+        systems={
+            "google": ["Greetings world", "This is an experiment."],
+            "unbabel": ["Hi world.", "This is a Test."],
+            "deepl": ["Hello world!", "This is a test."],
+        },
+        ref=["Hello world.", "This is a test."],
+        language_pair="fr-en",
+        filenames=["src.txt", "google.txt", "unbabel.txt", "deepl.txt", "ref.txt"],
+    )
+
+    def test_length(self):
+        self.assertEqual(len(self.testset), 2)
+        self.assertListEqual(self.testset.system_names, ["google", "unbabel", "deepl"])
+
+    def test_get_item(self):
+        expected = (
+            "C'est un test.",
+            "This is an experiment.",
+            "This is a Test.",
+            "This is a test.",
+            "This is a test.",
+        )
+        self.assertTupleEqual(expected, self.testset[1])
+
+    def test_select(self):
+        view = self.testset.select([1])
+        self.assertListEqual(view.system("deepl"), ["This is a test."])
+        self.assertListEqual(list(view.systems), ["google", "unbabel", "deepl"])
+        self.assertEqual(len(self.testset), 2)
+
+    def test_mismatch(self):
+        with self.assertRaises(AssertionError):
+            MultipleTestset(
+                src=["a", "b"],
+                systems={"x": ["a", "b"], "y": ["a"]},
+                ref=["a", "b"],
+                language_pair="fr-en",
+                filenames=[],
+            )
+
+
+    def test_from_files(self):
+        systems = [
+            os.path.join(DATA_PATH, "OnlineA.txt"),
+            os.path.join(DATA_PATH, "OnlineB.txt"),
+        ]
+        testset = MultipleTestset.from_files(
+            os.path.join(DATA_PATH, "src_400.ru.txt"),
+            systems,
+            os.path.join(DATA_PATH, "ref_400.en.txt"),
+            "ru-en",
+        )
+        self.assertEqual(len(testset), 400)
+        self.assertListEqual(testset.system_names, ["OnlineA", "OnlineB"])
+        with open(systems[1]) as fp:
+            self.assertEqual(testset.system("OnlineB")[5], fp.readlines()[5].strip())
+        with self.assertRaises(Exception):
+            MultipleTestset.from_files(
+                systems[0], [systems[0], systems[0]], systems[1], "ru-en"
+            )
+
+    def test_lazy_columns(self):
+        testset = MultipleTestset.from_files(
+            os.path.join(DATA_PATH, "src_400.ru.txt"),
+            [os.path.join(DATA_PATH, "OnlineA.txt")],
+            os.path.join(DATA_PATH, "ref_400.en.txt"),
+            "ru-en",
+        )
+        view = testset.select([2, 0])
+        # Nothing is decoded until a segment is needed
+        self.assertEqual(len(view), 2)
+        self.assertNotIsInstance(testset._columns[0], np.ndarray)
+
+        with open(os.path.join(DATA_PATH, "OnlineA.txt")) as fp:
+            lines = [l.strip() for l in fp]
+        self.assertListEqual(view.system("OnlineA"), [lines[2], lines[0]])
+        # The columns decoded by the view are shared with the testset
+        self.assertIsInstance(testset._columns[0], np.ndarray)
+        self.assertEqual(testset[1][1], lines[1])
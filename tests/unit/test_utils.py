@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2020 Unbabel
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import unittest
+
+from telescope.utils import MappedLines
+from tests.data import DATA_PATH
+
+
+class TestMappedLines(unittest.TestCase):
+
+    path = os.path.join(DATA_PATH, "ref_400.en.txt")
+
+    def test_matches_readlines(self):
+        expected = [l.strip() for l in open(self.path).readlines()]
+        with MappedLines(self.path, block_size=1000) as lines:
+            self.assertEqual(len(lines), len(expected))
+            self.assertListEqual(lines.tolist(), expected)
+            self.assertEqual(lines[17], expected[17])
+            self.assertEqual(lines[-1], expected[-1])
+            self.assertListEqual(lines[10:20], expected[10:20])
+            chunks = list(lines.iter_chunks(150))
+            self.assertListEqual([len(c) for c in chunks], [150, 150, 100])
+
+    def test_buffer(self):
+        lines = MappedLines("a \nb\r\n\nc".encode())
+        self.assertListEqual(lines.tolist(), ["a", "b", "", "c"])
+        self.assertEqual(len(MappedLines(b"")), 0)
+        self.assertEqual(len(MappedLines(b"a\n")), 1)